@@ -1,12 +1,25 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import os
 import json
+import threading
 from datetime import datetime
 from werkzeug.utils import secure_filename
-import openai
 from dotenv import load_dotenv
 
+from llm_cache import LLMCache, request_key
+from circuit_breaker import CircuitOpenError
+from item_embeddings import DEFAULT_SHORTLIST, ItemEmbeddings
+from llm_client import AsyncLLMClient
+from outfit_cache import OutfitCache
+from outfit_engine import WardrobeIndex, describe_item, top_outfits
+from outfit_parser import OutfitParser
+from prompt_builder import DEFAULT_TOKEN_BUDGET, build_prompt
+from rate_limiter import RateLimitExceeded
+from single_flight import SingleFlight
+from wardrobe_store import WardrobeLocked, WardrobeStore
+from warmup import WarmUp
+
 # Load environment variables
 load_dotenv()
 
@@ -17,34 +30,94 @@ CORS(app)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', str(DEFAULT_TOKEN_BUDGET)))
+PROMPT_SHORTLIST = int(os.getenv('PROMPT_SHORTLIST', str(DEFAULT_SHORTLIST)))
 
 # Create upload directory if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('static/images', exist_ok=True)
 
-# Initialize OpenAI
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# Initialize OpenAI: one pooled async client with a latency SLA and deadline
+llm_client = AsyncLLMClient.from_env()
+
+# Materialized rule-engine outfits for the preset moods and occasions
+outfit_cache = OutfitCache()
+
+# Item embeddings that shortlist prompt candidates per slot
+item_embeddings = ItemEmbeddings()
+
+# Cache of AI responses keyed on model, prompt and sampling settings
+llm_cache = LLMCache.from_env()
+
+# Reads model replies that are not strict JSON instead of discarding them
+outfit_parser = OutfitParser()
+
+# Identical AI requests in flight at the same time share one outbound call
+single_flight = SingleFlight()
+
+# The wardrobe: a memory-mapped snapshot plus a journal of changes;
+# wardrobe.json is imported on first start
+wardrobe_store = WardrobeStore.from_env()
+
+# Why requests were answered by the rule engine instead of the AI
+fallback_counts = {'no_api_key': 0, 'hedged': 0, 'circuit_open': 0, 'rate_limited': 0, 'error': 0}
+fallback_lock = threading.Lock()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def load_wardrobe():
-    """Load wardrobe data from JSON file"""
-    try:
-        with open('wardrobe.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {"items": []}
+    """Wardrobe items, read lazily from the snapshot"""
+    return {"items": wardrobe_store.items()}
+
+# Startup warm-up: load the wardrobe once, then precompute the preset
+# outfits and item embeddings from it
+warm_up = WarmUp({
+    'wardrobe': wardrobe_store.load,
+    'outfits': lambda: outfit_cache.ensure_built(lambda: load_wardrobe()['items']),
+    'embeddings': lambda: item_embeddings.ensure_built(lambda: load_wardrobe()['items'])
+}, after={'outfits': ('wardrobe',), 'embeddings': ('wardrobe',)})
 
-def save_wardrobe(wardrobe):
-    """Save wardrobe data to JSON file"""
-    with open('wardrobe.json', 'w') as f:
-        json.dump(wardrobe, f, indent=2)
+def create_app(warm=None):
+    """Return the configured app, warming caches in the background.
+    
+    Importing this module already calls it with the WARMUP setting, so
+    WSGI servers and `flask run` serving `app` are warmed too. Warm-up
+    runs unless `warm` is False or WARMUP=0; /ready answers 503 until it
+    has finished. Only the first call decides.
+    """
+    if warm is None:
+        warm = os.getenv('WARMUP', '1') != '0'
+    if not warm_up.started_at:
+        if warm:
+            warm_up.start()
+        else:
+            warm_up.skip()
+    return app
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/ready')
+def ready():
+    status = warm_up.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics')
+def metrics():
+    with fallback_lock:
+        fallbacks = dict(fallback_counts)
+    return jsonify({
+        'llm_cache': llm_cache.stats(),
+        'item_embeddings': item_embeddings.stats(),
+        'outfit_parser': outfit_parser.stats(),
+        'llm_client': llm_client.stats(),
+        'single_flight': single_flight.stats(),
+        'wardrobe': wardrobe_store.stats(),
+        'fallbacks': fallbacks
+    })
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -68,30 +141,28 @@ def upload_file():
         style = request.form.get('style', 'unknown')
         
         # Add to wardrobe
-        wardrobe = load_wardrobe()
-        item = {
-            'id': len(wardrobe['items']) + 1,
+        record = wardrobe_store.add({
             'filename': filename,
             'filepath': filepath,
             'item_type': item_type,
             'color': color,
             'style': style,
             'uploaded_at': datetime.now().isoformat()
-        }
-        wardrobe['items'].append(item)
-        save_wardrobe(wardrobe)
+        })
+        outfit_cache.add_item(record)
+        if item_embeddings.built:
+            item_embeddings.add_item(record)
         
         return jsonify({
             'message': 'File uploaded successfully',
-            'item': item
+            'item': record.to_dict()
         })
     
     return jsonify({'error': 'Invalid file type'}), 400
 
 @app.route('/wardrobe')
 def get_wardrobe():
-    wardrobe = load_wardrobe()
-    return jsonify(wardrobe)
+    return jsonify(wardrobe_store.export())
 
 @app.route('/generate-outfit', methods=['POST'])
 def generate_outfit():
@@ -113,77 +184,169 @@ def generate_outfit():
         'occasion': occasion
     })
 
+@app.route('/generate-outfit/stream', methods=['GET', 'POST'])
+def generate_outfit_stream():
+    """Server-Sent Events variant of /generate-outfit"""
+    data = request.get_json(silent=True) or request.args
+    mood = data.get('mood', 'casual')
+    occasion = data.get('occasion', 'daily')
+    
+    wardrobe = load_wardrobe()
+    
+    if not wardrobe['items']:
+        return jsonify({'error': 'No items in wardrobe'}), 400
+    
+    return Response(
+        stream_with_context(stream_outfit_events(wardrobe['items'], mood, occasion)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_outfit_events(items, mood, occasion):
+    """Yield the rule-engine suggestion at once, then the model's tokens and final outfit.
+    
+    Events: suggestion, token (repeated), outfit, error, done.
+    """
+    yield sse_event('suggestion', {
+        'outfit': generate_fallback_outfit(items, mood, occasion),
+        'mood': mood,
+        'occasion': occasion
+    })
+    
+    if not llm_client.configured:
+        count_fallback('no_api_key')
+        yield sse_event('done', {'source': 'rule_engine'})
+        return
+    
+    request_args, id_map = build_ai_request(mood, occasion)
+    ai_response = llm_cache.get(request_args)
+    if ai_response is None:
+        pieces = []
+        try:
+            for text in llm_client.stream(request_args):
+                pieces.append(text)
+                yield sse_event('token', {'text': text})
+        except CircuitOpenError:
+            count_fallback('circuit_open')
+            yield sse_event('error', {'error': 'AI stylist unavailable, keeping the quick suggestion'})
+            yield sse_event('done', {'source': 'rule_engine'})
+            return
+        except RateLimitExceeded:
+            count_fallback('rate_limited')
+            yield sse_event('error', {'error': 'AI stylist busy, keeping the quick suggestion'})
+            yield sse_event('done', {'source': 'rule_engine'})
+            return
+        except Exception:
+            count_fallback('error')
+            yield sse_event('error', {'error': 'AI stylist failed, keeping the quick suggestion'})
+            yield sse_event('done', {'source': 'rule_engine'})
+            return
+        ai_response = ''.join(pieces)
+        llm_cache.put(request_args, ai_response)
+    
+    yield sse_event('outfit', {
+        'outfit': parse_ai_response(ai_response, id_map),
+        'mood': mood,
+        'occasion': occasion
+    })
+    yield sse_event('done', {'source': 'ai'})
+
 def generate_outfit_with_ai(items, mood, occasion):
     """Generate outfit using AI based on mood and occasion"""
     
-    # Create a prompt for the AI
-    items_description = []
-    for item in items:
-        items_description.append(f"- {item['item_type']} ({item['color']}, {item['style']} style)")
-    
-    items_text = "\n".join(items_description)
-    
-    prompt = f"""
-    You are a fashion stylist. Based on the user's wardrobe and their desired mood/occasion, suggest a complete outfit.
-    
-    User's Wardrobe:
-    {items_text}
-    
-    Desired Mood: {mood}
-    Occasion: {occasion}
-    
-    Please suggest a complete outfit by selecting items from the wardrobe. Consider:
-    1. Color coordination
-    2. Style matching
-    3. Occasion appropriateness
-    4. Mood expression
-    
-    Return your response in JSON format with this structure:
-    {{
-        "outfit": {{
-            "top": "item description",
-            "bottom": "item description", 
-            "shoes": "item description",
-            "accessories": "item description"
-        }},
-        "styling_tips": "Brief styling advice",
-        "reasoning": "Why this outfit works for the mood/occasion"
-    }}
-    """
+    # Without an API key there is nothing worth waiting for
+    if not llm_client.configured:
+        return use_fallback('no_api_key', items, mood, occasion)
+    
+    request_args, id_map = build_ai_request(mood, occasion)
     
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a professional fashion stylist with expertise in creating outfits for different moods and occasions."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.7
+        # Concurrent identical requests wait on a single lookup/call
+        ai_response = single_flight.do(
+            request_key(request_args),
+            lambda: fetch_ai_response(request_args)
         )
+        if ai_response is None:
+            # Hedge: answer from the rule engine now
+            return use_fallback('hedged', items, mood, occasion)
         
-        ai_response = response.choices[0].message.content
-        
-        # Try to parse JSON response
-        try:
-            outfit_data = json.loads(ai_response)
-            return outfit_data
-        except json.JSONDecodeError:
-            # Fallback if AI doesn't return valid JSON
-            return {
-                "outfit": {
-                    "top": "Select a top that matches your mood",
-                    "bottom": "Choose appropriate bottoms",
-                    "shoes": "Pick comfortable shoes",
-                    "accessories": "Add accessories to complete the look"
-                },
-                "styling_tips": ai_response,
-                "reasoning": "AI-generated styling advice"
-            }
+        return parse_ai_response(ai_response, id_map)
     
+    except CircuitOpenError:
+        # OpenAI is failing or slow; don't wait for another timeout
+        return use_fallback('circuit_open', items, mood, occasion)
+    except RateLimitExceeded:
+        return use_fallback('rate_limited', items, mood, occasion)
     except Exception as e:
         # Fallback outfit generation without AI
-        return generate_fallback_outfit(items, mood, occasion)
+        return use_fallback('error', items, mood, occasion)
+
+def build_ai_request(mood, occasion):
+    """Chat-completion arguments for an outfit request, plus the prompt's ID map.
+    
+    Candidates come from the item_embeddings index of the whole wardrobe,
+    which uploads keep up to date, not from a list passed in.
+    """
+    # Shortlist by embedding similarity, then the compact prompt keeps the
+    # best of those per slot within a token budget
+    item_embeddings.ensure_built(lambda: load_wardrobe()['items'])
+    candidates = item_embeddings.shortlist(mood, occasion, PROMPT_SHORTLIST)
+    prompt, id_map = build_prompt(candidates, mood, occasion, PROMPT_TOKEN_BUDGET)
+    
+    request_args = {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": "You are a professional fashion stylist with expertise in creating outfits for different moods and occasions."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 500,
+        "temperature": 0.7
+    }
+    return request_args, id_map
+
+def parse_ai_response(ai_response, id_map):
+    """Turn the model's reply into an outfit, mapping compact IDs back to items"""
+    outfit_data = outfit_parser.parse(ai_response, id_map)
+    if outfit_data is None:
+        # Fallback if nothing in the reply could be used
+        return {
+            "outfit": {
+                "top": "Select a top that matches your mood",
+                "bottom": "Choose appropriate bottoms",
+                "shoes": "Pick comfortable shoes",
+                "accessories": "Add accessories to complete the look"
+            },
+            "styling_tips": ai_response,
+            "reasoning": "AI-generated styling advice"
+        }
+    if 'items' in outfit_data:
+        # Wardrobe items are read-only snapshot views; responses carry plain dicts
+        outfit_data['items'] = {slot: dict(item) for slot, item in outfit_data['items'].items()}
+    return outfit_data
+
+def fetch_ai_response(request_args):
+    """Cached or fresh completion text, or None if the latency SLA passed"""
+    # Identical requests are answered from the cache without a network call
+    ai_response = llm_cache.get(request_args)
+    if ai_response is None:
+        # Wait no longer than the latency SLA; a late answer is still cached
+        ai_response = llm_client.complete_within_sla(
+            request_args,
+            on_result=lambda text: llm_cache.put(request_args, text)
+        )
+    return ai_response
+
+def use_fallback(reason, items, mood, occasion):
+    """Count why the AI was skipped and answer with the rule engine"""
+    count_fallback(reason)
+    return generate_fallback_outfit(items, mood, occasion)
+
+def count_fallback(reason):
+    with fallback_lock:
+        fallback_counts[reason] += 1
 
 def generate_fallback_outfit(items, mood, occasion):
     """Fallback outfit generation when AI is not available"""
@@ -196,6 +359,15 @@ def generate_fallback_outfit(items, mood, occasion):
         "accessories": "Add finishing touches"
     }
     
+    # Fill the slots the wardrobe can cover from the rule engine
+    if outfit_cache.built and outfit_cache.is_preset(mood, occasion):
+        selections = outfit_cache.get(mood, occasion)
+    else:
+        selections = top_outfits(WardrobeIndex(items), mood, occasion)
+    for slot, item in (selections[0]['items'] if selections else {}).items():
+        if item:
+            outfit[slot] = describe_item(item)
+    
     if mood == "formal":
         outfit["styling_tips"] = "Opt for classic pieces in neutral colors. Ensure everything is well-fitted and polished."
     elif mood == "casual":
@@ -213,5 +385,14 @@ def generate_fallback_outfit(items, mood, occasion):
 def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
+# Start warm-up on import, whatever serves `app`
+create_app()
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Only one process may write the wardrobe files
+    try:
+        wardrobe_store.acquire()
+    except WardrobeLocked as e:
+        raise SystemExit(f"❌ {e}")
+    # No reloader: its watcher process would hold the wardrobe lock too
+    create_app().run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
@@ -0,0 +1,159 @@
+"""
+Crash-safe file writes.
+
+Every save goes to a temporary file in the same directory, is fsynced and
+then renamed over the target with os.replace, and the rename is made
+durable by fsyncing the directory. A reader opening the target therefore
+sees either the old file or the new one, never a partial write, and never
+waits for a writer.
+
+With keep_previous, the file being replaced is first hard-linked to
+<path>.prev, so a save that later turns out unreadable (a bad disk block, a
+torn write below the filesystem) still leaves the last good copy to fall
+back to; read_with_fallback() tries the file, then that copy.
+
+Checked JSON files wrap their payload as {"crc32": ..., "data": ...}. The
+CRC is over the payload's canonical serialization, which json round-trips
+exactly, so a corrupted file is caught even when it still parses.
+"""
+
+import json
+import os
+import stat
+import tempfile
+import zlib
+
+PREVIOUS_SUFFIX = '.prev'
+
+# Read once at import: os.umask() can only be read by setting it, which would
+# race with other threads creating files
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+class CorruptFile(ValueError):
+    """A file that exists but cannot be trusted"""
+
+
+def previous_path(path):
+    return path + PREVIOUS_SUFFIX
+
+
+def fsync_directory(path):
+    """Make a rename in path's directory durable"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def keep_as_previous(path):
+    """Hard-link the current file to <path>.prev, replacing the older copy"""
+    if not os.path.exists(path):
+        return
+    prev = previous_path(path)
+    link = prev + '.tmp'
+    try:
+        if os.path.lexists(link):
+            os.remove(link)
+        os.link(path, link)
+    except OSError:
+        # No hard links here: copy instead
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(link, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(link, prev)
+
+
+def file_mode(path):
+    """Permission bits for a rewrite of path: its current ones, else what open() would give"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+def write_atomic(path, data, keep_previous=False):
+    """Replace path with data (bytes or str) so readers never see a partial file.
+
+    The new file keeps the permissions of the one it replaces (mkstemp
+    creates 0600 files).
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, file_mode(path))
+        if keep_previous:
+            keep_as_previous(path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_directory(path)
+
+
+def write_json(path, value, keep_previous=True, **dump_args):
+    """Plain JSON, written atomically"""
+    write_atomic(path, json.dumps(value, **dump_args), keep_previous)
+
+
+def payload_crc(value):
+    return zlib.crc32(json.dumps(value, sort_keys=True, separators=(',', ':')).encode())
+
+
+def encode_checked_json(value):
+    return json.dumps({'crc32': payload_crc(value), 'data': value}, separators=(',', ':'))
+
+
+def decode_checked_json(data):
+    """The payload of a checked JSON file; raises CorruptFile if it does not verify"""
+    try:
+        wrapper = json.loads(data)
+        crc, value = wrapper['crc32'], wrapper['data']
+    except (ValueError, TypeError, KeyError) as e:
+        raise CorruptFile(f"unreadable: {e}") from None
+    if payload_crc(value) != crc:
+        raise CorruptFile("checksum mismatch")
+    return value
+
+
+def write_checked_json(path, value, keep_previous=True):
+    write_atomic(path, encode_checked_json(value), keep_previous)
+
+
+def read_with_fallback(path, decode=json.loads):
+    """(value, path it came from) from path, else from <path>.prev.
+
+    Raises FileNotFoundError when neither exists and CorruptFile when
+    neither decodes.
+    """
+    errors = []
+    for candidate in (path, previous_path(path)):
+        try:
+            with open(candidate, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            continue
+        try:
+            return decode(data), candidate
+        except ValueError as e:
+            errors.append(f"{candidate}: {e}")
+    if errors:
+        raise CorruptFile('; '.join(errors))
+    raise FileNotFoundError(path)
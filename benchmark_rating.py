@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Per-call cost of producing a base outfit rating.
+
+Compares, for every theme/occasion pair of the rating form:
+- branching: the original if/elif chain with list membership tests, building
+  a fresh dict on each call (kept here as the reference)
+- memoized:  that chain behind lru_cache plus copy.deepcopy of the result
+- compiled:  RatingTable.rating(), a dict lookup of a compiled template
+  and a shallow copy
+
+It first checks that the compiled rules give the same rating as the
+reference for every pair, so rating_rules.json edits that change ratings
+show up here too.
+
+Each figure is the best of three runs with the loop overhead subtracted.
+
+    python benchmark_rating.py --calls 200000
+"""
+
+import argparse
+import copy
+import os
+import time
+from functools import lru_cache
+
+from rating_rules import RatingTable
+
+THEMES = ('casual', 'formal', 'party', 'romantic', 'edgy', 'minimalist')
+OCCASIONS = ('daily', 'work', 'date', 'party', 'travel', 'sports',
+             'business', 'romantic dinner', 'special occasion')
+
+
+def branching_rating(theme, occasion, description=''):
+    """Rating as rate_outfit computed it before the rules were compiled"""
+    # Generate a comprehensive outfit rating
+    rating = {
+        "overall_score": 0,
+        "theme_appropriateness": 0,
+        "occasion_suitability": 0,
+        "style_cohesion": 0,
+        "color_coordination": 0,
+        "accessories": 0,
+        "feedback": "",
+        "strengths": [],
+        "improvements": [],
+        "star_rating": 0
+    }
+    # Calculate scores based on theme and occasion
+    if theme == "formal":
+        if occasion in ["work", "office", "business"]:
+            rating["overall_score"] = 85
+            rating["theme_appropriateness"] = 90
+            rating["occasion_suitability"] = 95
+            rating["style_cohesion"] = 80
+            rating["color_coordination"] = 85
+            rating["accessories"] = 75
+            rating["feedback"] = "Excellent formal look! This outfit is perfectly suited for a professional setting. The formal theme aligns beautifully with the work occasion."
+            rating["strengths"] = ["Professional appearance", "Appropriate for business setting", "Clean and polished look"]
+            rating["improvements"] = ["Consider adding a statement accessory", "Ensure proper fit and tailoring"]
+        else:
+            rating["overall_score"] = 70
+            rating["theme_appropriateness"] = 90
+            rating["occasion_suitability"] = 60
+            rating["feedback"] = "Great formal styling, but might be too formal for this occasion. Consider adapting the formality level."
+            rating["strengths"] = ["Well-executed formal look", "Good color coordination"]
+            rating["improvements"] = ["Adjust formality to match occasion", "Consider more casual accessories"]
+    elif theme == "casual":
+        if occasion in ["daily", "travel", "sports"]:
+            rating["overall_score"] = 88
+            rating["theme_appropriateness"] = 95
+            rating["occasion_suitability"] = 90
+            rating["style_cohesion"] = 85
+            rating["color_coordination"] = 80
+            rating["accessories"] = 75
+            rating["feedback"] = "Perfect casual outfit! This look is ideal for everyday wear and matches the occasion beautifully."
+            rating["strengths"] = ["Comfortable and practical", "Great for daily activities", "Relaxed yet put-together"]
+            rating["improvements"] = ["Add a pop of color or pattern", "Consider layering for versatility"]
+        else:
+            rating["overall_score"] = 75
+            rating["theme_appropriateness"] = 90
+            rating["occasion_suitability"] = 70
+            rating["feedback"] = "Nice casual look, but you might want to elevate it slightly for this occasion."
+            rating["strengths"] = ["Comfortable and stylish", "Good casual execution"]
+            rating["improvements"] = ["Add more sophisticated elements", "Consider dressier accessories"]
+    elif theme == "party":
+        if occasion in ["party", "event", "date"]:
+            rating["overall_score"] = 90
+            rating["theme_appropriateness"] = 95
+            rating["occasion_suitability"] = 92
+            rating["style_cohesion"] = 88
+            rating["color_coordination"] = 85
+            rating["accessories"] = 90
+            rating["feedback"] = "Fabulous party look! This outfit is perfect for a fun event and really captures the party vibe."
+            rating["strengths"] = ["Eye-catching and fun", "Perfect for social events", "Great use of accessories"]
+            rating["improvements"] = ["Ensure comfort for dancing", "Consider the venue's dress code"]
+        else:
+            rating["overall_score"] = 65
+            rating["theme_appropriateness"] = 90
+            rating["occasion_suitability"] = 50
+            rating["feedback"] = "Great party styling, but might be too flashy for this occasion. Consider toning it down."
+            rating["strengths"] = ["Bold and confident", "Great party elements"]
+            rating["improvements"] = ["Adapt to occasion appropriateness", "Consider more subtle styling"]
+    elif theme == "romantic":
+        if occasion in ["date", "romantic dinner", "special occasion"]:
+            rating["overall_score"] = 92
+            rating["theme_appropriateness"] = 95
+            rating["occasion_suitability"] = 90
+            rating["style_cohesion"] = 90
+            rating["color_coordination"] = 88
+            rating["accessories"] = 85
+            rating["feedback"] = "Absolutely romantic and elegant! This outfit is perfect for a special date or romantic occasion."
+            rating["strengths"] = ["Elegant and romantic", "Perfect for special moments", "Beautiful color choices"]
+            rating["improvements"] = ["Consider adding delicate jewelry", "Ensure the outfit is comfortable for the evening"]
+        else:
+            rating["overall_score"] = 70
+            rating["theme_appropriateness"] = 90
+            rating["occasion_suitability"] = 60
+            rating["feedback"] = "Beautiful romantic styling, but might be too dressy for this occasion."
+            rating["strengths"] = ["Elegant and feminine", "Great romantic elements"]
+            rating["improvements"] = ["Adjust formality level", "Consider more practical elements"]
+    else:  # Default rating
+        rating["overall_score"] = 75
+        rating["theme_appropriateness"] = 80
+        rating["occasion_suitability"] = 75
+        rating["style_cohesion"] = 70
+        rating["color_coordination"] = 75
+        rating["accessories"] = 70
+        rating["feedback"] = "Nice outfit! It shows good style sense and works well for the intended occasion."
+        rating["strengths"] = ["Good overall styling", "Appropriate for the occasion"]
+        rating["improvements"] = ["Consider adding more personality", "Experiment with accessories"]
+    # Calculate star rating (1-5 stars)
+    rating["star_rating"] = max(1, min(5, round(rating["overall_score"] / 20)))
+    # Add personalized feedback based on description
+    if description:
+        rating["feedback"] += f" Based on your description '{description}', this outfit shows great attention to detail."
+    return rating
+
+
+memoized_rating = lru_cache(maxsize=256)(branching_rating)
+
+
+def per_call_ns(rate, pairs, calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        theme, occasion = pairs[i % len(pairs)]
+        rate(theme, occasion)
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def no_op(theme, occasion):
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark base rating lookup")
+    parser.add_argument('--calls', type=int, default=100000, help="calls per implementation")
+    parser.add_argument('--rules', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rating_rules.json'),
+                        help="rules file to compile")
+    args = parser.parse_args()
+
+    table = RatingTable(args.rules)
+    table.load()
+    pairs = [(theme, occasion) for theme in THEMES for occasion in OCCASIONS]
+
+    mismatches = [pair for pair in pairs if table.rating(*pair) != branching_rating(*pair)]
+    if mismatches:
+        print(f"⚠️  Compiled rules differ from the reference for {len(mismatches)} pairs, e.g. {mismatches[0]}")
+    else:
+        print(f"✅ Compiled rules match the reference for all {len(pairs)} pairs")
+
+    implementations = {
+        'branching': branching_rating,
+        'memoized': lambda theme, occasion: copy.deepcopy(memoized_rating(theme, occasion)),
+        'compiled': table.rating
+    }
+    # Loop and call overhead, subtracted so the numbers are the work itself
+    overhead = min(per_call_ns(no_op, pairs, args.calls) for _ in range(3))
+    results = {
+        name: min(per_call_ns(rate, pairs, args.calls) for _ in range(3)) - overhead
+        for name, rate in implementations.items()
+    }
+    print(f"{'implementation':<16} {'ns/call':>10} {'speedup':>8}")
+    for name, ns in results.items():
+        print(f"{name:<16} {ns:>10.0f} {results['branching'] / ns:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
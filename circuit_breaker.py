@@ -0,0 +1,95 @@
+"""
+Circuit breaker for the OpenAI integration.
+
+Closed: calls flow and outcomes are counted. After `failure_threshold`
+consecutive failures, where a call slower than `slow_call_seconds` also
+counts as a failure, the breaker opens and callers are refused at once so
+they can serve the rule-engine fallback without waiting for a timeout.
+After `cooldown` seconds it turns half-open and lets a limited number of
+probe calls through: a successful probe closes it again, a failed one
+re-opens it for another cooldown.
+"""
+
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling out while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure / slow-call breaker with half-open probes"""
+
+    def __init__(self, failure_threshold=5, slow_call_seconds=10.0, cooldown=30.0, half_open_probes=1):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.lock = threading.Lock()
+        self.metrics = {
+            'trips': 0,
+            'rejected': 0,
+            'probes': 0,
+            'slow_calls': 0
+        }
+
+    def allow(self):
+        """Whether a call may go out now; reserves a probe slot when half-open"""
+        with self.lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    self.metrics['rejected'] += 1
+                    return False
+                self.state = HALF_OPEN
+                self.probes = 0
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_probes:
+                    self.metrics['rejected'] += 1
+                    return False
+                self.probes += 1
+                self.metrics['probes'] += 1
+            return True
+
+    def cancel(self):
+        """Give back a probe slot for a call that never went out"""
+        with self.lock:
+            if self.state == HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def record_success(self, latency):
+        if latency > self.slow_call_seconds:
+            with self.lock:
+                self.metrics['slow_calls'] += 1
+            self.record_failure()
+            return
+        with self.lock:
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.probes = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.metrics['trips'] += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probes = 0
+
+    def stats(self):
+        with self.lock:
+            report = dict(self.metrics)
+            report['state'] = self.state
+            report['consecutive_failures'] = self.failures
+            return report
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the outfit engines.
+
+Replays a fixed corpus of (wardrobe, mood, occasion) cases through
+- rule_engine: FashionStylistHandler.generate_outfit (stdlib server)
+- fallback:    generate_fallback_outfit (app.py)
+- ai:          generate_outfit_with_ai (app.py, against mock_llm_server)
+and records, per engine:
+- latency percentiles per call
+- fill rate: share of slots the wardrobe can fill that were filled with a real item
+- rule consistency: rule-engine score of the chosen items over the best
+  score the wardrobe allows (1.0 means no better choice by the rules)
+- diversity: distinct outfits per wardrobe across moods/occasions, and
+  the share of each wardrobe's distinct pieces that were ever chosen
+
+The corpus is generated from a seed, so reports from different commits are
+comparable; each report records the corpus fingerprint. Pass --baseline
+with an earlier report to print the differences.
+
+    python evaluate_engines.py --output eval_reports/today.json --baseline eval_reports/last.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from load_test import percentile, synthetic_wardrobe
+from mock_llm_server import MockLLM, start_in_thread
+from outfit_cache import PRESET_MOODS, PRESET_OCCASIONS
+from outfit_engine import SLOTS, describe_item, score_item, slot_for
+
+DEFAULT_SIZES = (8, 40, 200, 1000)
+ENGINES = ('rule_engine', 'fallback', 'ai')
+
+
+def build_corpus(seed=7, sizes=DEFAULT_SIZES):
+    """[{'wardrobe': [...], 'cases': [(mood, occasion), ...]}] for each wardrobe size"""
+    return [
+        {
+            'wardrobe': synthetic_wardrobe(size, seed + size)['items'],
+            'cases': [(mood, occasion) for mood in PRESET_MOODS for occasion in PRESET_OCCASIONS]
+        }
+        for size in sizes
+    ]
+
+
+def corpus_fingerprint(corpus):
+    return hashlib.sha256(json.dumps(corpus, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def load_engines(mock_server):
+    """Import both servers against the mock LLM in a scratch directory.
+
+    Returns ({name: fn(items, mood, occasion)}, prepare(items), workdir);
+    prepare rebuilds the app's per-wardrobe indexes, as startup warm-up
+    would, and the caller removes workdir when done.
+    """
+    workdir = tempfile.mkdtemp(prefix='fashion-eval-')
+    os.environ.update({
+        'OPENAI_API_KEY': 'mock-key',
+        'OPENAI_BASE_URL': mock_server.base_url,
+        'LLM_CACHE_PATH': os.path.join(workdir, 'llm_cache.sqlite3'),
+        # Measure the engines, not the outbound limits
+        'LLM_LATENCY_SLA': '30',
+        'LLM_RATE_LIMIT': '1000',
+        'LLM_RATE_BURST': '1000',
+        'WARMUP': '0'
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    import app
+    import fashion_stylist_with_uploads as stdlib_server
+
+    # generate_outfit only uses helper methods, so no request or socket is needed
+    handler = stdlib_server.FashionStylistHandler.__new__(stdlib_server.FashionStylistHandler)
+
+    def prepare(items):
+        app.outfit_cache.build(items)
+        app.item_embeddings.build(items)
+
+    engines = {
+        'rule_engine': handler.generate_outfit,
+        'fallback': app.generate_fallback_outfit,
+        'ai': app.generate_outfit_with_ai
+    }
+    return engines, prepare, workdir
+
+
+def chosen_items(result, items, mood, occasion):
+    """{slot: item} an engine picked, resolving descriptions against the wardrobe"""
+    if isinstance(result.get('items'), dict):
+        return dict(result['items'])
+    slots = result['outfit'] if isinstance(result.get('outfit'), dict) else result
+    by_text = {}
+    by_color_type = {}
+    for item in items:
+        by_text.setdefault(describe_item(item), item)
+        by_color_type.setdefault(f"{item['color']} {item['item_type']}", []).append(item)
+    chosen = {}
+    for slot in SLOTS:
+        text = slots.get(slot)
+        if not isinstance(text, str):
+            continue
+        item = by_text.get(text)
+        if item is None and ' - ' in text:
+            # The rule engine swaps the style for advice after " - "; it chose
+            # the best-scoring piece of that color and type
+            matches = by_color_type.get(text.split(' - ')[0], [])
+            item = max(matches, key=lambda match: score_item(match, mood, occasion), default=None)
+        if item and slot_for(item) == slot:
+            chosen[slot] = item
+    return chosen
+
+
+def evaluate_engine(engine, corpus, prepare):
+    latencies = []
+    fill_rates = []
+    consistency = []
+    outfit_variety = []
+    coverage = []
+    answered_by_ai = 0
+    cases = 0
+
+    for entry in corpus:
+        items = entry['wardrobe']
+        prepare(items)
+        pieces = set()
+        for item in items:
+            slot = slot_for(item)
+            if slot:
+                pieces.add(describe_item(item))
+        fillable = [slot for slot in SLOTS if any(slot_for(item) == slot for item in items)]
+        outfits = set()
+        used = set()
+
+        for mood, occasion in entry['cases']:
+            started = time.perf_counter()
+            result = engine(items, mood, occasion)
+            latencies.append(time.perf_counter() - started)
+            cases += 1
+            if isinstance(result.get('items'), dict):
+                answered_by_ai += 1
+
+            chosen = chosen_items(result, items, mood, occasion)
+            fill_rates.append(len(chosen) / len(fillable) if fillable else 1.0)
+
+            best_total = sum(
+                max(score_item(item, mood, occasion) for item in items if slot_for(item) == slot)
+                for slot in fillable
+            )
+            chosen_total = sum(score_item(item, mood, occasion) for item in chosen.values())
+            consistency.append(chosen_total / best_total if best_total else 1.0)
+
+            outfit = tuple(describe_item(chosen[slot]) if slot in chosen else None for slot in SLOTS)
+            outfits.add(outfit)
+            used.update(describe_item(item) for item in chosen.values())
+
+        outfit_variety.append(len(outfits) / len(entry['cases']))
+        coverage.append(len(used) / len(pieces) if pieces else 0.0)
+
+    latencies.sort()
+    return {
+        'cases': cases,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 3),
+            'p90': round(percentile(latencies, 90) * 1000, 3),
+            'p99': round(percentile(latencies, 99) * 1000, 3),
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0
+        },
+        'fill_rate': round(sum(fill_rates) / len(fill_rates), 4),
+        'rule_consistency': round(sum(consistency) / len(consistency), 4),
+        'outfit_variety': round(sum(outfit_variety) / len(outfit_variety), 4),
+        'piece_coverage': round(sum(coverage) / len(coverage), 4),
+        'ai_answered': round(answered_by_ai / cases, 4) if cases else 0.0
+    }
+
+
+def compare(report, baseline):
+    """Lines describing how each engine's numbers moved against a baseline report"""
+    lines = []
+    if report['corpus']['fingerprint'] != baseline.get('corpus', {}).get('fingerprint'):
+        lines.append("⚠️  Baseline used a different corpus; differences are not like for like")
+    for name, result in report['engines'].items():
+        before = baseline.get('engines', {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in ('p50', 'p99'):
+            old, new = before['latency_ms'][metric], result['latency_ms'][metric]
+            changes.append(f"{metric} {old} -> {new} ms")
+        for metric in ('fill_rate', 'rule_consistency', 'outfit_variety', 'piece_coverage'):
+            old, new = before[metric], result[metric]
+            if old != new:
+                changes.append(f"{metric} {old} -> {new}")
+        lines.append(f"{name}: " + ', '.join(changes))
+    return lines
+
+
+def print_report(report):
+    print(f"📊 Engine evaluation ({report['corpus']['cases']} cases, corpus {report['corpus']['fingerprint']})")
+    print("=" * 78)
+    print(f"{'engine':<12} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'fill':>6} {'rules':>6} {'variety':>8} {'coverage':>9}")
+    for name, result in report['engines'].items():
+        latency = result['latency_ms']
+        print(f"{name:<12} {latency['p50']:>9} {latency['p90']:>9} {latency['p99']:>9} "
+              f"{result['fill_rate']:>6} {result['rule_consistency']:>6} "
+              f"{result['outfit_variety']:>8} {result['piece_coverage']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare outfit engines on a fixed corpus")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="comma-separated subset of " + ', '.join(ENGINES))
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES), help="wardrobe sizes in the corpus")
+    parser.add_argument('--seed', type=int, default=7, help="corpus seed; keep it fixed to compare reports")
+    parser.add_argument('--latency', default='fixed:0.05', help="mock LLM latency spec (see mock_llm_server)")
+    parser.add_argument('--output', help="report path (default eval_reports/report-<timestamp>.json)")
+    parser.add_argument('--baseline', help="earlier report to compare against")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.engines.split(',') if name.strip()]
+    unknown = [name for name in names if name not in ENGINES]
+    if unknown:
+        parser.error(f"Unknown engines: {', '.join(unknown)}")
+
+    output = os.path.abspath(args.output or os.path.join(
+        'eval_reports', f"report-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    corpus = build_corpus(args.seed, [int(size) for size in args.sizes.split(',')])
+    mock_server = start_in_thread(MockLLM(latency=args.latency, seed=args.seed))
+    workdir = None
+    try:
+        engines, prepare, workdir = load_engines(mock_server)
+        report = {
+            'created_at': datetime.now().isoformat(),
+            'corpus': {
+                'seed': args.seed,
+                'sizes': [len(entry['wardrobe']) for entry in corpus],
+                'cases': sum(len(entry['cases']) for entry in corpus),
+                'fingerprint': corpus_fingerprint(corpus)
+            },
+            'mock_llm_latency': args.latency,
+            'engines': {name: evaluate_engine(engines[name], corpus, prepare) for name in names}
+        }
+    finally:
+        mock_server.shutdown()
+        if workdir:
+            os.chdir(os.path.dirname(workdir))
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    if baseline:
+        print()
+        for line in compare(report, baseline):
+            print(line)
+    print(f"\n📄 Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,94 @@ import http.server
 import socketserver
 import urllib.parse
 import shutil
+import time
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
 
+from image_features import ImageFeaturePool, adjust_rating
+from outfit_engine import MAX_OUTFITS, WardrobeIndex, describe_item, slot_for, top_outfits
+from outfit_cache import TOP_K, OutfitCache
+from outfit_planner import plan_outfits
+from outfit_ranker import RERANK_CANDIDATES, OutfitRanker, item_snapshot
+from rating_jobs import RatingJobs
+from rating_rules import RatingTable
+from rating_stats import RatingStats
+from rating_store import RatingStore
+from wardrobe_store import WardrobeLocked, WardrobeStore
+from warmup import WarmUp
+from wear_history import WearHistory
+
+# Batch outfit generation limits
+MAX_BATCH_QUERIES = 100
+BATCH_WORKERS = 4
+
+# The wardrobe: a memory-mapped snapshot plus a journal of changes;
+# wardrobe.json is imported on first start
+wardrobe_store = WardrobeStore.from_env()
+
+# Shared wear log, loaded at startup
+wear_history = WearHistory('wear_log.jsonl')
+
+# Least recently worn items per slot that prefer_unworn outfits draw from
+UNWORN_CANDIDATES = 5
+
+# Materialized top outfits for the preset moods and occasions
+outfit_cache = OutfitCache()
+
+# Outfit preferences learned from rated photos of suggested outfits
+outfit_ranker = OutfitRanker('ratings/ranker.npz')
+
+# Append-only rating history, indexed by theme, occasion and day, with
+# running score aggregates for /ratings/stats; both followers are updated as
+# ratings are saved
+rating_store = RatingStore('ratings', stats=RatingStats('ratings/stats.json'), followers=(outfit_ranker,))
+
+# Worker processes that measure uploaded outfit photos (IMAGE_FEATURE_WORKERS=0 to disable)
+image_features = ImageFeaturePool.from_env()
+
+# Background rating jobs, followed by polling or server-sent events
+rating_jobs = RatingJobs.from_env()
+
+# Seconds between keep-alive comments on a job event stream, and the longest
+# a ?wait=1 upload waits for its rating before it gets the job URL instead
+RATING_KEEPALIVE = 15
+RATING_WAIT_TIMEOUT = 60
+
+# Theme/occasion rating rules, compiled from rating_rules.json and reloaded
+# when the file changes
+rating_table = RatingTable(os.getenv('RATING_RULES_PATH') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'rating_rules.json'))
+
+def job_view(job):
+    """Public fields of a rating job, with the rating once it is done"""
+    view = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'created_at': datetime.fromtimestamp(job['created_at']).isoformat(),
+        'finished_at': datetime.fromtimestamp(job['finished_at']).isoformat() if job['finished_at'] else None
+    }
+    if job['status'] == 'done':
+        view.update(job['result'])
+    elif job['status'] == 'failed':
+        view['error'] = job['error']
+    return view
+
+def read_wardrobe():
+    """Wardrobe items, read lazily from the snapshot"""
+    return {"items": wardrobe_store.items()}
+
+
+# Startup warm-up of the wear index, rating history, preset outfits and
+# rating table; the preset outfits are built once the wardrobe is loaded
+warm_up = WarmUp({
+    'wear_history': wear_history.load,
+    'rating_store': rating_store.load,
+    'wardrobe': wardrobe_store.load,
+    'outfits': lambda: outfit_cache.ensure_built(lambda: read_wardrobe()['items']),
+    'ratings': rating_table.load
+}, after={'outfits': ('wardrobe',)})
+
 class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/':
@@ -25,11 +110,20 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            wardrobe = self.load_wardrobe()
-            self.wfile.write(json.dumps(wardrobe).encode())
+            self.wfile.write(json.dumps(wardrobe_store.export()).encode())
         elif self.path.startswith('/uploads/'):
             filename = self.path[9:]  # Remove '/uploads/'
             self.serve_uploaded_file(filename)
+        elif self.path.startswith('/wear/least-recent'):
+            self.handle_least_recent()
+        elif self.path == '/ratings' or self.path.startswith('/ratings?'):
+            self.handle_rating_history()
+        elif self.path.startswith('/ratings/stats'):
+            self.handle_rating_stats()
+        elif self.path.startswith('/rate-outfit/jobs/'):
+            self.handle_rating_job()
+        elif self.path == '/ready':
+            self.handle_ready()
         else:
             super().do_GET()
     
@@ -38,7 +132,15 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
             self.handle_upload()
         elif self.path == '/generate-outfit':
             self.handle_generate_outfit()
-        elif self.path == '/rate-outfit':
+        elif self.path == '/generate-outfits/batch':
+            self.handle_generate_outfits_batch()
+        elif self.path == '/plan':
+            self.handle_plan()
+        elif self.path == '/wear':
+            self.handle_wear()
+        elif self.path == '/remove-item':
+            self.handle_remove_item()
+        elif self.path == '/rate-outfit' or self.path.startswith('/rate-outfit?'):
             self.handle_rate_outfit()
         else:
             self.send_error(404)
@@ -95,18 +197,16 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
                 f.write(file_data['data'])
             
             # Add to wardrobe
-            wardrobe = self.load_wardrobe()
-            item = {
-                'id': len(wardrobe['items']) + 1,
+            record = wardrobe_store.add({
                 'filename': safe_filename,
                 'filepath': filepath,
                 'item_type': form_data.get('item_type', 'unknown'),
                 'color': form_data.get('color', 'unknown'),
                 'style': form_data.get('style', 'unknown'),
                 'uploaded_at': datetime.now().isoformat()
-            }
-            wardrobe['items'].append(item)
-            self.save_wardrobe(wardrobe)
+            })
+            item = record.to_dict()
+            outfit_cache.add_item(record)
             
             # Send response
             self.send_response(200)
@@ -172,6 +272,137 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
             
             mood = data.get('mood', 'casual')
             occasion = data.get('occasion', 'daily')
+            prefer_unworn = bool(data.get('prefer_unworn', False))
+            
+            # Presets are served straight from the materialized outfit lists
+            selections = None if prefer_unworn else self.preset_outfits(mood, occasion, RERANK_CANDIDATES)
+            if selections:
+                selection = self.personalize(selections, mood, occasion)[0]
+            else:
+                wardrobe = self.load_wardrobe()
+                
+                if not wardrobe['items']:
+                    self.send_error(400, "No items in wardrobe")
+                    return
+                
+                # Generate outfit
+                selection = self.best_selection(wardrobe['items'], mood, occasion, prefer_unworn)
+            outfit = self.format_outfit(selection, mood, occasion)
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            response = {
+                'outfit': outfit,
+                'item_ids': self.outfit_item_ids(selection),
+                'mood': mood,
+                'occasion': occasion
+            }
+            self.wfile.write(json.dumps(response).encode())
+            
+        except Exception as e:
+            self.send_error(500, f"Generation failed: {str(e)}")
+    
+    def handle_generate_outfits_batch(self):
+        """Handle many mood/occasion queries against one wardrobe snapshot.
+        
+        Results are streamed back as NDJSON, one line per query in completion
+        order, each tagged with the index of the query it answers.
+        """
+        try:
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            data = json.loads(post_data.decode())
+            queries = data.get('queries', [])
+            
+            if not isinstance(queries, list) or not queries:
+                self.send_error(400, "No queries given")
+                return
+            if len(queries) > MAX_BATCH_QUERIES:
+                self.send_error(400, f"At most {MAX_BATCH_QUERIES} queries per batch")
+                return
+            for position, query in enumerate(queries):
+                problem = self.batch_query_problem(query)
+                if problem:
+                    self.send_error(400, f"Query {position}: {problem}")
+                    return
+            
+            wardrobe = self.load_wardrobe()
+            
+            if not wardrobe['items']:
+                self.send_error(400, "No items in wardrobe")
+                return
+            
+            # One snapshot and index build shared by every query
+            index = WardrobeIndex(wardrobe['items'])
+        except Exception as e:
+            self.send_error(500, f"Generation failed: {str(e)}")
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(queries))) as pool:
+            futures = {
+                pool.submit(self.answer_batch_query, index, query): position
+                for position, query in enumerate(queries)
+            }
+            for future in as_completed(futures):
+                try:
+                    line = future.result()
+                except Exception as e:
+                    line = {'error': f"Generation failed: {str(e)}"}
+                line['index'] = futures[future]
+                self.wfile.write((json.dumps(line) + '\n').encode())
+                self.wfile.flush()
+    
+    def batch_query_problem(self, query):
+        """Why a batch query cannot be answered, or None"""
+        if not isinstance(query, dict):
+            return "must be an object"
+        k = query.get('k', 1)
+        if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= MAX_OUTFITS:
+            return f"k must be an integer from 1 to {MAX_OUTFITS}"
+        return None
+    
+    def answer_batch_query(self, index, query):
+        """Score one batch query against a shared wardrobe index"""
+        mood = query.get('mood', 'casual')
+        occasion = query.get('occasion', 'daily')
+        k = query.get('k', 1)
+        candidates = max(int(k), RERANK_CANDIDATES)
+        if query.get('prefer_unworn'):
+            selections = top_outfits(index, mood, occasion, candidates, self.last_worn_lookup(),
+                                     self.unworn_candidates(index))
+        else:
+            selections = self.preset_outfits(mood, occasion, candidates) or top_outfits(index, mood, occasion, candidates)
+        selections = self.personalize(selections, mood, occasion)[:int(k)]
+        outfits = [
+            {
+                'outfit': self.format_outfit(selection, mood, occasion),
+                'item_ids': self.outfit_item_ids(selection),
+                'score': selection['score']
+            }
+            for selection in selections
+        ]
+        return {'mood': mood, 'occasion': occasion, 'outfits': outfits}
+    
+    def handle_plan(self):
+        """Handle multi-day outfit planning with no-repeat constraints"""
+        try:
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            data = json.loads(post_data.decode())
+            days = data.get('days', [])
+            repeat_gap = data.get('repeat_gap', 7)
+            
+            if not isinstance(days, list) or not days:
+                self.send_error(400, "No days to plan")
+                return
             
             wardrobe = self.load_wardrobe()
             
@@ -179,8 +410,11 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
                 self.send_error(400, "No items in wardrobe")
                 return
             
-            # Generate outfit
-            outfit = self.generate_outfit(wardrobe['items'], mood, occasion)
+            try:
+                plan = plan_outfits(WardrobeIndex(wardrobe['items']), days, repeat_gap)
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
             
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
@@ -188,17 +422,178 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
             self.end_headers()
             
             response = {
-                'outfit': outfit,
-                'mood': mood,
-                'occasion': occasion
+                'repeat_gap': repeat_gap,
+                'days': []
             }
+            for day, selection in zip(days, plan):
+                mood = day.get('mood', 'casual')
+                occasion = day.get('occasion', 'daily')
+                response['days'].append({
+                    'date': day.get('date'),
+                    'mood': mood,
+                    'occasion': occasion,
+                    'outfit': self.format_outfit(selection, mood, occasion),
+                    'item_ids': self.outfit_item_ids(selection),
+                    'score': selection['score'],
+                    'unfilled': selection['unfilled']
+                })
             self.wfile.write(json.dumps(response).encode())
             
         except Exception as e:
-            self.send_error(500, f"Generation failed: {str(e)}")
+            self.send_error(500, f"Planning failed: {str(e)}")
+    
+    def handle_wear(self):
+        """Record the items of an outfit as worn"""
+        try:
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            data = json.loads(post_data.decode())
+            item_ids = data.get('item_ids', [])
+            
+            if not isinstance(item_ids, list) or not item_ids:
+                self.send_error(400, "No items given")
+                return
+            
+            # Look up each item's slot so it lands in the right index
+            items_by_id = {item.get('id'): item for item in self.load_wardrobe()['items']}
+            worn = []
+            for item_id in item_ids:
+                item = items_by_id.get(item_id)
+                if not item or not slot_for(item):
+                    self.send_error(400, f"Unknown wardrobe item: {item_id}")
+                    return
+                worn.append({'id': item_id, 'slot': slot_for(item)})
+            
+            worn_at = None
+            if data.get('worn_at'):
+                worn_at = datetime.fromisoformat(data['worn_at']).timestamp()
+            entry = wear_history.record(worn, worn_at)
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            response = {
+                'message': 'Outfit recorded as worn',
+                'worn_at': datetime.fromtimestamp(entry['worn_at']).isoformat(),
+                'items': entry['items']
+            }
+            self.wfile.write(json.dumps(response).encode())
+            
+        except Exception as e:
+            self.send_error(500, f"Recording wear failed: {str(e)}")
+    
+    def handle_least_recent(self):
+        """List the least recently worn items of a slot"""
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        slot = query.get('slot', ['top'])[0]
+        try:
+            limit = int(query.get('limit', ['5'])[0])
+        except ValueError:
+            self.send_error(400, "Invalid limit")
+            return
+        
+        # Never-worn items of the slot lead, with no last_worn time
+        item_ids = [item.get('id') for item in self.load_wardrobe()['items'] if slot_for(item) == slot]
+        least_recent = wear_history.least_recent(slot, limit, item_ids)
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        response = {
+            'slot': slot,
+            'items': [
+                {'id': item_id, 'last_worn': datetime.fromtimestamp(worn_at).isoformat() if worn_at else None}
+                for worn_at, item_id in least_recent
+            ]
+        }
+        self.wfile.write(json.dumps(response).encode())
+    
+    def handle_rating_history(self):
+        """List past ratings, newest first, filtered by theme, occasion and day"""
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        filters = {
+            name: query[name][0]
+            for name in ('theme', 'occasion', 'since', 'until')
+            if name in query
+        }
+        try:
+            limit = int(query.get('limit', ['50'])[0])
+        except ValueError:
+            self.send_error(400, "Invalid limit")
+            return
+        
+        try:
+            ratings = rating_store.query(limit=limit, **filters)
+        except Exception as e:
+            self.send_error(500, f"Rating history failed: {str(e)}")
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps({'ratings': ratings, 'total': rating_store.count()}).encode())
+    
+    def handle_rating_stats(self):
+        """Rating counts, means and histograms overall, per theme, occasion and day/week"""
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        period = query.get('period', ['week'])[0]
+        try:
+            buckets = int(query.get('buckets', ['12'])[0])
+            report = rating_store.stats_report(period, buckets)
+        except ValueError as e:
+            self.send_error(400, f"Invalid stats query: {str(e)}")
+            return
+        except Exception as e:
+            self.send_error(500, f"Rating stats failed: {str(e)}")
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(report).encode())
+    
+    def handle_remove_item(self):
+        """Remove an item from the wardrobe"""
+        try:
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            data = json.loads(post_data.decode())
+            item_id = data.get('id')
+            
+            if not wardrobe_store.remove(item_id):
+                self.send_error(404, f"Unknown wardrobe item: {item_id}")
+                return
+            
+            outfit_cache.remove_item(item_id)
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            response = {
+                'message': 'Item removed from wardrobe',
+                'id': item_id
+            }
+            self.wfile.write(json.dumps(response).encode())
+            
+        except Exception as e:
+            self.send_error(500, f"Removal failed: {str(e)}")
+    
+    def handle_ready(self):
+        """Readiness probe: 503 until the startup warm-up has finished"""
+        status = warm_up.status()
+        self.send_response(200 if status['ready'] else 503)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(status).encode())
     
     def handle_rate_outfit(self):
-        """Handle outfit rating"""
+        """Store the outfit photo and start a rating job (?wait=1 to wait for the rating)"""
         try:
             # Create uploads directory if it doesn't exist
             os.makedirs('uploads', exist_ok=True)
@@ -236,51 +631,150 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
                 self.send_error(400, "No outfit photo uploaded")
                 return
             
-            # Save outfit photo
+            # Items of the suggested outfit the photo shows, if the user says so
+            outfit_items = []
+            if form_data.get('item_ids', '').strip():
+                items_by_id = {str(item.get('id')): item for item in self.load_wardrobe()['items']}
+                for item_id in form_data['item_ids'].split(','):
+                    item = items_by_id.get(item_id.strip())
+                    if not item:
+                        self.send_error(400, f"Unknown wardrobe item: {item_id.strip()}")
+                        return
+                    outfit_items.append(item_snapshot(item))
+            
+            # Save outfit photo; the job id keeps same-second uploads apart
             filename = self.extract_filename(file_data['headers'])
             if not filename:
                 filename = 'outfit_photo.jpg'
             
+            job_id = rating_jobs.new_id()
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_filename = f"outfit_{timestamp}_{filename}"
+            safe_filename = f"outfit_{timestamp}_{job_id}_{filename}"
             filepath = os.path.join('uploads', safe_filename)
             
+            # Make the photo durable before acknowledging the upload
             with open(filepath, 'wb') as f:
                 f.write(file_data['data'])
+                f.flush()
+                os.fsync(f.fileno())
             
-            # Get rating parameters
-            theme = form_data.get('theme', 'casual')
-            occasion = form_data.get('occasion', 'daily')
-            description = form_data.get('description', '')
+            # Get rating parameters (the page's form names them outfit_*)
+            theme = form_data.get('theme') or form_data.get('outfit_theme') or 'casual'
+            occasion = form_data.get('occasion') or form_data.get('outfit_occasion') or 'daily'
+            description = form_data.get('description') or form_data.get('outfit_description', '')
             
-            # Generate outfit rating
-            rating = self.rate_outfit(theme, occasion, description, safe_filename)
+            # Score in the background
+            rating_jobs.submit(job_id, self.score_outfit, theme, occasion, description, safe_filename, outfit_items)
             
-            # Save rating to history
-            self.save_rating({
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            if query.get('wait', ['0'])[0] not in ('', '0'):
+                # Synchronous clients: answer with the rating, as before jobs,
+                # unless it takes longer than one overall deadline
+                deadline = time.monotonic() + RATING_WAIT_TIMEOUT
+                job = rating_jobs.wait(job_id, timeout=RATING_WAIT_TIMEOUT)
+                while job and job['status'] not in ('done', 'failed'):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    job = rating_jobs.wait(job_id, job['version'], timeout=remaining)
+                if job is None or job['status'] == 'failed':
+                    self.send_error(500, f"Rating failed: {job['error'] if job else 'job expired'}")
+                    return
+                if job['status'] == 'done':
+                    self.send_json(200, job['result'])
+                    return
+            
+            self.send_json(202, {
+                'message': 'Outfit received, rating in progress',
+                'job_id': job_id,
                 'filename': safe_filename,
-                'theme': theme,
-                'occasion': occasion,
-                'description': description,
-                'rating': rating,
-                'rated_at': datetime.now().isoformat()
+                'status_url': f"/rate-outfit/jobs/{job_id}",
+                'events_url': f"/rate-outfit/jobs/{job_id}/events"
             })
             
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            response = {
-                'message': 'Outfit rated successfully',
-                'rating': rating,
-                'filename': safe_filename
-            }
-            self.wfile.write(json.dumps(response).encode())
-            
         except Exception as e:
             self.send_error(500, f"Rating failed: {str(e)}")
     
+    def score_outfit(self, theme, occasion, description, filename, items=()):
+        """Rating job: score the stored photo, save the rating and return the response body"""
+        rating = self.rate_outfit(theme, occasion, description, filename)
+        
+        # Save rating to history; ratings with outfit items also train the ranker
+        rating_data = {
+            'filename': filename,
+            'theme': theme,
+            'occasion': occasion,
+            'description': description,
+            'rating': rating,
+            'rated_at': datetime.now().isoformat()
+        }
+        if items:
+            rating_data['items'] = list(items)
+        self.save_rating(rating_data)
+        
+        return {
+            'message': 'Outfit rated successfully',
+            'rating': rating,
+            'filename': filename
+        }
+    
+    def send_json(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+    
+    def handle_rating_job(self):
+        """Poll a rating job, or stream its progress as server-sent events"""
+        job_path = urllib.parse.urlparse(self.path).path[len('/rate-outfit/jobs/'):]
+        job_id, _, stream = job_path.partition('/')
+        if stream not in ('', 'events'):
+            self.send_error(404)
+            return
+        
+        job = rating_jobs.get(job_id)
+        if job is None:
+            self.send_error(404, "Unknown or expired rating job")
+            return
+        
+        if not stream:
+            self.send_json(200, job_view(job))
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        try:
+            version = -1
+            while job is not None:
+                if job['version'] > version:
+                    version = job['version']
+                    self.send_event('status', {'job_id': job_id, 'status': job['status']})
+                    if job['status'] == 'done':
+                        self.send_event('rating', job['result'])
+                        break
+                    if job['status'] == 'failed':
+                        self.send_event('error', {'error': job['error']})
+                        break
+                else:
+                    # Comment line keeps proxies from closing an idle stream
+                    self.wfile.write(b': keep-alive\n\n')
+                    self.wfile.flush()
+                job = rating_jobs.wait(job_id, version, timeout=RATING_KEEPALIVE)
+            else:
+                self.send_event('error', {'error': 'Rating job expired'})
+            self.send_event('done', {})
+        except (BrokenPipeError, ConnectionResetError):
+            # Client stopped listening; the job still finishes and is saved
+            pass
+    
+    def send_event(self, event, data):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+    
     def serve_uploaded_file(self, filename):
         """Serve uploaded files"""
         filepath = os.path.join('uploads', filename)
@@ -299,20 +793,52 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
     
     def load_wardrobe(self):
         """Load wardrobe data"""
-        try:
-            with open('wardrobe.json', 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {"items": []}
-    
-    def save_wardrobe(self, wardrobe):
-        """Save wardrobe data"""
-        with open('wardrobe.json', 'w') as f:
-            json.dump(wardrobe, f, indent=2)
+        return read_wardrobe()
     
-    def generate_outfit(self, items, mood, occasion):
+    def generate_outfit(self, items, mood, occasion, prefer_unworn=False):
         """Generate outfit based on items, mood, and occasion"""
-        # Simple rule-based outfit generation
+        return self.format_outfit(self.best_selection(items, mood, occasion, prefer_unworn), mood, occasion)
+    
+    def best_selection(self, items, mood, occasion, prefer_unworn=False):
+        """Best rule-engine outfit after re-ranking by learned preferences"""
+        index = WardrobeIndex(items)
+        if prefer_unworn:
+            selections = top_outfits(index, mood, occasion, RERANK_CANDIDATES, self.last_worn_lookup(),
+                                     self.unworn_candidates(index))
+        else:
+            selections = top_outfits(index, mood, occasion, RERANK_CANDIDATES)
+        return self.personalize(selections, mood, occasion)[0]
+    
+    def personalize(self, selections, mood, occasion):
+        """Reorder rule-engine candidates by what past ratings liked"""
+        rating_store.ensure_loaded()
+        return outfit_ranker.rerank(selections, mood, occasion)
+    
+    def preset_outfits(self, mood, occasion, k=1):
+        """Cached best outfits for a preset mood/occasion, or None"""
+        k = int(k)
+        if not outfit_cache.is_preset(mood, occasion) or not 1 <= k <= TOP_K:
+            return None
+        outfit_cache.ensure_built(lambda: self.load_wardrobe()['items'])
+        outfits = outfit_cache.get(mood, occasion, k)
+        # An outfit of nothing: let the caller look at the wardrobe itself
+        return outfits if any(outfits[0]['items'].values()) else None
+    
+    def last_worn_lookup(self):
+        """Item -> last worn time, for ranking items not worn recently first"""
+        return lambda item: wear_history.last_worn_at(item.get('id'))
+    
+    def unworn_candidates(self, index):
+        """Slot -> ids of its least recently worn items, never-worn first"""
+        return {
+            slot: {item_id for _, item_id in wear_history.least_recent(
+                slot, UNWORN_CANDIDATES, [item.get('id') for item in bucket])}
+            for slot, bucket in index.slots.items()
+        }
+    
+    def format_outfit(self, selection, mood, occasion):
+        """Turn a scored slot selection into the outfit response"""
+        # Placeholders for slots the wardrobe cannot fill
         outfit = {
             "top": "Choose a comfortable top",
             "bottom": "Select appropriate bottoms", 
@@ -320,31 +846,13 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
             "accessories": "Add finishing touches"
         }
         
-        # Find items by type
-        tops = [item for item in items if item['item_type'] in ['top', 'dress']]
-        bottoms = [item for item in items if item['item_type'] == 'bottom']
-        shoes = [item for item in items if item['item_type'] == 'shoes']
-        accessories = [item for item in items if item['item_type'] == 'accessories']
-        
-        # Select items based on mood and occasion
-        if tops:
-            if mood == "formal":
-                formal_tops = [t for t in tops if t['style'] == 'formal']
-                if formal_tops:
-                    outfit["top"] = f"{formal_tops[0]['color']} {formal_tops[0]['item_type']} ({formal_tops[0]['style']})"
-                else:
-                    outfit["top"] = f"{tops[0]['color']} {tops[0]['item_type']} - dress it up with accessories"
-            else:
-                outfit["top"] = f"{tops[0]['color']} {tops[0]['item_type']} ({tops[0]['style']})"
-        
-        if bottoms:
-            outfit["bottom"] = f"{bottoms[0]['color']} {bottoms[0]['item_type']} ({bottoms[0]['style']})"
-        
-        if shoes:
-            outfit["shoes"] = f"{shoes[0]['color']} {shoes[0]['item_type']} ({shoes[0]['style']})"
+        for slot, item in selection['items'].items():
+            if item:
+                outfit[slot] = describe_item(item)
         
-        if accessories:
-            outfit["accessories"] = f"{accessories[0]['color']} {accessories[0]['item_type']} ({accessories[0]['style']})"
+        top = selection['items']['top']
+        if top and mood == "formal" and top['style'] != 'formal':
+            outfit["top"] = f"{top['color']} {top['item_type']} - dress it up with accessories"
         
         # Add styling tips based on mood
         if mood == "formal":
@@ -364,112 +872,21 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
         
         return outfit
     
+    def outfit_item_ids(self, selection):
+        """Map each slot of a scored selection to its wardrobe item id"""
+        return {slot: item.get('id') if item else None for slot, item in selection['items'].items()}
+    
     def rate_outfit(self, theme, occasion, description, filename):
-        """Rate an outfit based on theme and occasion"""
-        # Generate a comprehensive outfit rating
-        rating = {
-            "overall_score": 0,
-            "theme_appropriateness": 0,
-            "occasion_suitability": 0,
-            "style_cohesion": 0,
-            "color_coordination": 0,
-            "accessories": 0,
-            "feedback": "",
-            "strengths": [],
-            "improvements": [],
-            "star_rating": 0
-        }
-        
-        # Calculate scores based on theme and occasion
-        if theme == "formal":
-            if occasion in ["work", "office", "business"]:
-                rating["overall_score"] = 85
-                rating["theme_appropriateness"] = 90
-                rating["occasion_suitability"] = 95
-                rating["style_cohesion"] = 80
-                rating["color_coordination"] = 85
-                rating["accessories"] = 75
-                rating["feedback"] = "Excellent formal look! This outfit is perfectly suited for a professional setting. The formal theme aligns beautifully with the work occasion."
-                rating["strengths"] = ["Professional appearance", "Appropriate for business setting", "Clean and polished look"]
-                rating["improvements"] = ["Consider adding a statement accessory", "Ensure proper fit and tailoring"]
-            else:
-                rating["overall_score"] = 70
-                rating["theme_appropriateness"] = 90
-                rating["occasion_suitability"] = 60
-                rating["feedback"] = "Great formal styling, but might be too formal for this occasion. Consider adapting the formality level."
-                rating["strengths"] = ["Well-executed formal look", "Good color coordination"]
-                rating["improvements"] = ["Adjust formality to match occasion", "Consider more casual accessories"]
-        
-        elif theme == "casual":
-            if occasion in ["daily", "travel", "sports"]:
-                rating["overall_score"] = 88
-                rating["theme_appropriateness"] = 95
-                rating["occasion_suitability"] = 90
-                rating["style_cohesion"] = 85
-                rating["color_coordination"] = 80
-                rating["accessories"] = 75
-                rating["feedback"] = "Perfect casual outfit! This look is ideal for everyday wear and matches the occasion beautifully."
-                rating["strengths"] = ["Comfortable and practical", "Great for daily activities", "Relaxed yet put-together"]
-                rating["improvements"] = ["Add a pop of color or pattern", "Consider layering for versatility"]
-            else:
-                rating["overall_score"] = 75
-                rating["theme_appropriateness"] = 90
-                rating["occasion_suitability"] = 70
-                rating["feedback"] = "Nice casual look, but you might want to elevate it slightly for this occasion."
-                rating["strengths"] = ["Comfortable and stylish", "Good casual execution"]
-                rating["improvements"] = ["Add more sophisticated elements", "Consider dressier accessories"]
-        
-        elif theme == "party":
-            if occasion in ["party", "event", "date"]:
-                rating["overall_score"] = 90
-                rating["theme_appropriateness"] = 95
-                rating["occasion_suitability"] = 92
-                rating["style_cohesion"] = 88
-                rating["color_coordination"] = 85
-                rating["accessories"] = 90
-                rating["feedback"] = "Fabulous party look! This outfit is perfect for a fun event and really captures the party vibe."
-                rating["strengths"] = ["Eye-catching and fun", "Perfect for social events", "Great use of accessories"]
-                rating["improvements"] = ["Ensure comfort for dancing", "Consider the venue's dress code"]
-            else:
-                rating["overall_score"] = 65
-                rating["theme_appropriateness"] = 90
-                rating["occasion_suitability"] = 50
-                rating["feedback"] = "Great party styling, but might be too flashy for this occasion. Consider toning it down."
-                rating["strengths"] = ["Bold and confident", "Great party elements"]
-                rating["improvements"] = ["Adapt to occasion appropriateness", "Consider more subtle styling"]
-        
-        elif theme == "romantic":
-            if occasion in ["date", "romantic dinner", "special occasion"]:
-                rating["overall_score"] = 92
-                rating["theme_appropriateness"] = 95
-                rating["occasion_suitability"] = 90
-                rating["style_cohesion"] = 90
-                rating["color_coordination"] = 88
-                rating["accessories"] = 85
-                rating["feedback"] = "Absolutely romantic and elegant! This outfit is perfect for a special date or romantic occasion."
-                rating["strengths"] = ["Elegant and romantic", "Perfect for special moments", "Beautiful color choices"]
-                rating["improvements"] = ["Consider adding delicate jewelry", "Ensure the outfit is comfortable for the evening"]
-            else:
-                rating["overall_score"] = 70
-                rating["theme_appropriateness"] = 90
-                rating["occasion_suitability"] = 60
-                rating["feedback"] = "Beautiful romantic styling, but might be too dressy for this occasion."
-                rating["strengths"] = ["Elegant and feminine", "Great romantic elements"]
-                rating["improvements"] = ["Adjust formality level", "Consider more practical elements"]
+        """Rate an outfit based on theme, occasion and the uploaded photo"""
+        rating = rating_table.rating(theme, occasion)
         
-        else:  # Default rating
-            rating["overall_score"] = 75
-            rating["theme_appropriateness"] = 80
-            rating["occasion_suitability"] = 75
-            rating["style_cohesion"] = 70
-            rating["color_coordination"] = 75
-            rating["accessories"] = 70
-            rating["feedback"] = "Nice outfit! It shows good style sense and works well for the intended occasion."
-            rating["strengths"] = ["Good overall styling", "Appropriate for the occasion"]
-            rating["improvements"] = ["Consider adding more personality", "Experiment with accessories"]
-        
-        # Calculate star rating (1-5 stars)
-        rating["star_rating"] = max(1, min(5, round(rating["overall_score"] / 20)))
+        # Photo colour and cohesion features from the process pool. This waits
+        # up to IMAGE_FEATURE_TIMEOUT, so it only runs inside a rating job,
+        # never on a request handler; the theme/occasion scores stand alone
+        # if the features are not available
+        features = image_features.features(os.path.join('uploads', filename))
+        if features:
+            adjust_rating(rating, theme, features)
         
         # Add personalized feedback based on description
         if description:
@@ -479,16 +896,7 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
     
     def save_rating(self, rating_data):
         """Save rating to history"""
-        try:
-            with open('ratings.json', 'r') as f:
-                ratings = json.load(f)
-        except FileNotFoundError:
-            ratings = {"ratings": []}
-        
-        ratings["ratings"].append(rating_data)
-        
-        with open('ratings.json', 'w') as f:
-            json.dump(ratings, f, indent=2)
+        rating_store.append(rating_data)
     
     def get_index_html(self):
         """Return the main HTML page with image upload functionality"""
@@ -959,6 +1367,10 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
                     <textarea id="outfit_description" name="outfit_description" rows="3" placeholder="Tell us about your outfit - colors, style, what you were going for..."></textarea>
                 </div>
                 
+                <div class="form-group" id="wearingSuggestedGroup" style="display: none;">
+                    <label><input type="checkbox" id="wearing_suggested"> I'm wearing the suggested outfit (helps tune future suggestions)</label>
+                </div>
+                
                 <button type="submit" class="btn">Rate My Outfit</button>
             </form>
             
@@ -1025,12 +1437,18 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
             }
         });
 
+        // Items of the last suggested outfit, sent with a rating when the photo shows it
+        let lastOutfitItemIds = [];
+
         // Rate outfit form handling
         document.getElementById('rateOutfitForm').addEventListener('submit', async function(e) {
             e.preventDefault();
             
             const formData = new FormData(this);
             const resultDiv = document.getElementById('ratingResult');
+            if (document.getElementById('wearing_suggested').checked && lastOutfitItemIds.length) {
+                formData.append('item_ids', lastOutfitItemIds.join(','));
+            }
             
             try {
                 resultDiv.innerHTML = '<div style="text-align: center; padding: 20px; color: #667eea;">Rating your outfit...</div>';
@@ -1043,17 +1461,56 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
                 const result = await response.json();
                 
                 if (response.ok) {
-                    displayRating(result);
+                    // The photo is stored; the rating arrives when its job finishes
                     this.reset();
                     document.querySelector('label[for="outfit_photo"]').textContent = '📸 Click to upload your outfit photo';
+                    displayRating(await waitForRating(result));
                 } else {
                     resultDiv.innerHTML = `<div class="error">❌ ${result.error || 'Rating failed'}</div>`;
                 }
             } catch (error) {
-                resultDiv.innerHTML = '<div class="error">❌ Failed to rate outfit. Please try again.</div>';
+                resultDiv.innerHTML = `<div class="error">❌ ${error.message || 'Failed to rate outfit. Please try again.'}</div>`;
             }
         });
 
+        // Follow a rating job over server-sent events, polling if the stream fails
+        function waitForRating(job) {
+            return new Promise((resolve, reject) => {
+                const poll = async () => {
+                    try {
+                        const response = await fetch(job.status_url);
+                        const status = await response.json();
+                        if (status.status === 'done') {
+                            resolve(status);
+                        } else if (status.status === 'failed' || !response.ok) {
+                            reject(new Error(status.error || 'Rating failed'));
+                        } else {
+                            setTimeout(poll, 1000);
+                        }
+                    } catch (error) {
+                        reject(error);
+                    }
+                };
+                if (!window.EventSource) {
+                    poll();
+                    return;
+                }
+                const events = new EventSource(job.events_url);
+                events.addEventListener('rating', (e) => {
+                    events.close();
+                    resolve(JSON.parse(e.data));
+                });
+                events.addEventListener('error', (e) => {
+                    events.close();
+                    if (e.data) {
+                        reject(new Error(JSON.parse(e.data).error));
+                    } else {
+                        poll();
+                    }
+                });
+            });
+        }
+
         // Generate outfit
         document.getElementById('generateBtn').addEventListener('click', async function() {
             const mood = document.getElementById('mood').value;
@@ -1075,6 +1532,8 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
                 
                 if (response.ok) {
                     displayOutfit(result);
+                    lastOutfitItemIds = Object.values(result.item_ids || {}).filter(id => id !== null);
+                    document.getElementById('wearingSuggestedGroup').style.display = lastOutfitItemIds.length ? 'block' : 'none';
                 } else {
                     resultDiv.innerHTML = `<div class="error">❌ ${result.error || 'Failed to generate outfit'}</div>`;
                 }
@@ -1244,6 +1703,18 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
 </html>
         """
 
+class StylistServer(socketserver.ThreadingTCPServer):
+    """One thread per connection.
+
+    Handlers share state only through thread-safe stores: wardrobe writes
+    are serialized by wardrobe_store (ids are allocated under its lock and
+    changes are journaled, never rewritten in place), ratings are appended
+    under rating_store's lock, and rating jobs are tracked by rating_jobs.
+    """
+    daemon_threads = True
+    # Room for bursts of uploads waiting to be accepted
+    request_queue_size = 128
+
 def main():
     """Main function to run the server"""
     PORT = 8002
@@ -1251,6 +1722,19 @@ def main():
     # Create necessary directories
     os.makedirs('uploads', exist_ok=True)
     
+    # Only one process may write the wardrobe files
+    try:
+        wardrobe_store.acquire()
+    except WardrobeLocked as e:
+        print(f"❌ {e}")
+        return
+    
+    # Warm the caches in the background (WARMUP=0 to skip); /ready reports progress
+    if os.getenv('WARMUP', '1') != '0':
+        warm_up.start()
+    else:
+        warm_up.skip()
+    
     print("👗 AI Fashion Stylist - With Image Uploads")
     print("=" * 50)
     print(f"🚀 Starting server on http://localhost:{PORT}")
@@ -1258,11 +1742,16 @@ def main():
     print("🛑 Press Ctrl+C to stop the server")
     print("=" * 50)
     
-    with socketserver.TCPServer(("", PORT), FashionStylistHandler) as httpd:
+    # Threaded so rating event streams do not hold up other requests
+    with StylistServer(("", PORT), FashionStylistHandler) as httpd:
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n👋 Server stopped. Thanks for using AI Fashion Stylist!")
+        finally:
+            rating_jobs.shutdown()
+            image_features.shutdown()
+            wardrobe_store.shutdown()
 
 if __name__ == "__main__":
     main()
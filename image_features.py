@@ -0,0 +1,217 @@
+"""
+Photo features for outfit ratings.
+
+The uploaded outfit photo is decoded at reduced size with Pillow (draft mode
+lets JPEG decoding skip most of the work) and measured with vectorized NumPy:
+- colorfulness: Hasler and Suesstrunk's opponent-colour metric
+- contrast: spread of luminance
+- brightness: mean luminance and the share of crushed shadows and blown
+  highlights
+- palette harmony: how the dominant hues of saturated pixels relate on the
+  colour wheel (analogous, complementary, triadic), and how many there are
+
+adjust_rating() blends these into color_coordination and style_cohesion,
+judged against what suits the rating theme, and moves overall_score by the
+same amount. Decoding and measuring are CPU-bound, so the server runs
+compute_features() in a process pool. Its workers are spawned, not forked:
+the pool starts inside a threaded server, and a fork child inherits every
+lock that another thread held at that moment. Pillow and NumPy are imported
+inside the worker, and the server rates without photo features if they are
+missing.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+# Longest side of the image that features are computed on
+ANALYSIS_SIZE = 160
+
+# Hue wheel bins of 30 degrees
+HUE_BINS = 12
+
+# Share of coloured pixels below which the photo is treated as all neutrals
+MIN_COLOURED_SHARE = 0.02
+
+# Hue distances (in bins) that read as harmonious: same, analogous, triadic, complementary
+HARMONIOUS_STEPS = {0, 1, 4, 6}
+
+# Colorfulness and contrast that suit each theme, as (target, tolerance)
+THEME_COLORFULNESS = {
+    'formal': (20, 30),
+    'minimalist': (15, 25),
+    'casual': (40, 35),
+    'romantic': (40, 30),
+    'party': (70, 40),
+    'edgy': (55, 40)
+}
+THEME_CONTRAST = {
+    'formal': (0.55, 0.3),
+    'minimalist': (0.45, 0.3),
+    'casual': (0.45, 0.35),
+    'romantic': (0.35, 0.3),
+    'party': (0.6, 0.35),
+    'edgy': (0.7, 0.3)
+}
+DEFAULT_TARGET = (40, 40)
+DEFAULT_CONTRAST = (0.5, 0.35)
+
+# How much of each sub-score comes from the photo
+PHOTO_WEIGHT = 0.5
+
+# Worker processes, and how long a rating waits for its photo's features
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT = 5.0
+
+
+def compute_features(path):
+    """Measure a photo; returns a dict of plain floats (safe to send between processes)"""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.draft('RGB', (ANALYSIS_SIZE, ANALYSIS_SIZE))
+        image = image.convert('RGB')
+        image.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+        rgb = np.asarray(image, dtype=np.float32).reshape(-1, 3)
+        hsv = np.asarray(image.convert('HSV'), dtype=np.float32).reshape(-1, 3)
+
+    red, green, blue = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    rg = red - green
+    yb = 0.5 * (red + green) - blue
+    colorfulness = np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean())
+
+    luminance = 0.299 * red + 0.587 * green + 0.114 * blue
+    contrast = luminance.std() / 128.0
+
+    # Hue histogram of clearly coloured pixels, weighted by saturation
+    saturated = (hsv[:, 1] > 60) & (hsv[:, 2] > 40)
+    coloured_share = float(saturated.mean())
+    # A few stray coloured pixels (noise, JPEG fringes) are not a palette
+    if coloured_share >= MIN_COLOURED_SHARE:
+        hue_bins = (hsv[saturated, 0] * HUE_BINS / 256).astype(np.int64)
+        weights = np.bincount(hue_bins, weights=hsv[saturated, 1], minlength=HUE_BINS)
+        weights = weights / weights.sum()
+        dominant = np.flatnonzero(weights >= 0.12)
+    else:
+        dominant = np.array([], dtype=np.int64)
+
+    if len(dominant) < 2:
+        harmony = 1.0
+    else:
+        pairs = [(a, b) for i, a in enumerate(dominant) for b in dominant[i + 1:]]
+        steps = [min(abs(int(a) - int(b)), HUE_BINS - abs(int(a) - int(b))) for a, b in pairs]
+        harmony = sum(step in HARMONIOUS_STEPS for step in steps) / len(steps)
+    # Mostly neutral outfits harmonize whatever their accent colour
+    harmony = max(harmony, 1.0 - coloured_share)
+
+    return {
+        'colorfulness': round(float(colorfulness), 2),
+        'contrast': round(float(contrast), 3),
+        'brightness': round(float(luminance.mean() / 255.0), 3),
+        'shadow_clipping': round(float((luminance < 20).mean()), 3),
+        'highlight_clipping': round(float((luminance > 235).mean()), 3),
+        'palette_size': int(len(dominant)),
+        'palette_harmony': round(float(harmony), 3),
+        'coloured_share': round(coloured_share, 3)
+    }
+
+
+def closeness(value, target):
+    """1.0 at the target, falling linearly to 0 at the tolerance"""
+    center, tolerance = target
+    return max(0.0, 1.0 - abs(value - center) / tolerance)
+
+
+def adjust_rating(rating, theme, features):
+    """Blend photo features into a (copied) rating in place"""
+    colour_fit = closeness(features['colorfulness'], THEME_COLORFULNESS.get(theme, DEFAULT_TARGET))
+    contrast_fit = closeness(features['contrast'], THEME_CONTRAST.get(theme, DEFAULT_CONTRAST))
+    # Fewer dominant hues reads as more cohesive; four or more is busy
+    palette_fit = 1.0 - min(features['palette_size'], 4) / 5
+    exposure_fit = 1.0 - min(1.0, 2 * (features['shadow_clipping'] + features['highlight_clipping']))
+
+    photo_color = 100 * (0.6 * features['palette_harmony'] + 0.4 * colour_fit)
+    photo_cohesion = 100 * (0.4 * palette_fit + 0.4 * contrast_fit + 0.2 * exposure_fit)
+
+    shift = 0
+    for field, photo_score in (('color_coordination', photo_color), ('style_cohesion', photo_cohesion)):
+        before = rating[field]
+        if before:
+            rating[field] = round((1 - PHOTO_WEIGHT) * before + PHOTO_WEIGHT * photo_score)
+            # overall_score tracks the mean of the five sub-scores
+            shift += (rating[field] - before) / 5
+        else:
+            # Not scored for this theme and occasion; the photo is all there is
+            rating[field] = round(photo_score)
+    rating['overall_score'] = max(0, min(100, round(rating['overall_score'] + shift)))
+    rating['star_rating'] = max(1, min(5, round(rating['overall_score'] / 20)))
+    rating['image_features'] = features
+    return rating
+
+
+class ImageFeaturePool:
+    """Process pool for compute_features(), started on first use"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.executor = None
+        self.lock = threading.Lock()
+        self.metrics = {
+            'computed': 0,
+            'timeouts': 0,
+            'errors': 0
+        }
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            workers=int(os.getenv('IMAGE_FEATURE_WORKERS', DEFAULT_WORKERS)),
+            timeout=float(os.getenv('IMAGE_FEATURE_TIMEOUT', DEFAULT_TIMEOUT))
+        )
+
+    def count(self, name):
+        with self.lock:
+            self.metrics[name] += 1
+
+    def submit(self, path):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+            return self.executor.submit(compute_features, path)
+
+    def features(self, path):
+        """Features of the photo at path, or None if they could not be computed in time.
+
+        Blocks the calling thread for up to `timeout` seconds; call it from a
+        worker (the server's rating jobs), not from a request handler.
+        """
+        if self.workers <= 0:
+            return None
+        future = self.submit(path)
+        try:
+            features = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            self.count('timeouts')
+            return None
+        except Exception:
+            # Unreadable photo, or Pillow/NumPy not installed
+            self.count('errors')
+            return None
+        self.count('computed')
+        return features
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.metrics, workers=self.workers, started=self.executor is not None)
@@ -0,0 +1,186 @@
+"""
+Hashed n-gram embeddings for shortlisting wardrobe items before AI prompting.
+
+Each distinct item description (item_type, color, style and any free-text
+description) is turned into a fixed-size vector by hashing its words and
+character trigrams, with no model or vocabulary to load. The vectors live
+in one NumPy matrix, so scoring the whole wardrobe against a mood/occasion
+query is a single matrix-vector product; the best few descriptions per
+outfit slot are then picked by cosine similarity. Items with identical
+descriptions share one row, so the matrix grows with the variety of the
+wardrobe rather than its size.
+
+The query vector spells out the rule engine's tables: the styles and colors
+that suit the mood and occasion, weighted like score_item weights them.
+"""
+
+import threading
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from outfit_engine import (MOOD_COLOR_WEIGHT, MOOD_COLORS, MOOD_STYLE_WEIGHT, MOOD_STYLES,
+                           OCCASION_STYLE_WEIGHT, OCCASION_STYLES, SLOTS, slot_for)
+
+DIMENSIONS = 256
+NGRAM = 3
+DEFAULT_SHORTLIST = 16
+
+# Item fields that make up its description
+TEXT_FIELDS = ('item_type', 'color', 'style', 'description')
+
+
+def features(text):
+    """Words plus padded character trigrams of each word"""
+    for word in text.lower().replace(',', ' ').replace('-', ' ').split():
+        yield word
+        padded = f"#{word}#"
+        for start in range(len(padded) - NGRAM + 1):
+            yield padded[start:start + NGRAM]
+
+
+def embed_terms(weighted_terms, dims=DIMENSIONS):
+    """Unit vector for [(text, weight)], hashing each feature to a signed bucket"""
+    vector = np.zeros(dims, dtype=np.float32)
+    for text, weight in weighted_terms:
+        for feature in features(text):
+            code = zlib.crc32(feature.encode())
+            vector[code % dims] += weight if code & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def item_key(item):
+    """Description tuple; items with equal keys share an embedding row"""
+    return tuple(str(item.get(field) or '') for field in TEXT_FIELDS)
+
+
+@lru_cache(maxsize=128)
+def query_vector(mood, occasion):
+    terms = [(mood, 1), (occasion, 1)]
+    terms += [(style, MOOD_STYLE_WEIGHT) for style in sorted(MOOD_STYLES.get(mood, ()))]
+    terms += [(style, OCCASION_STYLE_WEIGHT) for style in sorted(OCCASION_STYLES.get(occasion, ()))]
+    terms += [(color, MOOD_COLOR_WEIGHT) for color in sorted(MOOD_COLORS.get(mood, ()))]
+    vector = embed_terms(terms)
+    vector.setflags(write=False)
+    return vector
+
+
+class ItemEmbeddings:
+    """Embedding matrix over distinct item descriptions, kept in step with the wardrobe"""
+
+    def __init__(self, dims=DIMENSIONS):
+        self.dims = dims
+        self.matrix = np.zeros((0, dims), dtype=np.float32)
+        # Slot position in SLOTS per row, -1 once a row has no items left
+        self.slot_codes = np.zeros(0, dtype=np.int8)
+        self.rows = 0
+        self.row_for_key = {}
+        self.keys = []
+        # Per row: [(seq, item)] in wardrobe order
+        self.members = []
+        self.items = {}
+        self.next_seq = 0
+        self.built = False
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def build(self, items):
+        """(Re)build the matrix from a full wardrobe"""
+        with self.lock:
+            self.matrix = np.zeros((16, self.dims), dtype=np.float32)
+            self.slot_codes = np.full(16, -1, dtype=np.int8)
+            self.rows = 0
+            self.row_for_key = {}
+            self.keys = []
+            self.members = []
+            self.items = {}
+            self.next_seq = 0
+            for item in items:
+                self._add(item)
+            self.built = True
+
+    def ensure_built(self, load_items):
+        """Build once from load_items() unless another thread already did"""
+        if not self.built:
+            with self.build_lock:
+                if not self.built:
+                    self.build(load_items())
+
+    def add_item(self, item):
+        with self.lock:
+            self._add(item)
+
+    def remove_item(self, item_id):
+        """Drop an item by id; returns False if the index never saw it"""
+        with self.lock:
+            if item_id not in self.items:
+                return False
+            row, seq = self.items.pop(item_id)
+            self.members[row] = [(s, item) for s, item in self.members[row] if s != seq]
+            if not self.members[row]:
+                self.slot_codes[row] = -1
+                del self.row_for_key[self.keys[row]]
+            return True
+
+    def _add(self, item):
+        slot = slot_for(item)
+        seq = self.next_seq
+        self.next_seq += 1
+        if not slot:
+            return
+        key = item_key(item)
+        row = self.row_for_key.get(key)
+        if row is None:
+            if self.rows == len(self.matrix):
+                self._grow()
+            row = self.rows
+            self.rows += 1
+            self.matrix[row] = embed_terms([(text, 1) for text in key if text], self.dims)
+            self.slot_codes[row] = SLOTS.index(slot)
+            self.members.append([])
+            self.keys.append(key)
+            self.row_for_key[key] = row
+        self.members[row].append((seq, item))
+        self.items[item.get('id')] = (row, seq)
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self.matrix))
+        matrix = np.zeros((capacity, self.dims), dtype=np.float32)
+        matrix[:self.rows] = self.matrix[:self.rows]
+        slot_codes = np.full(capacity, -1, dtype=np.int8)
+        slot_codes[:self.rows] = self.slot_codes[:self.rows]
+        self.matrix = matrix
+        self.slot_codes = slot_codes
+
+    def shortlist(self, mood, occasion, per_slot=DEFAULT_SHORTLIST):
+        """Items of the `per_slot` closest descriptions in each slot, in wardrobe order.
+
+        Ties go to the description seen first in the wardrobe.
+        """
+        with self.lock:
+            rows = self.rows
+            scores = self.matrix[:rows] @ query_vector(mood, occasion)
+            slot_codes = self.slot_codes[:rows]
+            chosen = []
+            for code in range(len(SLOTS)):
+                candidates = np.flatnonzero(slot_codes == code)
+                if len(candidates) > per_slot:
+                    slot_scores = scores[candidates]
+                    kth = np.partition(slot_scores, len(candidates) - per_slot)[len(candidates) - per_slot]
+                    above = candidates[slot_scores > kth]
+                    tied = candidates[slot_scores == kth][:per_slot - len(above)]
+                    candidates = np.concatenate([above, tied])
+                chosen.extend(int(row) for row in candidates)
+            picked = [member for row in chosen for member in self.members[row]]
+        picked.sort(key=lambda member: member[0])
+        return [item for _, item in picked]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'items': len(self.items),
+                'rows': int((self.slot_codes[:self.rows] >= 0).sum()),
+                'dimensions': self.dims
+            }
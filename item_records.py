@@ -0,0 +1,171 @@
+"""
+Compact wardrobe item records.
+
+Items are kept as ItemRecord objects instead of dicts of strings. A record
+has fixed __slots__ and no per-item dict:
+- item_type, color, style and description are small ints into a shared,
+  interned Vocabulary, so a thousand "black" items share one string
+- timestamps (uploaded_at / added_at) are epoch microseconds
+- filepath is not stored when it is just uploads/<filename>
+- the item's key order is one interned layout tuple, so to_dict() gives
+  back exactly the JSON the item was loaded from
+- anything else lands in a small `extra` dict
+
+Records (and the snapshot views in wardrobe_snapshot) answer item['color']
+and item.get('style') like the dicts they replace, so the outfit engine,
+caches and planners take them unchanged. Decoded attribute values are the
+interned strings themselves, which makes the rule engine's style and color
+comparisons identity checks.
+"""
+
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+CODED_FIELDS = ('item_type', 'color', 'style', 'description')
+TIMESTAMP_FIELDS = ('uploaded_at', 'added_at')
+UPLOAD_DIR = 'uploads'
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class Vocabulary:
+    """Interned strings (or other hashables) numbered in first-seen order"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+        self.lock = threading.Lock()
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(value)
+                if code is None:
+                    if isinstance(value, str):
+                        value = sys.intern(value)
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = code
+        return code
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+# Shared by every store, like sys.intern: attribute values and key layouts
+ATTRIBUTES = Vocabulary()
+LAYOUTS = Vocabulary()
+
+
+def encode_timestamp(value):
+    """Epoch microseconds for an ISO timestamp that round-trips exactly, else None"""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return None
+    return (parsed - EPOCH) // MICROSECOND
+
+
+def decode_timestamp(micros):
+    return (EPOCH + micros * MICROSECOND).isoformat()
+
+
+class ItemFields:
+    """Dict-style reads over an item's fields, in its original key order.
+
+    Subclasses provide keys(), extra_fields() (values kept verbatim, or
+    None) and field(key) for everything else.
+    """
+
+    __slots__ = ()
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __getitem__(self, key):
+        if key not in self.keys():
+            raise KeyError(key)
+        extra = self.extra_fields()
+        if extra is not None and key in extra:
+            return extra[key]
+        return self.field(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """The item as it was loaded, keys in their original order"""
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class ItemRecord(ItemFields):
+    """One wardrobe item held in memory"""
+
+    __slots__ = ('id', 'layout', 'item_type', 'color', 'style', 'description',
+                 'filename', 'filepath', 'timestamp', 'extra')
+
+    def __init__(self, item):
+        self.id = item.get('id')
+        self.item_type = self.color = self.style = self.description = None
+        self.filename = self.filepath = self.timestamp = self.extra = None
+        keys = []
+        for key, value in item.items():
+            keys.append(key)
+            if key == 'id':
+                continue
+            if key in CODED_FIELDS and isinstance(value, str):
+                setattr(self, key, ATTRIBUTES.code(value))
+            elif key == 'filename' and isinstance(value, str):
+                self.filename = value
+            elif key == 'filepath' and isinstance(value, str):
+                # Usually derivable from the filename; stored only when it is not
+                self.filepath = value
+            elif key in TIMESTAMP_FIELDS and self.timestamp is None and encode_timestamp(value) is not None:
+                self.timestamp = encode_timestamp(value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+        if self.filepath is not None and self.filepath == upload_path(self.filename):
+            self.filepath = None
+        self.layout = LAYOUTS.code(tuple(keys))
+
+    def keys(self):
+        return LAYOUTS[self.layout]
+
+    def extra_fields(self):
+        return self.extra
+
+    def field(self, key):
+        if key == 'id':
+            return self.id
+        if key in CODED_FIELDS:
+            return ATTRIBUTES[getattr(self, key)]
+        if key == 'filename':
+            return self.filename
+        if key == 'filepath':
+            return self.filepath if self.filepath is not None else upload_path(self.filename)
+        if key in TIMESTAMP_FIELDS:
+            return decode_timestamp(self.timestamp)
+        raise KeyError(key)
+
+
+def upload_path(filename):
+    return os.path.join(UPLOAD_DIR, filename) if filename is not None else None
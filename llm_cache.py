@@ -0,0 +1,163 @@
+"""
+Two-tier cache for chat-completion responses.
+
+Responses are keyed on a SHA-256 of the model, messages and sampling
+settings, so only byte-identical requests share an entry. Lookups go to an
+in-memory LRU first and then to an SQLite store on disk, which survives
+restarts. Entries expire after a TTL and the disk store is trimmed back
+under its byte budget, least recently used first.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def request_key(request_args):
+    """Stable hash of everything that shapes a completion"""
+    material = {
+        'model': request_args.get('model'),
+        'messages': request_args.get('messages'),
+        'temperature': request_args.get('temperature'),
+        'max_tokens': request_args.get('max_tokens')
+    }
+    encoded = json.dumps(material, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class LLMCache:
+    """In-memory LRU backed by an on-disk SQLite store"""
+
+    def __init__(self, path='llm_cache.sqlite3', memory_items=256, ttl=24 * 3600,
+                 max_disk_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.memory_items = memory_items
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.metrics = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'expired': 0,
+            'evicted': 0
+        }
+        self.db = None
+        self.disk_bytes = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache configured from LLM_CACHE_* environment variables"""
+        return cls(
+            path=os.getenv('LLM_CACHE_PATH', 'llm_cache.sqlite3'),
+            memory_items=int(os.getenv('LLM_CACHE_MEMORY_ITEMS', '256')),
+            ttl=float(os.getenv('LLM_CACHE_TTL', str(24 * 3600))),
+            max_disk_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+        )
+
+    def connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, value TEXT, size INTEGER, '
+                'expires_at REAL, last_used REAL)'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+            self.db.commit()
+            row = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()
+            self.disk_bytes = row[0]
+        return self.db
+
+    def get(self, request_args):
+        """Cached response text for a request, or None"""
+        key = request_key(request_args)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self.memory.move_to_end(key)
+                    self.metrics['memory_hits'] += 1
+                    return value
+                del self.memory[key]
+                self.metrics['expired'] += 1
+
+            db = self.connect()
+            row = db.execute('SELECT value, size, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.metrics['misses'] += 1
+                return None
+            value, size, expires_at = row
+            if expires_at <= now:
+                db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                db.commit()
+                self.disk_bytes -= size
+                self.metrics['expired'] += 1
+                self.metrics['misses'] += 1
+                return None
+            db.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+            db.commit()
+            self.remember(key, expires_at, value)
+            self.metrics['disk_hits'] += 1
+            return value
+
+    def put(self, request_args, value, ttl=None):
+        """Store a response in both tiers"""
+        key = request_key(request_args)
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        size = len(value.encode())
+        with self.lock:
+            self.remember(key, expires_at, value)
+            db = self.connect()
+            old = db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            db.execute(
+                'INSERT OR REPLACE INTO responses (key, value, size, expires_at, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, value, size, expires_at, now)
+            )
+            self.disk_bytes += size - (old[0] if old else 0)
+            self.metrics['stores'] += 1
+            if self.disk_bytes > self.max_disk_bytes:
+                self.trim(db, now)
+            db.commit()
+
+    def remember(self, key, expires_at, value):
+        self.memory[key] = (expires_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def trim(self, db, now):
+        """Drop expired rows, then least recently used rows.
+
+        Trims to 90% of the budget so a full store is not trimmed on every put.
+        """
+        expired = db.execute('DELETE FROM responses WHERE expires_at <= ?', (now,)).rowcount
+        self.metrics['expired'] += max(expired, 0)
+        self.disk_bytes = db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        rows = db.execute('SELECT key, size FROM responses ORDER BY last_used').fetchall()
+        for key, size in rows:
+            if self.disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.memory.pop(key, None)
+            self.disk_bytes -= size
+            self.metrics['evicted'] += 1
+
+    def stats(self):
+        """Hit/miss counters plus tier sizes"""
+        with self.lock:
+            report = dict(self.metrics)
+            lookups = report['memory_hits'] + report['disk_hits'] + report['misses']
+            report['hit_rate'] = round((report['memory_hits'] + report['disk_hits']) / lookups, 4) if lookups else 0.0
+            report['memory_entries'] = len(self.memory)
+            report['disk_bytes'] = self.disk_bytes
+            return report
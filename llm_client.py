@@ -0,0 +1,240 @@
+"""
+Asynchronous OpenAI client shared by all Flask workers.
+
+One event loop runs in a background thread and owns a single AsyncOpenAI
+client, so every outbound call reuses the same pooled HTTP connections.
+Request threads submit a completion and wait only as long as the latency
+SLA allows; the call itself keeps running until its hard deadline, so a
+slow answer can still be cached for the next identical request. Answers are
+handed to their result callbacks (the cache's SQLite write) on a separate
+worker thread, so disk I/O never stalls the event loop.
+
+Outbound calls pass a circuit breaker, which refuses them outright while
+OpenAI is failing or slow, and a token bucket that spaces bursts out.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from rate_limiter import RateLimitExceeded, TokenBucket
+
+# Placeholder written by setup.py and env_example.txt
+PLACEHOLDER_KEYS = {'', 'your_openai_api_key_here', 'your_api_key_here'}
+
+
+class AsyncLLMClient:
+    """Pooled async chat-completions client driven from sync code"""
+
+    def __init__(self, api_key=None, base_url=None, deadline=20.0, latency_sla=3.0,
+                 max_connections=10, breaker=None, limiter=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.deadline = deadline
+        self.latency_sla = latency_sla
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker(slow_call_seconds=latency_sla)
+        self.limiter = limiter or TokenBucket()
+        self.loop = None
+        self.client = None
+        self.results = None  # runs on_result callbacks off the event loop
+        self.lock = threading.Lock()
+        self.metrics = {
+            'calls': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'deadline_exceeded': 0,
+            'hedged': 0
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build a client configured from OPENAI_* and LLM_* environment variables"""
+        latency_sla = float(os.getenv('LLM_LATENCY_SLA', '3'))
+        return cls(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            base_url=os.getenv('OPENAI_BASE_URL') or None,
+            deadline=float(os.getenv('LLM_DEADLINE', '20')),
+            latency_sla=latency_sla,
+            max_connections=int(os.getenv('LLM_MAX_CONNECTIONS', '10')),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', '5')),
+                slow_call_seconds=float(os.getenv('LLM_SLOW_CALL', str(latency_sla))),
+                cooldown=float(os.getenv('LLM_BREAKER_COOLDOWN', '30'))
+            ),
+            limiter=TokenBucket(
+                rate=float(os.getenv('LLM_RATE_LIMIT', '3')),
+                burst=int(os.getenv('LLM_RATE_BURST', '5')),
+                max_waiters=int(os.getenv('LLM_QUEUE_SIZE', '20'))
+            )
+        )
+
+    @property
+    def configured(self):
+        return (self.api_key or '').strip() not in PLACEHOLDER_KEYS
+
+    def start(self):
+        """Start the event loop thread and the pooled client once"""
+        with self.lock:
+            if self.loop is not None:
+                return self.loop
+            import httpx
+            from openai import AsyncOpenAI
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='llm-client', daemon=True)
+            thread.start()
+
+            async def make_client():
+                http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections
+                    ),
+                    timeout=self.deadline
+                )
+                return AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=self.deadline,
+                    max_retries=0,
+                    http_client=http_client
+                )
+
+            self.client = asyncio.run_coroutine_threadsafe(make_client(), loop).result()
+            self.results = ThreadPoolExecutor(max_workers=1, thread_name_prefix='llm-results')
+            self.loop = loop
+            return loop
+
+    def count(self, name):
+        with self.lock:
+            self.metrics[name] += 1
+
+    async def complete(self, request_args):
+        """Run one chat completion under the hard deadline"""
+        self.count('calls')
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                self.client.chat.completions.create(**request_args),
+                timeout=self.deadline
+            )
+        except asyncio.TimeoutError:
+            self.count('deadline_exceeded')
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            self.count('failed')
+            self.breaker.record_failure()
+            raise
+        self.count('succeeded')
+        self.breaker.record_success(time.monotonic() - started)
+        return response.choices[0].message.content
+
+    def submit(self, request_args):
+        """Schedule a completion; returns a concurrent.futures.Future"""
+        loop = self.start()
+        return asyncio.run_coroutine_threadsafe(self.complete(request_args), loop)
+
+    def complete_within_sla(self, request_args, on_result=None):
+        """Return the completion text, or None if the SLA passes first.
+
+        `on_result(text)` is called whenever the call succeeds, including
+        after the caller has given up waiting, so late answers can be cached.
+        It runs on the client's result thread, never on the event loop.
+        Raises CircuitOpenError or RateLimitExceeded when the call is refused
+        before going out.
+        """
+        started = time.monotonic()
+        if not self.breaker.allow():
+            raise CircuitOpenError("OpenAI circuit is open")
+        # Waiting for a token counts against the same SLA
+        if not self.limiter.acquire(timeout=self.latency_sla):
+            self.breaker.cancel()
+            raise RateLimitExceeded("Outbound OpenAI rate limit reached")
+        future = self.submit(request_args)
+        if on_result is not None:
+            def deliver(done):
+                # Called on the event loop thread: hand the work off
+                if not done.cancelled() and done.exception() is None:
+                    self.results.submit(self.run_result_callback, on_result, done.result())
+            future.add_done_callback(deliver)
+        try:
+            return future.result(timeout=max(0, self.latency_sla - (time.monotonic() - started)))
+        except FutureTimeout:
+            self.count('hedged')
+            return None
+
+    def run_result_callback(self, on_result, text):
+        try:
+            on_result(text)
+        except Exception as e:
+            print(f"⚠️  LLM result callback failed: {e}")
+
+    def stream(self, request_args):
+        """Yield completion text pieces as they arrive.
+
+        A sync generator over a streamed completion running on the event
+        loop. The breaker judges the call on its time to first token.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("OpenAI circuit is open")
+        if not self.limiter.acquire(timeout=self.latency_sla):
+            self.breaker.cancel()
+            raise RateLimitExceeded("Outbound OpenAI rate limit reached")
+        loop = self.start()
+        pieces = queue.Queue()
+        finished = object()
+
+        async def consume(started, first_token):
+            stream = await self.client.chat.completions.create(stream=True, **request_args)
+            async for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    if not first_token:
+                        first_token.append(time.monotonic() - started)
+                    pieces.put(text)
+
+        async def pump():
+            self.count('calls')
+            started = time.monotonic()
+            first_token = []
+            try:
+                await asyncio.wait_for(consume(started, first_token), timeout=self.deadline)
+            except asyncio.TimeoutError as e:
+                self.count('deadline_exceeded')
+                self.breaker.record_failure()
+                pieces.put(e)
+                return
+            except Exception as e:
+                self.count('failed')
+                self.breaker.record_failure()
+                pieces.put(e)
+                return
+            self.count('succeeded')
+            self.breaker.record_success(first_token[0] if first_token else time.monotonic() - started)
+            pieces.put(finished)
+
+        asyncio.run_coroutine_threadsafe(pump(), loop)
+        while True:
+            piece = pieces.get()
+            if piece is finished:
+                return
+            if isinstance(piece, BaseException):
+                raise piece
+            yield piece
+
+    def stats(self):
+        with self.lock:
+            report = dict(self.metrics)
+        report['configured'] = self.configured
+        report['latency_sla'] = self.latency_sla
+        report['deadline'] = self.deadline
+        report['circuit'] = self.breaker.stats()
+        report['rate_limit'] = self.limiter.stats()
+        return report
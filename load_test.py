@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the AI outfit path in app.py.
+
+Sends /generate-outfit requests at a fixed arrival rate and reports latency
+percentiles, how the answers were produced (AI, malformed AI reply, or
+rule-engine fallback and why) and how well the response cache and request
+coalescing did, using the app's /metrics counters.
+
+By default the app runs in-process against mock_llm_server in a scratch
+directory, so no API key, network or real wardrobe is touched:
+
+    python load_test.py --rps 10 --duration 30 --latency lognormal:1.2,0.6 --error-rate 0.05
+
+With --url it drives an already running app instead (start that app with
+OPENAI_BASE_URL pointing at a mock_llm_server to keep it offline).
+
+Requests are scheduled open-loop: latency is measured from each request's
+scheduled start, so time spent queued behind slow requests is included.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_llm_server import add_mock_arguments, mock_from_args, start_in_thread
+from outfit_cache import PRESET_MOODS, PRESET_OCCASIONS
+
+# Synthetic wardrobe vocabulary, matching the upload form's choices
+ITEM_TYPES = ['top', 'bottom', 'dress', 'shoes', 'accessories', 'outerwear']
+COLORS = ['black', 'white', 'red', 'blue', 'green', 'yellow', 'pink', 'purple', 'brown', 'gray', 'navy', 'beige']
+STYLES = ['casual', 'formal', 'sporty', 'vintage', 'bohemian', 'minimalist', 'trendy']
+
+# Placeholder top written by app.parse_ai_response when nothing in the reply is usable
+MALFORMED_TOP = "Select a top that matches your mood"
+
+
+def synthetic_wardrobe(size, seed=None):
+    rng = random.Random(seed)
+    return {'items': [
+        {
+            'id': i + 1,
+            'filename': f"item_{i + 1}.jpg",
+            'item_type': rng.choice(ITEM_TYPES),
+            'color': rng.choice(COLORS),
+            'style': rng.choice(STYLES),
+            'uploaded_at': '2025-01-01T00:00:00'
+        }
+        for i in range(size)
+    ]}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def classify(status, body):
+    """Name how one /generate-outfit answer was produced"""
+    if status != 200 or not isinstance(body, dict):
+        return 'http_error'
+    outfit = body.get('outfit') or {}
+    slots = outfit.get('outfit')
+    if not isinstance(slots, dict):
+        return 'rule_engine'
+    if slots.get('top') == MALFORMED_TOP:
+        return 'malformed'
+    return 'ai'
+
+
+def in_process_target(args, mock_server):
+    """Import app.py against the mock in a scratch directory; returns (post, metrics, workdir)"""
+    workdir = tempfile.mkdtemp(prefix='fashion-load-')
+    if args.wardrobe_size:
+        wardrobe = synthetic_wardrobe(args.wardrobe_size, args.seed)
+    else:
+        with open('wardrobe.json', 'r') as f:
+            wardrobe = json.load(f)
+    with open(os.path.join(workdir, 'wardrobe.json'), 'w') as f:
+        json.dump(wardrobe, f)
+
+    os.environ.update({
+        'OPENAI_API_KEY': 'mock-key',
+        'OPENAI_BASE_URL': mock_server.base_url,
+        'LLM_CACHE_PATH': os.path.join(workdir, 'llm_cache.sqlite3'),
+        'WARMUP': '0'
+    })
+    # app reads wardrobe.json and creates its folders relative to the working directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    import app as app_module
+    app = app_module.create_app(warm=False)
+
+    def post(payload):
+        response = app.test_client().post('/generate-outfit', json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+    def metrics():
+        return app.test_client().get('/metrics').get_json()
+
+    return post, metrics, workdir
+
+
+def http_target(url):
+    """Drive a running app over HTTP; returns (post, metrics)"""
+    url = url.rstrip('/')
+
+    def post(payload):
+        request = urllib.request.Request(
+            f"{url}/generate-outfit",
+            data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, None
+        except (urllib.error.URLError, OSError):
+            return 0, None
+
+    def metrics():
+        with urllib.request.urlopen(f"{url}/metrics", timeout=10) as response:
+            return json.loads(response.read())
+
+    return post, metrics
+
+
+def run_load(post, rps, duration, workers, seed=None):
+    """Fire requests at `rps` for `duration` seconds.
+
+    Returns ([(latency, kind)], elapsed seconds, requests sent, error
+    messages). A request whose post() raised (such as an in-process 500
+    surfacing through the test client) counts as an http_error.
+    """
+    rng = random.Random(seed)
+    total = max(1, int(rps * duration))
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def one(scheduled, payload):
+        try:
+            status, body = post(payload)
+            kind = classify(status, body)
+        except Exception as e:
+            kind = 'http_error'
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+        latency = time.monotonic() - scheduled
+        with lock:
+            results.append((latency, kind))
+
+    started = time.monotonic()
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i in range(total):
+            scheduled = started + i / rps
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            payload = {'mood': rng.choice(PRESET_MOODS), 'occasion': rng.choice(PRESET_OCCASIONS)}
+            futures.append(executor.submit(one, scheduled, payload))
+    for future in futures:
+        # Anything that escaped one() itself is still a failed request
+        if future.exception() is not None:
+            errors.append(f"{type(future.exception()).__name__}: {future.exception()}")
+            results.append((time.monotonic() - started, 'http_error'))
+    return results, time.monotonic() - started, len(futures), errors
+
+
+def counter_delta(before, after):
+    """after - before for every numeric counter, recursing into nested dicts"""
+    delta = {}
+    for key, value in after.items():
+        if isinstance(value, dict):
+            delta[key] = counter_delta(before.get(key) or {}, value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            delta[key] = value - (before.get(key) or 0)
+    return delta
+
+
+def summarize(results, elapsed, before, after, mock_stats=None, sent=None, errors=()):
+    latencies = sorted(latency for latency, _ in results)
+    kinds = {}
+    for _, kind in results:
+        kinds[kind] = kinds.get(kind, 0) + 1
+    delta = counter_delta(before, after)
+    cache = delta.get('llm_cache', {})
+    lookups = cache.get('memory_hits', 0) + cache.get('disk_hits', 0) + cache.get('misses', 0)
+    fallbacks = delta.get('fallbacks', {})
+
+    report = {
+        'requests': len(results),
+        'sent': len(results) if sent is None else sent,
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'elapsed_seconds': round(elapsed, 2),
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p90': round(percentile(latencies, 90) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+            'max': round((latencies[-1] if latencies else 0) * 1000, 1)
+        },
+        'answers': kinds,
+        'fallback_rate': round(kinds.get('rule_engine', 0) / len(results), 4) if results else 0.0,
+        'fallbacks': fallbacks,
+        'cache': {
+            'lookups': lookups,
+            'hits': lookups - cache.get('misses', 0),
+            'hit_rate': round((lookups - cache.get('misses', 0)) / lookups, 4) if lookups else 0.0,
+            'stores': cache.get('stores', 0)
+        },
+        'replies_parsed': delta.get('outfit_parser', {}),
+        'coalesced': delta.get('single_flight', {}).get('coalesced', 0),
+        'llm_calls': delta.get('llm_client', {}).get('calls', 0)
+    }
+    if mock_stats is not None:
+        report['mock_llm'] = mock_stats
+    return report
+
+
+def print_report(report):
+    print("📊 Load test results")
+    print("=" * 40)
+    print(f"Requests:      {report['requests']} completed of {report['sent']} sent "
+          f"in {report['elapsed_seconds']}s ({report['throughput_rps']} req/s)")
+    if report['errors']:
+        print(f"Errors:        {report['errors']} requests raised, e.g. {report['error_samples'][0]}")
+    latency = report['latency_ms']
+    print(f"Latency (ms):  p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}  max {latency['max']}")
+    answers = ', '.join(f"{kind} {count}" for kind, count in sorted(report['answers'].items()))
+    print(f"Answers:       {answers}")
+    print(f"Fallback rate: {report['fallback_rate']:.1%}")
+    reasons = ', '.join(f"{reason} {count}" for reason, count in report['fallbacks'].items() if count)
+    if reasons:
+        print(f"  reasons:     {reasons}")
+    cache = report['cache']
+    print(f"Cache:         {cache['hits']}/{cache['lookups']} hits ({cache['hit_rate']:.1%}), {cache['stores']} stores")
+    parsed = ', '.join(f"{kind} {count}" for kind, count in report['replies_parsed'].items() if count)
+    if parsed:
+        print(f"Replies:       {parsed}")
+    print(f"Coalesced:     {report['coalesced']} requests joined an in-flight call")
+    print(f"LLM calls:     {report['llm_calls']}")
+    if 'mock_llm' in report:
+        mock = report['mock_llm']
+        print(f"Mock LLM:      {mock['requests']} served, {mock['errors']} errors, {mock['malformed']} malformed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the AI outfit path against a mock LLM")
+    parser.add_argument('--rps', type=float, default=5.0, help="request arrival rate")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds to keep sending")
+    parser.add_argument('--workers', type=int, default=32, help="maximum concurrent requests")
+    parser.add_argument('--url', help="drive a running app at this URL instead of one in-process")
+    parser.add_argument('--wardrobe-size', type=int, default=200,
+                        help="synthetic wardrobe size for in-process runs; 0 uses ./wardrobe.json")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock_server = None
+    workdir = None
+    if args.url:
+        post, metrics = http_target(args.url)
+    else:
+        mock_server = start_in_thread(mock_from_args(args))
+        post, metrics, workdir = in_process_target(args, mock_server)
+
+    try:
+        before = metrics()
+        results, elapsed, sent, errors = run_load(post, args.rps, args.duration, args.workers, args.seed)
+        after = metrics()
+        report = summarize(results, elapsed, before, after,
+                           mock_server.mock.stats() if mock_server else None, sent, errors)
+    finally:
+        if mock_server:
+            mock_server.shutdown()
+        if workdir:
+            os.chdir(os.path.dirname(workdir))
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
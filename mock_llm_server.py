@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat-completions API.
+
+Answers POST /v1/chat/completions with realistic outfit JSON built from the
+compact wardrobe IDs in the prompt (see prompt_builder), so app.py can be
+load-tested without an API key or network access. Latency follows a
+configurable distribution, and a share of calls can be made to fail with
+HTTP 500/429 or to return malformed JSON. Streaming requests are answered
+with chat.completion.chunk events. GET /stats reports what was served.
+
+Point the app at it with:
+    OPENAI_API_KEY=mock-key OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python app.py
+"""
+
+import argparse
+import http.server
+import json
+import math
+import random
+import re
+import socketserver
+import threading
+import time
+
+DEFAULT_PORT = 8765
+
+# Compact ID lines written by prompt_builder, e.g. "- T1 x2: top (black, formal style)"
+ID_LINE = re.compile(r'^\s*-\s+([TBSA])(\d+)(?:\s+x\d+)?:\s*(.+)$', re.MULTILINE)
+MOOD_LINE = re.compile(r'Desired Mood:\s*(\S+)')
+OCCASION_LINE = re.compile(r'Occasion:\s*(\S+)')
+
+PREFIX_SLOTS = {
+    'T': 'top',
+    'B': 'bottom',
+    'S': 'shoes',
+    'A': 'accessories'
+}
+
+STYLING_TIPS = [
+    "Tuck the top in loosely and let the accessories carry the colour.",
+    "Keep the palette tight and let one piece stand out.",
+    "Roll the sleeves once for a more relaxed line.",
+    "Match the shoes to the belt or bag to pull the look together."
+]
+
+
+def parse_latency(spec):
+    """Parse a latency spec into a sampler returning seconds.
+
+    fixed:S, uniform:LO,HI or lognormal:MEDIAN,SIGMA (all in seconds).
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal' and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+
+class MockLLM:
+    """Response generator and counters shared by all request threads"""
+
+    def __init__(self, latency='lognormal:0.8,0.5', error_rate=0.0, malformed_rate=0.0,
+                 token_delay=0.02, seed=None):
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.token_delay = token_delay
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.metrics = {
+            'requests': 0,
+            'streamed': 0,
+            'errors': 0,
+            'malformed': 0
+        }
+
+    def draw(self):
+        """Pick (latency, outcome) for one call.
+
+        The outcome is ok, malformed, rate_limited or server_error.
+        """
+        with self.lock:
+            self.metrics['requests'] += 1
+            latency = max(0.0, self.sample_latency(self.rng))
+            roll = self.rng.random()
+            if roll < self.error_rate:
+                self.metrics['errors'] += 1
+                return latency, self.rng.choice(['rate_limited', 'server_error'])
+            if roll < self.error_rate + self.malformed_rate:
+                self.metrics['malformed'] += 1
+                return latency, 'malformed'
+            return latency, 'ok'
+
+    def outfit_reply(self, messages):
+        """Outfit JSON choosing IDs from the prompt, mostly the best-ranked ones"""
+        prompt = messages[-1].get('content', '') if messages else ''
+        choices = {}
+        for prefix, number, _ in ID_LINE.findall(prompt):
+            choices.setdefault(PREFIX_SLOTS[prefix], []).append(f"{prefix}{number}")
+        mood = MOOD_LINE.search(prompt)
+        occasion = OCCASION_LINE.search(prompt)
+        mood = mood.group(1) if mood else 'casual'
+        occasion = occasion.group(1) if occasion else 'daily'
+
+        with self.lock:
+            outfit = {}
+            for slot in PREFIX_SLOTS.values():
+                ids = choices.get(slot)
+                # The rule engine lists candidates best first; favour the top few
+                outfit[slot] = ids[min(int(self.rng.expovariate(1.0)), len(ids) - 1)] if ids else f"No {slot} in wardrobe"
+            tip = self.rng.choice(STYLING_TIPS)
+        return json.dumps({
+            'outfit': outfit,
+            'styling_tips': tip,
+            'reasoning': f"These pieces suit a {mood} mood and work well for {occasion}."
+        })
+
+    def stats(self):
+        with self.lock:
+            report = dict(self.metrics)
+        report['latency'] = self.latency_spec
+        report['error_rate'] = self.error_rate
+        report['malformed_rate'] = self.malformed_rate
+        return report
+
+
+class MockLLMHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP front end for a MockLLM attached to the server"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(200, self.server.mock.stats())
+        else:
+            self.send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        content_length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(content_length) or b'{}')
+        except json.JSONDecodeError:
+            self.send_json(400, {'error': {'message': 'Invalid JSON body'}})
+            return
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        mock = self.server.mock
+        latency, outcome = mock.draw()
+        time.sleep(latency)
+
+        if outcome == 'rate_limited':
+            self.send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'rate_limit_error'}})
+            return
+        if outcome == 'server_error':
+            self.send_json(500, {'error': {'message': 'The server had an error', 'type': 'server_error'}})
+            return
+
+        content = mock.outfit_reply(body.get('messages', []))
+        if outcome == 'malformed':
+            # Cut the JSON off part way, as a truncated completion would be
+            content = content[:len(content) // 2]
+
+        model = body.get('model', 'gpt-3.5-turbo')
+        if body.get('stream'):
+            with mock.lock:
+                mock.metrics['streamed'] += 1
+            self.stream_reply(model, content, mock.token_delay)
+            return
+
+        prompt_tokens = sum(len(m.get('content', '')) for m in body.get('messages', [])) // 4
+        completion_tokens = len(content) // 4
+        self.send_json(200, {
+            'id': f"chatcmpl-mock{int(time.time() * 1000)}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+    def stream_reply(self, model, content, token_delay):
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        created = int(time.time())
+        # Roughly one token per four characters
+        for start in range(0, len(content), 4):
+            chunk = {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': content[start:start + 4]}, 'finish_reason': None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def send_json(self, code, data):
+        payload = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class MockLLMServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, mock):
+        super().__init__(address, MockLLMHandler)
+        self.mock = mock
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_in_thread(mock, host='127.0.0.1', port=0):
+    """Serve `mock` from a daemon thread; returns the server (see .base_url)"""
+    server = MockLLMServer((host, port), mock)
+    threading.Thread(target=server.serve_forever, name='mock-llm', daemon=True).start()
+    return server
+
+
+def add_mock_arguments(parser):
+    parser.add_argument('--latency', default='lognormal:0.8,0.5',
+                        help="fixed:S, uniform:LO,HI or lognormal:MEDIAN,SIGMA in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of calls answered with HTTP 500/429")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="share of calls answered with broken JSON")
+    parser.add_argument('--token-delay', type=float, default=0.02, help="seconds between streamed chunks")
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def mock_from_args(args):
+    return MockLLM(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        token_delay=args.token_delay,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat-completions server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer((args.host, args.port), mock_from_args(args))
+    print(f"🤖 Mock LLM serving at {server.base_url}")
+    print(f"📊 Stats at http://{args.host}:{args.port}/stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Mock LLM stopped")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Materialized top-K outfits for the preset moods and occasions.
+
+For every preset (mood, occasion) pair the cache keeps each slot's items in
+score order and the best outfits already enumerated, so serving a preset is a
+single dict lookup. The lists are maintained incrementally:
+
+- adding an item only scores the combinations that include it (the new item
+  with the best combinations of the other slots) and merges them in;
+- removing an item only evicts the outfits that contained it. The list is
+  kept deeper than K, so it is refilled from the ranked slots only when
+  evictions leave fewer than K outfits.
+
+Uploads and removals that land while ensure_built() is reading the
+wardrobe are recorded and replayed onto the new lists, so a change made
+just after the wardrobe was read is not lost. The lists always match what
+top_outfits() returns for the same wardrobe, including the single empty
+outfit of a wardrobe with nothing that fills a slot.
+"""
+
+import bisect
+import threading
+
+from outfit_engine import SLOTS, best_combinations, score_item, slot_for
+
+PRESET_MOODS = ('casual', 'formal', 'party', 'romantic', 'edgy')
+PRESET_OCCASIONS = ('daily', 'work', 'date', 'party', 'travel', 'sports')
+
+# Outfits served per preset, and how many are kept to absorb removals
+TOP_K = 10
+DEPTH = 2 * TOP_K
+
+
+class PresetOutfits:
+    """Ranked slots and top outfits for one (mood, occasion) preset"""
+
+    def __init__(self, mood, occasion):
+        self.mood = mood
+        self.occasion = occasion
+        # Per slot: bisect keys (-score, seq) and matching (score, item) entries
+        self.keys = {slot: [] for slot in SLOTS}
+        self.entries = {slot: [] for slot in SLOTS}
+        # Best outfits first; `complete` means no other combination exists
+        self.outfits = []
+        self.complete = True
+
+    def rankings(self):
+        return [self.entries[slot] for slot in SLOTS]
+
+    def load(self, records):
+        """Bulk load (item, slot, seq) records and enumerate once"""
+        for item, slot, seq in records:
+            score = score_item(item, self.mood, self.occasion)
+            self.keys[slot].append((-score, seq))
+            self.entries[slot].append((score, item))
+        for slot in SLOTS:
+            order = sorted(range(len(self.keys[slot])), key=self.keys[slot].__getitem__)
+            self.keys[slot] = [self.keys[slot][i] for i in order]
+            self.entries[slot] = [self.entries[slot][i] for i in order]
+        self.refill()
+
+    def refill(self):
+        self.outfits = best_combinations(self.rankings(), DEPTH)
+        self.complete = len(self.outfits) < DEPTH
+
+    def add(self, item, slot, seq):
+        score = score_item(item, self.mood, self.occasion)
+        was_empty = not self.entries[slot]
+        position = bisect.bisect(self.keys[slot], (-score, seq))
+        self.keys[slot].insert(position, (-score, seq))
+        self.entries[slot].insert(position, (score, item))
+
+        if was_empty:
+            # Every outfit gains the slot; the new item is its only candidate
+            outfits = []
+            for outfit in self.outfits:
+                items = dict(outfit['items'])
+                items[slot] = item
+                outfits.append({'score': outfit['score'] + score, 'items': items})
+            self.outfits = outfits
+            return
+
+        # Only the combinations that include the new item need scoring
+        rankings = self.rankings()
+        rankings[SLOTS.index(slot)] = [(score, item)]
+        added = best_combinations(rankings, DEPTH)
+        added_complete = len(added) < DEPTH
+        merged = sorted(self.outfits + added, key=lambda outfit: -outfit['score'])
+
+        # Past the lowest entry of a truncated list, unseen outfits could
+        # outrank what the merge holds, so only the prefix above it is exact
+        threshold = None
+        if not self.complete:
+            threshold = self.outfits[-1]['score']
+        if not added_complete:
+            floor = added[-1]['score']
+            threshold = floor if threshold is None else max(threshold, floor)
+        if threshold is not None:
+            merged = [outfit for outfit in merged if outfit['score'] >= threshold]
+        self.complete = self.complete and added_complete and len(merged) <= DEPTH
+        self.outfits = merged[:DEPTH]
+        self.settle()
+
+    def remove(self, item, slot, seq):
+        score = score_item(item, self.mood, self.occasion)
+        position = bisect.bisect_left(self.keys[slot], (-score, seq))
+        del self.keys[slot][position]
+        del self.entries[slot][position]
+
+        self.outfits = [outfit for outfit in self.outfits if outfit['items'][slot] is not item]
+        if not self.entries[slot]:
+            # The slot is empty now, so outfits simply go without it
+            self.refill()
+        self.settle()
+
+    def settle(self):
+        """Refill from the ranked slots once fewer than K outfits are known"""
+        if len(self.outfits) < TOP_K and not self.complete:
+            self.refill()
+
+
+class OutfitCache:
+    """Top-K outfit lists for every preset, kept in step with the wardrobe"""
+
+    def __init__(self, moods=PRESET_MOODS, occasions=PRESET_OCCASIONS):
+        self.presets = {
+            (mood, occasion): PresetOutfits(mood, occasion)
+            for mood in moods for occasion in occasions
+        }
+        self.items = {}
+        self.next_seq = 0
+        self.built = False
+        self.changes = None  # [(op, item or id)] made while ensure_built() reads the wardrobe
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def build(self, items):
+        """(Re)build every preset from a full wardrobe"""
+        with self.lock:
+            self.items = {}
+            records = []
+            for seq, item in enumerate(items):
+                slot = slot_for(item)
+                if slot:
+                    self.items[item.get('id')] = (item, slot, seq)
+                    records.append((item, slot, seq))
+            self.next_seq = len(items)
+            presets = {}
+            for key in self.presets:
+                presets[key] = PresetOutfits(*key)
+                presets[key].load(records)
+            self.presets = presets
+            # Changes made after load_items() read the wardrobe; replaying
+            # one it already saw is a no-op
+            for op, value in self.changes or ():
+                if op == 'add':
+                    if value.get('id') not in self.items:
+                        self._add(value)
+                else:
+                    self._remove(value)
+            self.changes = None
+            self.built = True
+
+    def ensure_built(self, load_items):
+        """Build once from load_items() unless another thread already did"""
+        if not self.built:
+            with self.build_lock:
+                if not self.built:
+                    with self.lock:
+                        self.changes = []
+                    try:
+                        self.build(load_items())
+                    finally:
+                        with self.lock:
+                            self.changes = None
+
+    def is_preset(self, mood, occasion):
+        return (mood, occasion) in self.presets
+
+    def get(self, mood, occasion, k=1):
+        """Best K outfits for a preset; a constant-time read"""
+        return self.presets[(mood, occasion)].outfits[:k]
+
+    def add_item(self, item):
+        """Add an uploaded item; before the cache is built it is kept for the build in progress, if any"""
+        with self.lock:
+            if not self.built:
+                if self.changes is not None:
+                    self.changes.append(('add', item))
+                return
+            self._add(item)
+
+    def remove_item(self, item_id):
+        """Drop an item by id; returns False if the cache never saw it"""
+        with self.lock:
+            if not self.built:
+                if self.changes is not None:
+                    self.changes.append(('remove', item_id))
+                return False
+            return self._remove(item_id)
+
+    def _remove(self, item_id):
+        if item_id not in self.items:
+            return False
+        item, slot, seq = self.items.pop(item_id)
+        for preset in self.presets.values():
+            preset.remove(item, slot, seq)
+        return True
+
+    def _add(self, item):
+        slot = slot_for(item)
+        if not slot:
+            return
+        seq = self.next_seq
+        self.next_seq += 1
+        self.items[item.get('id')] = (item, slot, seq)
+        for preset in self.presets.values():
+            preset.add(item, slot, seq)
@@ -0,0 +1,172 @@
+"""
+Rule-based outfit scoring shared by the stylist servers.
+
+A WardrobeIndex groups wardrobe items into outfit slots once per wardrobe
+snapshot, so any number of mood/occasion queries can reuse the same buckets.
+Items are ranked per slot by how well their style and color suit the mood and
+occasion, and the best K outfits are enumerated from the ranked slot lists.
+"""
+
+import heapq
+import threading
+
+# Outfit slots in display order
+SLOTS = ('top', 'bottom', 'shoes', 'accessories')
+
+# Which slot each wardrobe item type fills
+SLOT_TYPES = {
+    'top': 'top',
+    'dress': 'top',
+    'bottom': 'bottom',
+    'shoes': 'shoes',
+    'accessories': 'accessories'
+}
+
+# Styles and colors that suit each mood
+MOOD_STYLES = {
+    'casual': {'casual', 'sporty'},
+    'formal': {'formal'},
+    'party': {'trendy'},
+    'romantic': {'vintage', 'bohemian'},
+    'edgy': {'trendy', 'vintage'},
+    'minimalist': {'minimalist'}
+}
+
+MOOD_COLORS = {
+    'formal': {'black', 'navy', 'gray', 'white', 'beige'},
+    'party': {'red', 'multicolor', 'pink', 'purple'},
+    'romantic': {'pink', 'red', 'white'},
+    'edgy': {'black', 'red'},
+    'minimalist': {'black', 'white', 'gray', 'beige'}
+}
+
+# Styles that suit each occasion
+OCCASION_STYLES = {
+    'daily': {'casual'},
+    'work': {'formal', 'minimalist'},
+    'date': {'trendy', 'vintage'},
+    'party': {'trendy'},
+    'travel': {'casual', 'sporty'},
+    'sports': {'sporty'}
+}
+
+# Score weights
+MOOD_STYLE_WEIGHT = 2
+OCCASION_STYLE_WEIGHT = 1
+MOOD_COLOR_WEIGHT = 1
+
+MAX_OUTFITS = 20
+
+
+def slot_for(item):
+    """Return the outfit slot an item fills, or None if it fills none"""
+    return SLOT_TYPES.get(item.get('item_type'))
+
+
+def score_item(item, mood, occasion):
+    """Score how well a single item suits the mood and occasion"""
+    style = item.get('style')
+    score = 0
+    if style in MOOD_STYLES.get(mood, ()):
+        score += MOOD_STYLE_WEIGHT
+    if style in OCCASION_STYLES.get(occasion, ()):
+        score += OCCASION_STYLE_WEIGHT
+    if item.get('color') in MOOD_COLORS.get(mood, ()):
+        score += MOOD_COLOR_WEIGHT
+    return score
+
+
+def describe_item(item):
+    """Short human readable description of an item"""
+    return f"{item['color']} {item['item_type']} ({item['style']})"
+
+
+class WardrobeIndex:
+    """Slot buckets and memoized per-mood rankings for one wardrobe snapshot"""
+
+    def __init__(self, items):
+        self.items = items
+        self.slots = {slot: [] for slot in SLOTS}
+        for item in items:
+            slot = slot_for(item)
+            if slot:
+                self.slots[slot].append(item)
+        self._ranked = {}
+        self._lock = threading.Lock()
+
+    def ranked(self, slot, mood, occasion):
+        """Return [(score, item), ...] for a slot, best first.
+
+        Ties keep wardrobe order, so with no matching rules the first item in
+        each bucket is preferred just like the original rule engine.
+        """
+        key = (slot, mood, occasion)
+        ranking = self._ranked.get(key)
+        if ranking is None:
+            ranking = [(score_item(item, mood, occasion), item) for item in self.slots[slot]]
+            ranking.sort(key=lambda pair: -pair[0])
+            with self._lock:
+                ranking = self._ranked.setdefault(key, ranking)
+        return ranking
+
+
+def prefer_least_worn(ranking, last_worn):
+    """Reorder equally scored items so the least recently worn come first.
+
+    `last_worn` maps an item to the time it was last worn (0 if never), so
+    never-worn items lead and keep their wardrobe order.
+    """
+    return sorted(ranking, key=lambda pair: (-pair[0], last_worn(pair[1])))
+
+
+def top_outfits(index, mood, occasion, k=1, last_worn=None, candidates=None):
+    """Return the K best outfits as [{'score': int, 'items': {slot: item}}].
+
+    Empty slots map to None. When `last_worn` is given, ties are broken in
+    favour of items not worn recently. `candidates` maps a slot to the item
+    ids it may draw from; slots it leaves out are unrestricted.
+    """
+    rankings = [index.ranked(slot, mood, occasion) for slot in SLOTS]
+    if candidates is not None:
+        rankings = [
+            [pair for pair in ranking if pair[1].get('id') in candidates[slot]] if slot in candidates else ranking
+            for slot, ranking in zip(SLOTS, rankings)
+        ]
+    if last_worn is not None:
+        rankings = [prefer_least_worn(ranking, last_worn) for ranking in rankings]
+    return best_combinations(rankings, k)
+
+
+def best_combinations(rankings, k):
+    """Enumerate the K best outfits from per-slot rankings.
+
+    `rankings` holds one best-first [(score, item), ...] list per slot in
+    SLOTS order. Outfit score is the sum of its item scores, so the K best
+    combinations are enumerated lazily with a heap instead of scoring every
+    combination.
+    """
+    k = max(1, min(int(k), MAX_OUTFITS))
+    filled = [i for i, ranking in enumerate(rankings) if ranking]
+
+    def total(position):
+        return sum(rankings[i][p][0] for i, p in zip(filled, position))
+
+    start = (0,) * len(filled)
+    heap = [(-total(start), start)]
+    seen = {start}
+    outfits = []
+    while heap and len(outfits) < k:
+        negative_score, position = heapq.heappop(heap)
+        items = {slot: None for slot in SLOTS}
+        for i, p in zip(filled, position):
+            items[SLOTS[i]] = rankings[i][p][1]
+        outfits.append({'score': -negative_score, 'items': items})
+
+        # Successors advance one slot to its next best candidate
+        for n, i in enumerate(filled):
+            if position[n] + 1 < len(rankings[i]):
+                successor = position[:n] + (position[n] + 1,) + position[n + 1:]
+                if successor not in seen:
+                    seen.add(successor)
+                    heapq.heappush(heap, (-total(successor), successor))
+    return outfits
@@ -0,0 +1,241 @@
+"""
+Tolerant parsing of the AI stylist's outfit replies.
+
+The model is asked for strict JSON but does not always comply: the object
+may come wrapped in a fenced code block or surrounded by prose, use smart or
+single quotes, leave trailing commas, or be cut off by the token limit. The
+parser extracts the outermost object, repairs those defects, and as a last
+resort picks compact item IDs (T1, B2, ...) out of plain text.
+
+Every slot is then checked against the prompt's ID map: a slot must name an
+ID of its own kind (a top for "top", ...) or the exact description of one.
+Slots that are missing or invalid fall back to the best-ranked candidate the
+prompt offered for that slot (the first ID of its kind in the ID map, which
+lists each slot's candidates best first), so a paid reply is used rather
+than discarded.
+"""
+
+import json
+import re
+import threading
+
+from outfit_engine import SLOTS, describe_item
+from prompt_builder import SLOT_PREFIXES, item_line_text
+
+FENCED_BLOCK = re.compile(r'```(?:json|JSON)?\s*(.*?)```', re.DOTALL)
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+COMPACT_ID = re.compile(r'\b([TBSA])(\d+)\b', re.IGNORECASE)
+SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '‘': "'", '’': "'"})
+
+# How many cut points to try when closing a truncated object
+MAX_TRUNCATION_CUTS = 64
+
+PREFIX_SLOTS = {prefix: slot for slot, prefix in SLOT_PREFIXES.items()}
+
+
+def outermost_object(text):
+    """Text from the first '{' to its matching '}', or to the end if it never closes"""
+    start = text.find('{')
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for pos in range(start, len(text)):
+        char = text[pos]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return text[start:]
+
+
+def close_truncated(text):
+    """Parse an object cut off part way by dropping the unfinished tail.
+
+    Walks the text recording every point where a member or element could
+    end, then tries those points from the last one back, closing whatever
+    brackets were still open there.
+    """
+    stack = []
+    cuts = []
+    in_string = False
+    escaped = False
+    for pos, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+            cuts.append((pos + 1, ''.join(reversed(stack))))
+        elif char in '}]':
+            if stack:
+                stack.pop()
+            cuts.append((pos + 1, ''.join(reversed(stack))))
+        elif char == ',':
+            cuts.append((pos, ''.join(reversed(stack))))
+    for end, closing in reversed(cuts[-MAX_TRUNCATION_CUTS:]):
+        try:
+            return json.loads(text[:end] + closing)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def load_object(text):
+    """Best-effort dict from a model reply, or None"""
+    try:
+        data = json.loads(text)
+        return data if isinstance(data, dict) else None
+    except json.JSONDecodeError:
+        pass
+
+    fenced = FENCED_BLOCK.search(text)
+    candidate = outermost_object(fenced.group(1) if fenced else text)
+    if candidate is None:
+        return None
+    candidate = TRAILING_COMMA.sub(r'\1', candidate.translate(SMART_QUOTES))
+    if '"' not in candidate:
+        candidate = candidate.replace("'", '"')
+    try:
+        data = json.loads(candidate)
+    except json.JSONDecodeError:
+        data = close_truncated(candidate)
+    return data if isinstance(data, dict) else None
+
+
+class OutfitParser:
+    """Turns model replies into validated outfits and counts how each was read"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {
+            'strict': 0,
+            'repaired': 0,
+            'salvaged': 0,
+            'failed': 0,
+            'slots_replaced': 0
+        }
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.metrics[name] += amount
+
+    def parse(self, text, id_map):
+        """Return an outfit dict with slot descriptions and "items", or None.
+
+        The result has the prompt's JSON shape ("outfit", "styling_tips",
+        "reasoning"); None means nothing in the reply could be used.
+        """
+        try:
+            data = json.loads(text)
+            kind = 'strict' if isinstance(data, dict) else None
+        except json.JSONDecodeError:
+            data = None
+            kind = None
+        if kind is None:
+            data = load_object(text)
+            kind = 'repaired' if data is not None else None
+
+        if data is not None:
+            outfit = data.get('outfit')
+            if not isinstance(outfit, dict):
+                # Slots at the top level instead of under "outfit"
+                outfit = {slot: data[slot] for slot in SLOTS if slot in data}
+            if outfit:
+                data['outfit'] = outfit
+            else:
+                data = None
+
+        if data is None:
+            outfit = self.ids_in_text(text)
+            if not outfit:
+                self.count('failed')
+                return None
+            data = {
+                'outfit': outfit,
+                'styling_tips': text.strip(),
+                'reasoning': "AI-generated styling advice"
+            }
+            kind = 'salvaged'
+
+        self.count(kind)
+        return self.validate(data, id_map)
+
+    def ids_in_text(self, text):
+        """First compact ID of each kind mentioned anywhere in free text"""
+        outfit = {}
+        for prefix, number in COMPACT_ID.findall(text):
+            slot = PREFIX_SLOTS[prefix.upper()]
+            outfit.setdefault(slot, f"{prefix.upper()}{number}")
+        return outfit
+
+    def validate(self, data, id_map):
+        """Resolve every slot to an item from id_map, replacing unusable answers"""
+        by_text = {}
+        for compact_id, item in id_map.items():
+            by_text.setdefault(item_line_text(item).lower(), compact_id)
+            by_text.setdefault(describe_item(item).lower(), compact_id)
+
+        best = {}
+        for compact_id in id_map:
+            best.setdefault(PREFIX_SLOTS[compact_id[0]], compact_id)
+
+        outfit = data['outfit']
+        resolved = {}
+        replaced = 0
+        for slot in SLOTS:
+            compact_id = self.slot_id(outfit.get(slot), slot, id_map, by_text)
+            if compact_id is None:
+                compact_id = best.get(slot)
+                if compact_id is None:
+                    # Nothing of this kind in the wardrobe; keep the model's words
+                    if not isinstance(outfit.get(slot), str):
+                        outfit[slot] = f"No {slot} in your wardrobe yet"
+                    continue
+                replaced += 1
+            resolved[slot] = id_map[compact_id]
+            outfit[slot] = describe_item(resolved[slot])
+        if replaced:
+            self.count('slots_replaced', replaced)
+
+        data.setdefault('styling_tips', "")
+        data.setdefault('reasoning', "")
+        if resolved:
+            data['items'] = resolved
+        return data
+
+    def slot_id(self, value, slot, id_map, by_text):
+        """The compact ID a slot value names, if it is a valid one for the slot"""
+        if not isinstance(value, str):
+            return None
+        match = COMPACT_ID.search(value)
+        if match:
+            compact_id = f"{match.group(1).upper()}{match.group(2)}"
+            if compact_id in id_map and compact_id[0] == SLOT_PREFIXES[slot]:
+                return compact_id
+        compact_id = by_text.get(value.strip().lower())
+        if compact_id and compact_id[0] == SLOT_PREFIXES[slot]:
+            return compact_id
+        return None
+
+    def stats(self):
+        with self.lock:
+            return dict(self.metrics)
@@ -0,0 +1,163 @@
+"""
+Multi-day outfit planning with no-repeat constraints.
+
+Each day asks for its own mood and occasion and is scored with the same
+per-slot rankings as the rule engine in outfit_engine. An item worn on one day
+may not be worn again until `repeat_gap` days later. Slots are scheduled
+independently because outfit scores are additive per slot.
+
+Availability is tracked with integer bitsets: every item in a slot owns one
+bit, each planned day keeps the mask of items it uses, and the items blocked
+for a day are the OR of the masks of the days inside its window. Days are
+filled greedily with their best unblocked candidate, and a day that finds its
+slot exhausted is repaired by moving a neighbouring day onto an alternative
+item so that its item becomes free.
+"""
+
+from datetime import date
+
+from outfit_engine import SLOTS
+
+MAX_PLAN_DAYS = 366
+
+
+def day_numbers(days):
+    """Return a day number per requested day.
+
+    Days with an ISO `date` are placed on the calendar; otherwise the position
+    in the request is used, so plain lists are treated as consecutive days.
+    """
+    if days and all(day.get('date') for day in days):
+        return [date.fromisoformat(day['date'][:10]).toordinal() for day in days]
+    return list(range(len(days)))
+
+
+class SlotSchedule:
+    """Bitset availability for one outfit slot across the planned days"""
+
+    def __init__(self, candidates, numbers, repeat_gap):
+        # candidates[d] is the ranked [(score, item), ...] list for day d
+        self.candidates = candidates
+        self.numbers = numbers
+        self.repeat_gap = repeat_gap
+        self.bits = {}
+        for ranking in candidates:
+            for _, item in ranking:
+                self.bits.setdefault(id(item), 1 << len(self.bits))
+        self.chosen = [None] * len(numbers)
+        self.masks = [0] * len(numbers)
+
+    def neighbours(self, d):
+        """Days other than d close enough that they cannot share an item"""
+        number = self.numbers[d]
+        return [
+            e for e in range(len(self.numbers))
+            if e != d and abs(self.numbers[e] - number) < self.repeat_gap
+        ]
+
+    def blocked(self, d, ignore=None):
+        mask = 0
+        for e in self.neighbours(d):
+            if e != ignore:
+                mask |= self.masks[e]
+        return mask
+
+    def best_free(self, d, blocked, exclude=0):
+        for position, (score, item) in enumerate(self.candidates[d]):
+            if not self.bits[id(item)] & (blocked | exclude):
+                return position
+        return None
+
+    def assign(self, d, position):
+        self.chosen[d] = position
+        if position is None:
+            self.masks[d] = 0
+        else:
+            item = self.candidates[d][position][1]
+            self.masks[d] = self.bits[id(item)]
+
+    def score(self, d, position):
+        return self.candidates[d][position][0] if position is not None else 0
+
+    def fill(self, d):
+        """Greedily fill day d, repairing a neighbour if nothing is free"""
+        if not self.candidates[d]:
+            return True
+        position = self.best_free(d, self.blocked(d))
+        if position is not None:
+            self.assign(d, position)
+            return True
+        return self.repair(d)
+
+    def repair(self, d):
+        """Free an item for day d by moving one neighbour onto an alternative.
+
+        Every neighbour holding an item day d could use is tried; the move
+        that keeps the highest combined score of both days wins.
+        """
+        best = None
+        for e in self.neighbours(d):
+            if self.chosen[e] is None:
+                continue
+            freed = self.candidates[e][self.chosen[e]][1]
+            # The freed item must be usable on day d apart from e's claim
+            wanted = self.best_free(d, self.blocked(d, ignore=e))
+            if wanted is None or self.candidates[d][wanted][1] is not freed:
+                continue
+            # Day e needs a replacement that avoids its window and the freed item
+            replacement = self.best_free(e, self.blocked(e) | self.masks[e] | self.bits[id(freed)])
+            if replacement is None:
+                continue
+            total = self.score(d, wanted) + self.score(e, replacement)
+            if best is None or total > best[0]:
+                best = (total, e, replacement, wanted)
+        if best is None:
+            self.assign(d, None)
+            return False
+        _, e, replacement, wanted = best
+        self.assign(e, replacement)
+        self.assign(d, wanted)
+        return True
+
+
+def plan_outfits(index, days, repeat_gap=7):
+    """Plan one outfit per requested day.
+
+    `days` is a list of {'mood', 'occasion', optional 'date'} dicts. Returns
+    one {'items': {slot: item}, 'score': int, 'unfilled': [slot, ...]} entry
+    per day in request order; a slot is unfilled when the wardrobe has no
+    item for it that satisfies the no-repeat window.
+    """
+    if len(days) > MAX_PLAN_DAYS:
+        raise ValueError(f"At most {MAX_PLAN_DAYS} days per plan")
+    repeat_gap = max(0, int(repeat_gap))
+    numbers = day_numbers(days)
+    order = sorted(range(len(days)), key=lambda d: numbers[d])
+
+    schedules = {}
+    for slot in SLOTS:
+        candidates = [
+            index.ranked(slot, day.get('mood', 'casual'), day.get('occasion', 'daily'))
+            for day in days
+        ]
+        schedule = SlotSchedule(candidates, numbers, repeat_gap)
+        for d in order:
+            schedule.fill(d)
+        schedules[slot] = schedule
+
+    plan = []
+    for d in range(len(days)):
+        items = {}
+        unfilled = []
+        score = 0
+        for slot, schedule in schedules.items():
+            position = schedule.chosen[d]
+            if position is None:
+                items[slot] = None
+                if schedule.candidates[d]:
+                    unfilled.append(slot)
+            else:
+                score += schedule.score(d, position)
+                items[slot] = schedule.candidates[d][position][1]
+        plan.append({'items': items, 'score': score, 'unfilled': unfilled})
+    return plan
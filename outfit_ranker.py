@@ -0,0 +1,189 @@
+"""
+Personal outfit ranking learned online from rating history.
+
+When a rated photo shows a suggested outfit, its rating record carries a
+snapshot of the outfit's items. Each such rating is one training example
+for a logistic regression over hashed features of the outfit in its
+context: every item's style, color and type, those crossed with the rating
+theme (used as the mood) and the occasion, and the item itself. The label
+is the overall score scaled to 0-1, so a 90 pulls harder than a 60.
+Updates are a single AdaGrad step touching only the outfit's features.
+
+generate_outfit asks the rule engine for its best candidates and re-ranks
+them by rule score plus `weight * (2p - 1)`, where p is the predicted
+rating. With no ratings p is 0.5 everywhere and the rule order is kept.
+Scoring a candidate list is one gather and sum over a padded feature-index
+matrix.
+
+Like RatingStats, the model follows the rating store: it is updated under
+the store lock as ratings are appended, snapshotted every
+`checkpoint_every` updates with the number of ratings it has seen, and at
+startup only the ratings logged after the snapshot are replayed. Snapshots
+are written atomically and the one before is kept; the npz archive's CRCs
+catch a damaged snapshot, and loading then falls back to the previous one.
+"""
+
+import io
+import os
+import threading
+import zipfile
+import zlib
+
+import numpy as np
+
+from atomic_files import previous_path, write_atomic
+from outfit_engine import SLOTS
+
+DIMENSIONS = 1 << 14
+DEFAULT_LEARNING_RATE = 0.2
+DEFAULT_WEIGHT = 2.0
+DEFAULT_CHECKPOINT_EVERY = 50
+
+# Rule-engine candidates re-ranked per request
+RERANK_CANDIDATES = 10
+
+# Item fields kept in rating records and used as features
+ITEM_FIELDS = ('id', 'item_type', 'color', 'style')
+
+
+def item_snapshot(item):
+    """The fields of a wardrobe item that a rating record keeps"""
+    return {field: item.get(field) for field in ITEM_FIELDS}
+
+
+def feature_index(name):
+    return zlib.crc32(name.encode()) % DIMENSIONS
+
+
+def outfit_features(items, mood, occasion):
+    """Hashed feature indices of an outfit in a mood/occasion context"""
+    indices = []
+    for item in items:
+        if not item:
+            continue
+        for field in ('style', 'color', 'item_type'):
+            value = item.get(field)
+            indices.append(feature_index(f"{field}={value}"))
+            indices.append(feature_index(f"{field}={value}|mood={mood}"))
+            indices.append(feature_index(f"{field}={value}|occasion={occasion}"))
+        indices.append(feature_index(f"item={item.get('id')}"))
+    return indices
+
+
+class OutfitRanker:
+    """Online logistic regression over outfit features, with snapshots"""
+
+    def __init__(self, path='ratings/ranker.npz', learning_rate=DEFAULT_LEARNING_RATE,
+                 weight=DEFAULT_WEIGHT, checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+        self.path = path
+        self.learning_rate = learning_rate
+        self.weight = weight
+        self.checkpoint_every = checkpoint_every
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.weights = np.zeros(DIMENSIONS + 1)  # last entry is the bias
+            self.gradient_squares = np.zeros(DIMENSIONS + 1)
+            self.seen = 0
+            self.saved_at = 0
+            self.updates = 0
+
+    def load(self):
+        """Load the snapshot, else the previous one; returns how many ratings it covers"""
+        for path in (self.path, previous_path(self.path)):
+            try:
+                with np.load(path) as snapshot:
+                    weights = snapshot['weights']
+                    gradient_squares = snapshot['gradient_squares']
+                    seen, updates = (int(value) for value in snapshot['counters'])
+            except (KeyError, ValueError, OSError, EOFError, zipfile.BadZipFile):
+                continue
+            # A snapshot from a different feature layout is not usable either
+            if weights.shape == gradient_squares.shape == (DIMENSIONS + 1,):
+                break
+        else:
+            self.reset()
+            return 0
+        with self.lock:
+            self.weights = weights
+            self.gradient_squares = gradient_squares
+            self.seen = self.saved_at = seen
+            self.updates = updates
+        return seen
+
+    def save(self):
+        """Write the snapshot atomically, keeping the previous one"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        buffer = io.BytesIO()
+        np.savez(buffer, weights=self.weights, gradient_squares=self.gradient_squares,
+                 counters=np.array([self.seen, self.updates]))
+        write_atomic(self.path, buffer.getvalue(), keep_previous=True)
+        self.saved_at = self.seen
+
+    def add(self, rating_data):
+        """Learn from one logged rating; ratings without outfit items only advance `seen`"""
+        items = rating_data.get('items')
+        score = (rating_data.get('rating') or {}).get('overall_score')
+        with self.lock:
+            self.seen += 1
+            if items and isinstance(score, (int, float)):
+                self.update(outfit_features(items, rating_data.get('theme'), rating_data.get('occasion')),
+                            min(1.0, max(0.0, score / 100)))
+            save = self.seen - self.saved_at >= self.checkpoint_every
+        if save:
+            self.save()
+
+    def update(self, indices, label):
+        """One AdaGrad step of logistic loss on a sparse example"""
+        indices, counts = np.unique(np.append(indices, DIMENSIONS), return_counts=True)
+        # Scale so outfits with more items do not take larger steps
+        values = counts / np.sqrt(counts.sum())
+        logit = self.weights[indices] @ values
+        gradient = (1.0 / (1.0 + np.exp(-logit)) - label) * values
+        self.gradient_squares[indices] += gradient * gradient
+        self.weights[indices] -= self.learning_rate * gradient / np.sqrt(self.gradient_squares[indices] + 1e-8)
+        self.updates += 1
+
+    def predict(self, outfits, mood, occasion):
+        """Predicted rating (0-1) of each outfit, given as lists of items"""
+        rows = [outfit_features(items, mood, occasion) + [DIMENSIONS] for items in outfits]
+        width = max(len(row) for row in rows)
+        indices = np.full((len(rows), width), DIMENSIONS, dtype=np.int64)
+        values = np.zeros((len(rows), width))
+        for n, row in enumerate(rows):
+            indices[n, :len(row)] = row
+            values[n, :len(row)] = 1.0 / np.sqrt(len(row))
+        with self.lock:
+            logits = (self.weights[indices] * values).sum(axis=1)
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def rerank(self, selections, mood, occasion):
+        """Selections from top_outfits, reordered by rule score plus learned preference.
+
+        Returns new dicts with a 'preference' (predicted rating, 0-1); the
+        input selections, which may be cached, are not changed.
+        """
+        if not selections or not self.updates:
+            return selections
+        predicted = self.predict([[selection['items'].get(slot) for slot in SLOTS] for selection in selections],
+                                 mood, occasion)
+        ranked = [
+            dict(selection, preference=round(float(p), 3))
+            for selection, p in zip(selections, predicted)
+        ]
+        adjusted = [selection['score'] + self.weight * (2 * p - 1) for selection, p in zip(selections, predicted)]
+        order = sorted(range(len(ranked)), key=lambda n: -adjusted[n])
+        return [ranked[n] for n in order]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'seen': self.seen,
+                'updates': self.updates,
+                'saved_at': self.saved_at,
+                'active_features': int(np.count_nonzero(self.weights[:DIMENSIONS]))
+            }
@@ -0,0 +1,125 @@
+"""
+Token-budgeted prompt construction for the AI stylist.
+
+Instead of one line per wardrobe item, the prompt lists only the best local
+candidates per outfit slot (ranked by the rule engine in outfit_engine),
+merges items with identical descriptions into one line with a count, and
+refers to each line by a compact ID such as T1 or S2. Lines are added best
+first, one slot at a time, until the token budget is spent, so the prompt
+stays small however large the wardrobe grows. The ID map returned with the
+prompt turns the model's answer back into full wardrobe items.
+"""
+
+from outfit_engine import SLOTS, WardrobeIndex
+
+# Compact ID prefix per slot
+SLOT_PREFIXES = {
+    'top': 'T',
+    'bottom': 'B',
+    'shoes': 'S',
+    'accessories': 'A'
+}
+
+DEFAULT_TOKEN_BUDGET = 600
+DEFAULT_PER_SLOT = 8
+
+# Rough size of an English token in characters
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Cheap token estimate; close enough for budgeting without a tokenizer"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def item_line_text(item):
+    return f"{item['item_type']} ({item['color']}, {item['style']} style)"
+
+
+def slot_candidates(index, slot, mood, occasion, per_slot):
+    """Best distinct descriptions for a slot as [(text, [items])], best first"""
+    groups = {}
+    for _, item in index.ranked(slot, mood, occasion):
+        text = item_line_text(item)
+        if text in groups:
+            groups[text].append(item)
+        elif len(groups) < per_slot:
+            groups[text] = [item]
+    return list(groups.items())
+
+
+def build_prompt_lines(items, mood, occasion, token_budget=DEFAULT_TOKEN_BUDGET,
+                       per_slot=DEFAULT_PER_SLOT, index=None):
+    """Return (wardrobe_lines, id_map) that fit within token_budget.
+
+    id_map lists each slot's candidates best first; outfit_parser falls back
+    to the first one of a slot's kind.
+    """
+    index = index or WardrobeIndex(items)
+    candidates = {
+        slot: slot_candidates(index, slot, mood, occasion, per_slot)
+        for slot in SLOTS
+    }
+
+    lines = []
+    id_map = {}
+    spent = 0
+    depth = 0
+    # Round-robin over slots so every slot gets its best candidates first
+    while True:
+        added = False
+        for slot in SLOTS:
+            groups = candidates[slot]
+            if depth >= len(groups):
+                continue
+            text, group = groups[depth]
+            compact_id = f"{SLOT_PREFIXES[slot]}{depth + 1}"
+            count = f" x{len(group)}" if len(group) > 1 else ""
+            line = f"- {compact_id}{count}: {text}"
+            cost = estimate_tokens(line)
+            if spent + cost > token_budget and lines:
+                return lines, id_map
+            lines.append(line)
+            id_map[compact_id] = group[0]
+            spent += cost
+            added = True
+        if not added:
+            return lines, id_map
+        depth += 1
+
+
+def build_prompt(items, mood, occasion, token_budget=DEFAULT_TOKEN_BUDGET,
+                 per_slot=DEFAULT_PER_SLOT, index=None):
+    """Return (prompt, id_map) for generate_outfit_with_ai"""
+    lines, id_map = build_prompt_lines(items, mood, occasion, token_budget, per_slot, index)
+    items_text = "\n".join(lines)
+
+    prompt = f"""
+    You are a fashion stylist. Based on the user's wardrobe and their desired mood/occasion, suggest a complete outfit.
+
+    User's Wardrobe (ID: item, "xN" means N similar pieces):
+    {items_text}
+
+    Desired Mood: {mood}
+    Occasion: {occasion}
+
+    Please suggest a complete outfit by selecting items from the wardrobe by ID. Consider:
+    1. Color coordination
+    2. Style matching
+    3. Occasion appropriateness
+    4. Mood expression
+
+    Return your response in JSON format with this structure:
+    {{
+        "outfit": {{
+            "top": "ID of a top, e.g. T1",
+            "bottom": "ID of a bottom, e.g. B1",
+            "shoes": "ID of shoes, e.g. S1",
+            "accessories": "ID of an accessory, e.g. A1"
+        }},
+        "styling_tips": "Brief styling advice",
+        "reasoning": "Why this outfit works for the mood/occasion"
+    }}
+    """
+    return prompt, id_map
+
@@ -0,0 +1,80 @@
+"""
+Token-bucket limiter for outbound OpenAI calls.
+
+Tokens refill at `rate` per second up to `burst`. A caller that finds the
+bucket empty waits for a token, but only if fewer than `max_waiters` callers
+are already queued and the token will arrive before its own timeout;
+otherwise it is turned away at once. Bursts are smoothed into the
+configured rate instead of turning into a storm of 429 responses.
+"""
+
+import threading
+import time
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no token can be had within the caller's wait budget"""
+
+
+class TokenBucket:
+    """Token bucket with a bounded wait queue"""
+
+    def __init__(self, rate=3.0, burst=5, max_waiters=20):
+        if not rate > 0:
+            raise ValueError(f"rate must be above 0 tokens per second, got {rate}")
+        if burst < 1:
+            raise ValueError(f"burst must be at least 1, got {burst}")
+        self.rate = rate
+        self.burst = burst
+        self.max_waiters = max_waiters
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self.cond = threading.Condition()
+        self.metrics = {
+            'granted': 0,
+            'waited': 0,
+            'rejected': 0
+        }
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout):
+        """Take a token, waiting up to `timeout` seconds; False if refused"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.metrics['granted'] += 1
+                return True
+            if self.waiting >= self.max_waiters:
+                self.metrics['rejected'] += 1
+                return False
+            self.waiting += 1
+            self.metrics['waited'] += 1
+            try:
+                while True:
+                    self.refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.metrics['granted'] += 1
+                        return True
+                    wait = (1 - self.tokens) / self.rate
+                    if time.monotonic() + wait > deadline:
+                        self.metrics['rejected'] += 1
+                        return False
+                    self.cond.wait(wait)
+            finally:
+                self.waiting -= 1
+
+    def stats(self):
+        with self.cond:
+            self.refill()
+            report = dict(self.metrics)
+            report['tokens'] = round(self.tokens, 2)
+            report['waiting'] = self.waiting
+            return report
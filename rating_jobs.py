@@ -0,0 +1,146 @@
+"""
+Background outfit rating jobs.
+
+POST /rate-outfit stores the photo, submits a job and answers with its id
+straight away; scoring (photo features, rating rules, saving to the rating
+store) runs on a small thread pool. Clients follow a job by polling
+GET /rate-outfit/jobs/<id> or by listening to
+GET /rate-outfit/jobs/<id>/events, which pushes each status change.
+
+Jobs move queued -> running -> done | failed. Each change bumps the job's
+version and wakes waiters, so a stream sends every change exactly once.
+Finished jobs are kept for `ttl` seconds (and at most `max_jobs` in total)
+so a late poll still finds the result.
+
+Jobs live in memory only. A restart forgets every job: queued and running
+ratings are never scored, and their ids answer 404. The uploaded photo is
+already on disk, so a client that sees a 404 for a job it never saw finish
+can upload again.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+DEFAULT_TTL = 15 * 60
+DEFAULT_MAX_JOBS = 1000
+
+FINISHED = ('done', 'failed')
+
+
+class RatingJobs:
+    """Job registry plus the worker pool that runs the jobs"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, ttl=DEFAULT_TTL, max_jobs=DEFAULT_MAX_JOBS):
+        self.workers = workers
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self.executor = None
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.metrics = {
+            'submitted': 0,
+            'done': 0,
+            'failed': 0,
+            'expired': 0
+        }
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            workers=int(os.getenv('RATING_JOB_WORKERS', DEFAULT_WORKERS)),
+            ttl=float(os.getenv('RATING_JOB_TTL', DEFAULT_TTL))
+        )
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex[:16]
+
+    def submit(self, job_id, task, *args):
+        """Queue task(*args) under job_id; its return value becomes the job result"""
+        with self.lock:
+            self._expire()
+            self.jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'version': 0,
+                'created_at': time.time(),
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+            self.metrics['submitted'] += 1
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='rating-job')
+            executor = self.executor
+        executor.submit(self._run, job_id, task, args)
+        return job_id
+
+    def _run(self, job_id, task, args):
+        self._update(job_id, status='running')
+        try:
+            result = task(*args)
+        except Exception as e:
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+        else:
+            self._update(job_id, status='done', result=result, finished_at=time.time())
+
+    def _update(self, job_id, **changes):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job.update(changes)
+            job['version'] += 1
+            if job['status'] in FINISHED:
+                self.metrics[job['status']] += 1
+            self.changed.notify_all()
+
+    def _expire(self):
+        """Drop finished jobs past their ttl, then the oldest ones over max_jobs"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['finished_at'] is not None and now - job['finished_at'] > self.ttl
+        ]
+        overflow = len(self.jobs) - len(expired) - self.max_jobs + 1
+        if overflow > 0:
+            # Dicts keep submission order, so the first finished jobs are the oldest
+            expired += [
+                job_id for job_id, job in self.jobs.items()
+                if job['finished_at'] is not None and job_id not in expired
+            ][:overflow]
+        for job_id in expired:
+            del self.jobs[job_id]
+        self.metrics['expired'] += len(expired)
+
+    def get(self, job_id):
+        """Copy of a job, or None if it is unknown or expired"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait(self, job_id, version=-1, timeout=None):
+        """Block until the job is past `version` or the timeout passes; returns a copy or None"""
+        with self.lock:
+            self.changed.wait_for(
+                lambda: job_id not in self.jobs or self.jobs[job_id]['version'] > version,
+                timeout=timeout
+            )
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self.lock:
+            pending = sum(1 for job in self.jobs.values() if job['status'] not in FINISHED)
+            return dict(self.metrics, pending=pending, kept=len(self.jobs), workers=self.workers)
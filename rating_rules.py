@@ -0,0 +1,134 @@
+"""
+Theme/occasion rating rules compiled into a lookup table.
+
+The rules live in rating_rules.json: per theme, the occasions it suits, the
+rating for those ("match") and for any other occasion ("other"), plus a
+"default" rating for unknown themes. load() compiles every rating into a
+template (tuples for lists, star rating precomputed) and every
+(theme, occasion) pair the rules name into a dict, so a lookup is one dict
+access whatever the number of rules.
+
+Templates are never handed out: template() returns a read-only view and
+rating() a fresh copy for personalization, with its own lists.
+
+The file's modification time is checked at most every `check_interval`
+seconds and the table recompiled when it changes; a file that fails to load
+leaves the previous table in place.
+"""
+
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+SCORE_FIELDS = ('overall_score', 'theme_appropriateness', 'occasion_suitability',
+                'style_cohesion', 'color_coordination', 'accessories')
+TEXT_FIELDS = ('feedback',)
+LIST_FIELDS = ('strengths', 'improvements')
+
+DEFAULT_CHECK_INTERVAL = 2.0
+
+
+def compile_template(spec):
+    """Rating for one rule, with unset scores at 0; callers must not change it"""
+    rating = {}
+    for field in SCORE_FIELDS:
+        score = spec.get(field, 0)
+        if not isinstance(score, (int, float)):
+            raise ValueError(f"{field} must be a number")
+        rating[field] = score
+    for field in TEXT_FIELDS:
+        rating[field] = str(spec.get(field, ''))
+    for field in LIST_FIELDS:
+        rating[field] = tuple(str(entry) for entry in spec.get(field, ()))
+    rating['star_rating'] = max(1, min(5, round(rating['overall_score'] / 20)))
+    return rating
+
+
+def compile_rules(rules):
+    """({(theme, occasion): template}, {theme: other_template}, default_template)"""
+    table = {}
+    others = {}
+    for theme, rule in rules.get('themes', {}).items():
+        match = compile_template(rule['match'])
+        others[theme] = compile_template(rule.get('other', rules['default']))
+        for occasion in rule.get('occasions', ()):
+            table[(theme, occasion)] = match
+    return table, others, compile_template(rules['default'])
+
+
+class RatingTable:
+    """Compiled rating rules with hot reload"""
+
+    def __init__(self, path='rating_rules.json', check_interval=DEFAULT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        # (table, others, default), swapped as one so lookups never mix rule sets
+        self.compiled = None
+        self.mtime = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+        self.metrics = {
+            'loads': 0,
+            'load_errors': 0,
+            'last_error': None
+        }
+
+    def load(self):
+        """Compile the rules file; keeps the current table if it cannot be read"""
+        with self.lock:
+            self.checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    compiled = compile_rules(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                self.metrics['load_errors'] += 1
+                self.metrics['last_error'] = f"{type(e).__name__}: {e}"
+                if self.compiled is None:
+                    raise
+                print(f"⚠️  Keeping previous rating rules: {self.metrics['last_error']}")
+                return False
+            self.compiled = compiled
+            self.mtime = mtime
+            self.metrics['loads'] += 1
+            return True
+
+    def reload_if_changed(self):
+        """Recompile when the rules file changed since it was loaded"""
+        now = time.monotonic()
+        if self.compiled is not None and now - self.checked_at < self.check_interval:
+            return False
+        self.checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self.compiled is not None and mtime == self.mtime:
+            return False
+        return self.load()
+
+    def lookup(self, theme, occasion):
+        self.reload_if_changed()
+        table, others, default = self.compiled
+        template = table.get((theme, occasion))
+        if template is None:
+            template = others.get(theme, default)
+        return template
+
+    def template(self, theme, occasion):
+        """Read-only rating for a theme and occasion"""
+        return MappingProxyType(self.lookup(theme, occasion))
+
+    def rating(self, theme, occasion):
+        """Mutable copy of the template, ready for personalization"""
+        rating = self.lookup(theme, occasion).copy()
+        rating['strengths'] = list(rating['strengths'])
+        rating['improvements'] = list(rating['improvements'])
+        return rating
+
+    def stats(self):
+        with self.lock:
+            table, others, _ = self.compiled or ({}, {}, None)
+            return dict(self.metrics, pairs=len(table), themes=len(others))
@@ -0,0 +1,137 @@
+"""
+Running rating aggregates for GET /ratings/stats.
+
+Every saved rating updates a fixed number of groups: all ratings, its
+theme, its occasion, its day and its ISO week. Each group keeps a count
+plus a sum and a 10-point histogram per score field, so an update costs the
+same however long the history is, and means are derived when read.
+
+The aggregates are checkpointed to disk every `checkpoint_every` ratings
+together with how many ratings they cover. At startup the checkpoint is
+loaded and only the ratings logged after it are replayed from the rating
+store, instead of rescanning the whole history. Checkpoints are written
+atomically with a checksum; one that does not verify is passed over for
+the previous checkpoint, or a full replay.
+"""
+
+from datetime import date
+
+from atomic_files import CorruptFile, decode_checked_json, read_with_fallback, write_checked_json
+
+# Rating fields that are aggregated
+SCORE_FIELDS = ('overall_score', 'theme_appropriateness', 'occasion_suitability',
+                'style_cohesion', 'color_coordination', 'accessories')
+
+# Histogram buckets of 10 points: 0-9, 10-19, ..., 90-100
+HISTOGRAM_BUCKETS = 10
+
+DEFAULT_CHECKPOINT_EVERY = 50
+
+
+def week_of(day):
+    """ISO week label such as 2025-W03 for a YYYY-MM-DD day"""
+    try:
+        year, week, _ = date.fromisoformat(day).isocalendar()
+    except ValueError:
+        return ''
+    return f"{year}-W{week:02d}"
+
+
+def new_group():
+    return {
+        'count': 0,
+        'scores': {
+            field: {'sum': 0, 'histogram': [0] * HISTOGRAM_BUCKETS}
+            for field in SCORE_FIELDS
+        }
+    }
+
+
+def summarize(group):
+    """Count, mean and histogram per score field of one group"""
+    scores = {}
+    for field, totals in group['scores'].items():
+        # Ratings without this field are left out of its mean
+        scored = sum(totals['histogram'])
+        scores[field] = {
+            'mean': round(totals['sum'] / scored, 2) if scored else 0.0,
+            'histogram': list(totals['histogram'])
+        }
+    return {'count': group['count'], 'scores': scores}
+
+
+class RatingStats:
+    """Per-theme, per-occasion, per-day and per-week rating aggregates.
+
+    Not locked on its own: RatingStore calls add() under its lock, so the
+    aggregates always cover exactly the first `seen` ratings of the log.
+    """
+
+    def __init__(self, path='ratings/stats.json', checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.reset()
+
+    def reset(self):
+        self.seen = 0
+        self.saved_at = 0
+        self.groups = {
+            'all': {'all': new_group()},
+            'theme': {},
+            'occasion': {},
+            'day': {},
+            'week': {}
+        }
+
+    def load(self):
+        """Load the checkpoint; returns how many ratings it covers"""
+        try:
+            checkpoint, _ = read_with_fallback(self.path, decode_checked_json)
+            self.seen = self.saved_at = checkpoint['seen']
+            self.groups = checkpoint['groups']
+        except (FileNotFoundError, CorruptFile, KeyError, TypeError):
+            self.reset()
+        return self.seen
+
+    def save(self):
+        """Write the checkpoint atomically"""
+        write_checked_json(self.path, {'seen': self.seen, 'groups': self.groups})
+        self.saved_at = self.seen
+
+    def add(self, rating_data):
+        rating = rating_data.get('rating') or {}
+        day = (rating_data.get('rated_at') or '')[:10]
+        keys = (
+            ('all', 'all'),
+            ('theme', rating_data.get('theme') or ''),
+            ('occasion', rating_data.get('occasion') or ''),
+            ('day', day),
+            ('week', week_of(day))
+        )
+        for kind, key in keys:
+            group = self.groups[kind].get(key)
+            if group is None:
+                group = self.groups[kind][key] = new_group()
+            group['count'] += 1
+            for field in SCORE_FIELDS:
+                score = rating.get(field)
+                if isinstance(score, (int, float)):
+                    totals = group['scores'][field]
+                    totals['sum'] += score
+                    bucket = min(HISTOGRAM_BUCKETS - 1, max(0, int(score) // 10))
+                    totals['histogram'][bucket] += 1
+        self.seen += 1
+        if self.seen - self.saved_at >= self.checkpoint_every:
+            self.save()
+
+    def report(self, period='week', buckets=12):
+        """Summaries overall, per theme, per occasion and for the latest day or week buckets"""
+        if period not in ('day', 'week'):
+            raise ValueError(f"Unknown period: {period}")
+        recent = sorted(key for key in self.groups[period] if key)[-buckets:] if buckets > 0 else []
+        return {
+            'overall': summarize(self.groups['all']['all']),
+            'themes': {key: summarize(group) for key, group in sorted(self.groups['theme'].items())},
+            'occasions': {key: summarize(group) for key, group in sorted(self.groups['occasion'].items())},
+            period + 's': {key: summarize(self.groups[period][key]) for key in recent}
+        }
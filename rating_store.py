@@ -0,0 +1,243 @@
+"""
+Segmented append-only log of outfit ratings with a sidecar index.
+
+Each rating is appended as one JSON line to the active segment
+(ratings/segment-000001.jsonl, ...) and fsynced, so saving a rating never
+rewrites history and costs the same however many ratings exist. When the
+active segment would grow past `max_segment_bytes` it is sealed: its index
+of (offset, theme, occasion, day) per rating is written next to it as
+segment-NNNNNN.idx.json, atomically and with a checksum, and a new segment
+is started.
+
+In memory every rating has a sequence id, a (segment, offset) location and
+entries in per-theme, per-occasion and per-day postings lists, so history
+queries read only the matching lines. At startup sealed segments load from
+their sidecars and only the active segment is scanned.
+
+Ratings from the old ratings.json are imported once, when no log exists yet.
+
+An optional RatingStats, and any other followers with the same
+load/reset/add interface (such as the OutfitRanker), are updated under the
+same lock as each append, and at startup are caught up from their
+checkpoints with the ratings logged since.
+"""
+
+import json
+import os
+import threading
+
+from atomic_files import CorruptFile, decode_checked_json, fsync_directory, write_checked_json
+
+SEGMENT_PREFIX = 'segment-'
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+
+
+def rating_day(rating_data):
+    """YYYY-MM-DD part of an ISO 'rated_at' timestamp"""
+    return (rating_data.get('rated_at') or '')[:10]
+
+
+class RatingStore:
+    """Append-only ratings log with theme/occasion/day postings"""
+
+    def __init__(self, directory='ratings', max_segment_bytes=DEFAULT_SEGMENT_BYTES,
+                 legacy_path='ratings.json', stats=None, followers=()):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.legacy_path = legacy_path
+        self.stats = stats
+        self.followers = [follower for follower in (stats, *followers) if follower]
+        self.locations = []
+        self.by_theme = {}
+        self.by_occasion = {}
+        self.by_day = {}
+        self.segment = 0
+        self.segment_bytes = 0
+        self.segment_records = []
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:06d}.jsonl")
+
+    def sidecar_path(self, segment):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:06d}.idx.json")
+
+    def load(self):
+        """Rebuild the index from sidecars plus a scan of the active segment"""
+        with self.lock:
+            self.locations = []
+            self.by_theme = {}
+            self.by_occasion = {}
+            self.by_day = {}
+            self.segment_records = []
+            os.makedirs(self.directory, exist_ok=True)
+            segments = sorted(
+                int(name[len(SEGMENT_PREFIX):-len('.jsonl')])
+                for name in os.listdir(self.directory)
+                if name.startswith(SEGMENT_PREFIX) and name.endswith('.jsonl')
+            )
+            for segment in segments[:-1]:
+                self._load_sealed(segment)
+            self.segment = segments[-1] if segments else 1
+            self.segment_bytes = self._scan_active() if segments else 0
+            for follower in self.followers:
+                self._catch_up(follower)
+            self.loaded = True
+            if not segments:
+                self._import_legacy()
+
+    def _load_sealed(self, segment):
+        try:
+            with open(self.sidecar_path(segment), 'rb') as f:
+                records = decode_checked_json(f.read())['records']
+        except (FileNotFoundError, CorruptFile, KeyError, TypeError):
+            # Sidecar missing or damaged: fall back to reading the segment
+            records = self._read_records(segment)
+        for offset, theme, occasion, day in records:
+            self._index(segment, offset, theme, occasion, day)
+
+    def _read_records(self, segment):
+        """[(offset, theme, occasion, day)] for each complete line of a segment"""
+        records = []
+        offset = 0
+        with open(self.segment_path(segment), 'rb') as f:
+            for line in f:
+                if line.endswith(b'\n'):
+                    try:
+                        entry = json.loads(line)
+                        records.append((offset, entry.get('theme'), entry.get('occasion'), rating_day(entry)))
+                    except json.JSONDecodeError:
+                        pass
+                offset += len(line)
+        return records
+
+    def _scan_active(self):
+        """Index the active segment and cut off a torn final line; returns its size"""
+        path = self.segment_path(self.segment)
+        for record in self._read_records(self.segment):
+            self._index(self.segment, *record)
+            self.segment_records.append(list(record))
+        with open(path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                f.truncate(end)
+        return end
+
+    def _catch_up(self, follower):
+        """Replay ratings logged after a follower's checkpoint"""
+        covered = follower.load()
+        if covered > len(self.locations):
+            # Checkpoint from a different log
+            follower.reset()
+            covered = 0
+        for rating_data in self._read(self.locations[covered:]):
+            follower.add(rating_data)
+
+    def _import_legacy(self):
+        try:
+            with open(self.legacy_path, 'r') as f:
+                ratings = json.load(f).get('ratings', [])
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for rating_data in ratings:
+            self._append(rating_data)
+
+    def _index(self, segment, offset, theme, occasion, day):
+        rating_id = len(self.locations)
+        self.locations.append((segment, offset))
+        self.by_theme.setdefault(theme, []).append(rating_id)
+        self.by_occasion.setdefault(occasion, []).append(rating_id)
+        self.by_day.setdefault(day, []).append(rating_id)
+        return rating_id
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def append(self, rating_data):
+        """Append one rating; returns its id"""
+        self.ensure_loaded()
+        with self.lock:
+            return self._append(rating_data)
+
+    def _append(self, rating_data):
+        line = (json.dumps(rating_data) + '\n').encode()
+        if self.segment_bytes and self.segment_bytes + len(line) > self.max_segment_bytes:
+            self._rotate()
+        offset = self.segment_bytes
+        with open(self.segment_path(self.segment), 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if not offset:
+            fsync_directory(self.segment_path(self.segment))
+        self.segment_bytes += len(line)
+        record = [offset, rating_data.get('theme'), rating_data.get('occasion'), rating_day(rating_data)]
+        self.segment_records.append(record)
+        for follower in self.followers:
+            follower.add(rating_data)
+        return self._index(self.segment, *record)
+
+    def _rotate(self):
+        """Seal the active segment with its sidecar index and start the next one"""
+        write_checked_json(self.sidecar_path(self.segment),
+                           {'segment': self.segment, 'records': self.segment_records}, keep_previous=False)
+        self.segment += 1
+        self.segment_bytes = 0
+        self.segment_records = []
+
+    def query(self, theme=None, occasion=None, since=None, until=None, limit=50):
+        """Newest-first ratings matching every given filter.
+
+        `since` and `until` are inclusive YYYY-MM-DD days.
+        """
+        self.ensure_loaded()
+        with self.lock:
+            candidates = []
+            if theme is not None:
+                candidates.append(self.by_theme.get(theme, []))
+            if occasion is not None:
+                candidates.append(self.by_occasion.get(occasion, []))
+            if since is not None or until is not None:
+                days = [
+                    ids for day, ids in self.by_day.items()
+                    if (since is None or day >= since) and (until is None or day <= until)
+                ]
+                candidates.append(sorted(rating_id for ids in days for rating_id in ids))
+            if candidates:
+                candidates.sort(key=len)
+                others = [set(ids) for ids in candidates[1:]]
+                matches = [rating_id for rating_id in reversed(candidates[0])
+                           if all(rating_id in ids for ids in others)]
+            else:
+                matches = range(len(self.locations) - 1, -1, -1)
+            locations = [self.locations[rating_id] for rating_id in matches[:limit]]
+        return self._read(locations)
+
+    def _read(self, locations):
+        ratings = []
+        handles = {}
+        try:
+            for segment, offset in locations:
+                f = handles.get(segment)
+                if f is None:
+                    f = handles[segment] = open(self.segment_path(segment), 'rb')
+                f.seek(offset)
+                ratings.append(json.loads(f.readline()))
+        finally:
+            for f in handles.values():
+                f.close()
+        return ratings
+
+    def stats_report(self, period='week', buckets=12):
+        """RatingStats.report() taken under the store lock"""
+        self.ensure_loaded()
+        with self.lock:
+            return self.stats.report(period, buckets)
+
+    def count(self):
+        self.ensure_loaded()
+        with self.lock:
+            return len(self.locations)
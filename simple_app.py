@@ -15,6 +15,8 @@ import base64
 import email
 from email.message import EmailMessage
 
+from atomic_files import read_with_fallback, write_json
+
 class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/':
@@ -192,17 +194,16 @@ class FashionStylistHandler(http.server.SimpleHTTPRequestHandler):
             self.send_error(404)
     
     def load_wardrobe(self):
-        """Load wardrobe data"""
+        """Load wardrobe data, from the previous save if the last one is unreadable"""
         try:
-            with open('wardrobe.json', 'r') as f:
-                return json.load(f)
+            wardrobe, _ = read_with_fallback('wardrobe.json')
+            return wardrobe
         except FileNotFoundError:
             return {"items": []}
     
     def save_wardrobe(self, wardrobe):
-        """Save wardrobe data"""
-        with open('wardrobe.json', 'w') as f:
-            json.dump(wardrobe, f, indent=2)
+        """Save wardrobe data atomically, keeping the previous save"""
+        write_json('wardrobe.json', wardrobe, indent=2)
     
     def generate_outfit(self, items, mood, occasion):
         """Generate outfit based on items, mood, and occasion"""
@@ -0,0 +1,70 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+The first caller for a key runs the call; callers that arrive with the same
+key while it is in flight wait for that result instead of making their own.
+Once the call finishes the key is released, so later callers start fresh
+(and normally hit the response cache).
+"""
+
+import threading
+
+
+class Call:
+    """One in-flight call and the waiters sharing it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Join concurrent calls with the same key onto one execution"""
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.metrics = {
+            'executed': 0,
+            'coalesced': 0,
+            'max_waiters': 0
+        }
+
+    def do(self, key, fn):
+        """Run fn() once per key at a time; concurrent callers share its outcome"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = Call()
+                self.calls[key] = call
+                self.metrics['executed'] += 1
+            else:
+                call.waiters += 1
+                self.metrics['coalesced'] += 1
+                self.metrics['max_waiters'] = max(self.metrics['max_waiters'], call.waiters)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self.lock:
+            report = dict(self.metrics)
+            report['in_flight'] = len(self.calls)
+            return report
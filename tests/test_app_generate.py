@@ -0,0 +1,53 @@
+"""/generate-outfit in app.py, answered by mock_llm_server"""
+
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('flask')
+
+from load_test import synthetic_wardrobe
+from mock_llm_server import MockLLM, start_in_thread
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('app')
+    with open(workdir / 'wardrobe.json', 'w') as f:
+        json.dump(synthetic_wardrobe(40, seed=1), f)
+    mock_server = start_in_thread(MockLLM(latency='fixed:0.01', seed=1))
+    cwd = os.getcwd()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('OPENAI_API_KEY', 'mock-key')
+        mp.setenv('OPENAI_BASE_URL', mock_server.base_url)
+        mp.setenv('LLM_CACHE_PATH', str(workdir / 'llm_cache.sqlite3'))
+        mp.setenv('WARMUP', '0')
+        mp.chdir(workdir)
+        sys.modules.pop('app', None)
+        import app as app_module
+        try:
+            yield app_module.create_app(warm=False).test_client()
+        finally:
+            mock_server.shutdown()
+            sys.modules.pop('app', None)
+            os.chdir(cwd)
+
+
+def test_generate_outfit_with_ai_reply(client):
+    response = client.post('/generate-outfit', json={'mood': 'casual', 'occasion': 'daily'})
+    assert response.status_code == 200
+    outfit = response.get_json()['outfit']
+    assert isinstance(outfit['outfit'], dict)
+    assert outfit['items']
+    for item in outfit['items'].values():
+        assert isinstance(item, dict)
+        assert {'id', 'item_type', 'color', 'style'} <= set(item)
+
+
+def test_generated_items_match_the_wardrobe(client):
+    wardrobe = {item['id']: item for item in client.get('/wardrobe').get_json()['items']}
+    outfit = client.post('/generate-outfit', json={'mood': 'formal', 'occasion': 'work'}).get_json()['outfit']
+    for item in outfit['items'].values():
+        assert wardrobe[item['id']] == item
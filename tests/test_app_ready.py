@@ -0,0 +1,30 @@
+"""app.py warms its caches on import, whatever serves it"""
+
+import json
+import sys
+
+import pytest
+
+pytest.importorskip('flask')
+
+from load_test import synthetic_wardrobe
+
+
+def test_import_starts_warm_up(tmp_path, monkeypatch):
+    with open(tmp_path / 'wardrobe.json', 'w') as f:
+        json.dump(synthetic_wardrobe(10, seed=2), f)
+    monkeypatch.delenv('WARMUP', raising=False)
+    # Keeps load_dotenv from reading a real key; warm-up makes no AI calls
+    monkeypatch.setenv('OPENAI_API_KEY', 'unused')
+    monkeypatch.setenv('LLM_CACHE_PATH', str(tmp_path / 'llm_cache.sqlite3'))
+    monkeypatch.chdir(tmp_path)
+    sys.modules.pop('app', None)
+    try:
+        import app as app_module
+        # Served as the module-level `app`, the way a WSGI server would
+        assert app_module.warm_up.wait(10)
+        response = app_module.app.test_client().get('/ready')
+        assert response.status_code == 200
+        assert set(response.get_json()['tasks'].values()) == {'done'}
+    finally:
+        sys.modules.pop('app', None)
@@ -0,0 +1,41 @@
+import os
+import stat
+
+import pytest
+
+from atomic_files import (UMASK, CorruptFile, decode_checked_json, previous_path, read_with_fallback, write_atomic,
+                          write_checked_json)
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="POSIX permission bits")
+def test_write_atomic_keeps_permissions(tmp_path):
+    path = str(tmp_path / 'wardrobe.json')
+    write_atomic(path, '{}')
+    # A new file gets what open() would have given it, not mkstemp's 0600
+    assert mode(path) == 0o666 & ~UMASK
+
+    os.chmod(path, 0o640)
+    write_atomic(path, '{"items": []}', keep_previous=True)
+    assert mode(path) == 0o640
+    assert mode(previous_path(path)) == 0o640
+
+
+def test_checked_json_falls_back_to_previous(tmp_path):
+    path = str(tmp_path / 'stats.json')
+    write_checked_json(path, {'count': 1})
+    write_checked_json(path, {'count': 2})
+    with open(path, 'r+b') as f:
+        f.seek(-3, os.SEEK_END)
+        f.write(b'9')
+
+    value, source = read_with_fallback(path, decode_checked_json)
+    assert value == {'count': 1}
+    assert source == previous_path(path)
+
+    os.remove(previous_path(path))
+    with pytest.raises(CorruptFile):
+        read_with_fallback(path, decode_checked_json)
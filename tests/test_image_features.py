@@ -0,0 +1,19 @@
+import pytest
+
+from image_features import ImageFeaturePool
+
+Image = pytest.importorskip('PIL.Image')
+pytest.importorskip('numpy')
+
+
+def test_features_are_computed_in_spawned_workers(tmp_path):
+    path = str(tmp_path / 'outfit.jpg')
+    Image.new('RGB', (320, 240), (180, 30, 40)).save(path)
+    pool = ImageFeaturePool(workers=1, timeout=60)
+    try:
+        features = pool.features(path)
+        assert pool.executor._mp_context.get_start_method() == 'spawn'
+    finally:
+        pool.shutdown()
+    assert features is not None
+    assert pool.stats()['computed'] == 1
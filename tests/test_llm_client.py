@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+pytest.importorskip('openai')
+
+from llm_cache import LLMCache
+from llm_client import AsyncLLMClient
+from mock_llm_server import MockLLM, start_in_thread
+
+
+@pytest.fixture
+def mock_server():
+    server = start_in_thread(MockLLM(latency='fixed:0.3', seed=1))
+    yield server
+    server.shutdown()
+
+
+def request(content):
+    return {'model': 'gpt-3.5-turbo', 'messages': [{'role': 'user', 'content': content}], 'max_tokens': 50}
+
+
+def test_late_answers_are_cached_off_the_event_loop(tmp_path, mock_server):
+    client = AsyncLLMClient(api_key='mock-key', base_url=mock_server.base_url, latency_sla=0.05)
+    cache = LLMCache(str(tmp_path / 'llm_cache.sqlite3'))
+    delivered = threading.Event()
+    threads = []
+
+    def on_result(text):
+        threads.append(threading.current_thread().name)
+        cache.put(args, text)
+        delivered.set()
+
+    args = request("Suggest an outfit")
+    # The SLA passes long before the mock answers
+    assert client.complete_within_sla(args, on_result=on_result) is None
+    assert delivered.wait(10)
+    assert threads[0].startswith('llm-results')
+    assert cache.get(args) is not None
+    assert client.stats()['hedged'] == 1
+
+
+def test_failing_callback_does_not_stop_later_ones(mock_server):
+    client = AsyncLLMClient(api_key='mock-key', base_url=mock_server.base_url, latency_sla=5)
+    delivered = []
+
+    def broken(text):
+        raise RuntimeError("disk full")
+
+    assert client.complete_within_sla(request("first"), on_result=broken)
+    assert client.complete_within_sla(request("second"), on_result=delivered.append)
+    client.results.submit(lambda: None).result(5)
+    assert len(delivered) == 1
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from outfit_cache import TOP_K, OutfitCache
+from outfit_engine import SLOTS, WardrobeIndex, top_outfits
+
+TYPES = ('top', 'dress', 'bottom', 'shoes', 'accessories', 'hat')
+COLORS = ('black', 'white', 'red', 'navy', 'pink', 'beige')
+STYLES = ('casual', 'formal', 'trendy', 'vintage', 'sporty', 'minimalist')
+
+
+def wardrobe(count, seed, types=TYPES):
+    rng = random.Random(seed)
+    return [
+        {'id': i, 'item_type': rng.choice(types), 'color': rng.choice(COLORS), 'style': rng.choice(STYLES)}
+        for i in range(1, count + 1)
+    ]
+
+
+def scores_and_slots(outfits):
+    return [(outfit['score'], tuple(outfit['items'][slot] is None for slot in SLOTS)) for outfit in outfits]
+
+
+def assert_matches_top_outfits(cache, items):
+    index = WardrobeIndex(items)
+    for mood, occasion in cache.presets:
+        expected = top_outfits(index, mood, occasion, TOP_K)
+        assert scores_and_slots(cache.get(mood, occasion, TOP_K)) == scores_and_slots(expected), (mood, occasion)
+
+
+@pytest.mark.parametrize('items', [
+    [],
+    wardrobe(6, 1, types=('hat',)),
+    wardrobe(3, 2, types=('top',)),
+    wardrobe(60, 3),
+])
+def test_built_cache_matches_top_outfits(items):
+    cache = OutfitCache()
+    cache.build(items)
+    assert_matches_top_outfits(cache, items)
+
+
+def test_incremental_changes_match_top_outfits():
+    items = wardrobe(6, 4, types=('hat',))
+    cache = OutfitCache()
+    cache.build(items)
+    rng = random.Random(5)
+    for item in wardrobe(80, 6)[6:]:
+        items.append(item)
+        cache.add_item(item)
+        if rng.random() < 0.3:
+            gone = items.pop(rng.randrange(len(items)))
+            cache.remove_item(gone['id'])
+        assert_matches_top_outfits(cache, items)
+    for item in list(items):
+        items.remove(item)
+        cache.remove_item(item['id'])
+    assert_matches_top_outfits(cache, items)
+
+
+def test_changes_during_the_build_are_kept():
+    items = wardrobe(30, 7)
+    uploaded = {'id': 100, 'item_type': 'shoes', 'color': 'black', 'style': 'formal'}
+    cache = OutfitCache()
+
+    def load_items():
+        snapshot = list(items)
+        # An upload and a removal land after the wardrobe was read
+        items.append(uploaded)
+        cache.add_item(uploaded)
+        gone = items.pop(0)
+        cache.remove_item(gone['id'])
+        # A change the snapshot already includes is not applied twice
+        cache.add_item(snapshot[1])
+        return snapshot
+
+    cache.ensure_built(load_items)
+    assert cache.built
+    assert cache.changes is None
+    assert sorted(cache.items) == sorted(item['id'] for item in items if item['item_type'] != 'hat')
+    assert_matches_top_outfits(cache, items)
+
+
+def test_changes_before_any_build_are_not_kept():
+    cache = OutfitCache()
+    cache.add_item({'id': 1, 'item_type': 'top', 'color': 'red', 'style': 'casual'})
+    assert cache.changes is None
+    assert not cache.built
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from outfit_engine import WardrobeIndex, describe_item
+from outfit_parser import OutfitParser
+from prompt_builder import build_prompt_lines
+
+
+def item(item_id, item_type, color, style):
+    return {'id': item_id, 'item_type': item_type, 'color': color, 'style': style}
+
+
+WARDROBE = [
+    item(1, 'top', 'blue', 'casual'),
+    item(2, 'top', 'black', 'formal'),
+    item(3, 'bottom', 'navy', 'formal'),
+    item(4, 'bottom', 'blue', 'casual'),
+    item(5, 'shoes', 'black', 'formal'),
+]
+
+
+@pytest.fixture
+def id_map():
+    return build_prompt_lines(WARDROBE, 'formal', 'work')[1]
+
+
+def reply(top='T1', bottom='B1', shoes='S1'):
+    return {'outfit': {'top': top, 'bottom': bottom, 'shoes': shoes}, 'styling_tips': "Tuck it in", 'reasoning': "Sharp"}
+
+
+def test_prompt_numbers_the_best_ranked_item_first():
+    index = WardrobeIndex(WARDROBE)
+    lines, id_map = build_prompt_lines(WARDROBE, 'formal', 'work', index=index)
+    assert id_map['T1'] is index.ranked('top', 'formal', 'work')[0][1]
+    assert id_map['T1']['id'] == 2
+    assert id_map['B1']['id'] == 3
+
+
+def test_strict_reply(id_map):
+    parser = OutfitParser()
+    outfit = parser.parse(json.dumps(reply(top='T2', bottom='B2')), id_map)
+    assert outfit['items']['top']['id'] == 1
+    assert outfit['items']['bottom']['id'] == 4
+    assert outfit['outfit']['shoes'] == describe_item(WARDROBE[4])
+    assert outfit['styling_tips'] == "Tuck it in"
+    assert parser.stats()['strict'] == 1
+
+
+@pytest.mark.parametrize('text', [
+    "Here you go:\n```json\n" + json.dumps(reply(top='T2')) + "\n```\nEnjoy!",
+    '{"outfit": {"top": "T2", "bottom": "B1", "shoes": "S1",},}',
+    '{“outfit”: {“top”: “T2”, “bottom”: “B1”, “shoes”: “S1”}}',
+    "{'outfit': {'top': 'T2', 'bottom': 'B1', 'shoes': 'S1'}}",
+    '{"top": "T2", "bottom": "B1", "shoes": "S1"}',
+    '{"outfit": {"top": "T2", "bottom": "B1", "shoes": "S1"}, "styling_tips": "Roll the slee',
+])
+def test_repaired_replies(id_map, text):
+    parser = OutfitParser()
+    outfit = parser.parse(text, id_map)
+    assert outfit['items']['top']['id'] == 1
+    assert outfit['items']['shoes']['id'] == 5
+    assert sum(parser.stats()[kind] for kind in ('strict', 'repaired')) == 1
+
+
+def test_descriptions_are_accepted(id_map):
+    outfit = OutfitParser().parse(json.dumps(reply(top=describe_item(WARDROBE[0]), bottom="Bottom (blue, casual style)")),
+                                  id_map)
+    assert outfit['items']['top']['id'] == 1
+    assert outfit['items']['bottom']['id'] == 4
+
+
+def test_ids_are_salvaged_from_prose(id_map):
+    parser = OutfitParser()
+    outfit = parser.parse("Wear t2 with B2, and S1 to finish.", id_map)
+    assert [outfit['items'][slot]['id'] for slot in ('top', 'bottom', 'shoes')] == [1, 4, 5]
+    assert outfit['styling_tips'].startswith("Wear t2")
+    assert parser.stats()['salvaged'] == 1
+
+
+def test_unusable_slots_fall_back_to_the_best_ranked_candidate(id_map):
+    parser = OutfitParser()
+    # A shoe ID in the top slot, an unknown bottom, no shoes at all
+    outfit = parser.parse(json.dumps({'outfit': {'top': 'S1', 'bottom': 'B9'}}), id_map)
+    assert outfit['items']['top']['id'] == 2
+    assert outfit['items']['bottom']['id'] == 3
+    assert outfit['items']['shoes']['id'] == 5
+    # Nothing in the wardrobe for accessories: left out, with a note
+    assert 'accessories' not in outfit['items']
+    assert outfit['outfit']['accessories'] == "No accessories in your wardrobe yet"
+    assert parser.stats()['slots_replaced'] == 3
+
+
+def test_fallback_follows_id_map_order_not_numbering():
+    id_map = {'T2': WARDROBE[1], 'T1': WARDROBE[0]}
+    outfit = OutfitParser().parse('{"outfit": {"top": "nothing"}}', id_map)
+    assert outfit['items']['top']['id'] == 2
+
+
+def test_reply_with_nothing_usable(id_map):
+    parser = OutfitParser()
+    assert parser.parse("Sorry, I can't help with that.", id_map) is None
+    assert parser.stats()['failed'] == 1
@@ -0,0 +1,16 @@
+import pytest
+
+from rate_limiter import TokenBucket
+
+
+@pytest.mark.parametrize('options', [{'rate': 0}, {'rate': -1}, {'rate': float('nan')}, {'burst': 0}])
+def test_invalid_settings_are_refused(options):
+    with pytest.raises(ValueError):
+        TokenBucket(**options)
+
+
+def test_empty_bucket_refuses_past_the_timeout():
+    bucket = TokenBucket(rate=1, burst=1)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.1)
+    assert bucket.stats()['rejected'] == 1
@@ -0,0 +1,268 @@
+"""WardrobeStore: snapshot, journal replay, group commit and recovery"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from wardrobe_store import WardrobeLocked, WardrobeStore
+
+
+def make_wardrobe(directory, count=20):
+    wardrobe = {'items': [
+        {'id': i, 'item_type': 'top', 'color': 'black', 'style': 'casual', 'uploaded_at': '2025-01-01T00:00:00'}
+        for i in range(1, count + 1)
+    ]}
+    with open(directory / 'wardrobe.json', 'w') as f:
+        json.dump(wardrobe, f)
+    return wardrobe
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    stores = []
+
+    def open_store(**options):
+        options.setdefault('commit_window', 0)
+        store = WardrobeStore(str(tmp_path / 'wardrobe.snap'), str(tmp_path / 'wardrobe.json'), **options)
+        store.load()
+        stores.append(store)
+        return store
+
+    yield open_store
+    for store in stores:
+        store.close()
+
+
+def test_second_process_is_refused(tmp_path, open_store):
+    make_wardrobe(tmp_path)
+    first = open_store()
+    second = WardrobeStore(str(tmp_path / 'wardrobe.snap'), str(tmp_path / 'wardrobe.json'))
+    with pytest.raises(WardrobeLocked):
+        second.load()
+    added = first.add({'item_type': 'shoes'})
+    first.close()
+    reopened = open_store()
+    assert reopened.get(added.id)['item_type'] == 'shoes'
+    assert reopened.add({'item_type': 'top'}).id == added.id + 1
+
+
+def ids(store):
+    return [item.id for item in store.items()]
+
+
+def test_journal_replays_after_reopen(tmp_path, open_store):
+    make_wardrobe(tmp_path, 5)
+    store = open_store()
+    shoes = store.add({'item_type': 'shoes', 'color': 'red'})
+    assert store.remove(2)
+    assert not store.remove(2)
+    store.close()
+
+    reopened = open_store()
+    assert ids(reopened) == [1, 3, 4, 5, shoes.id]
+    assert reopened.get(shoes.id)['color'] == 'red'
+    assert reopened.stats()['replayed'] == 2
+
+
+def test_crash_before_journal_rotation_replays_nothing_twice(tmp_path, open_store):
+    from wardrobe_snapshot import write_snapshot
+
+    make_wardrobe(tmp_path, 5)
+    store = open_store()
+    for _ in range(3):
+        store.add({'item_type': 'bottom'})
+    store.remove(1)
+    # The compaction's new snapshot is written, then the process dies
+    with store.lock:
+        write_snapshot(store.path, store._items(), store.applied_seq, store.snapshot.meta())
+    store.lock_file.close()
+    store.lock_file = None
+
+    reopened = open_store()
+    assert ids(reopened) == [2, 3, 4, 5, 6, 7, 8]
+    assert reopened.stats()['replayed'] == 0
+
+
+def test_torn_tail_is_cut_off(tmp_path, open_store):
+    make_wardrobe(tmp_path, 5)
+    store = open_store()
+    store.add({'item_type': 'shoes'})
+    store.close()
+    with open(store.journal_path, 'ab') as f:
+        f.write(b'{"seq": 2, "op": "add", "item": {"id": 7')
+    size = (tmp_path / 'wardrobe.journal').stat().st_size
+
+    reopened = open_store()
+    assert ids(reopened) == [1, 2, 3, 4, 5, 6]
+    assert reopened.stats()['torn_entries'] == 1
+    assert (tmp_path / 'wardrobe.journal').stat().st_size < size
+    reopened.add({'item_type': 'top'})
+    reopened.close()
+    assert ids(open_store()) == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_failed_commit_is_cut_off_the_journal(tmp_path, open_store, monkeypatch):
+    import wardrobe_store
+
+    make_wardrobe(tmp_path, 5)
+    store = open_store()
+    store.add({'item_type': 'shoes'})
+    size = (tmp_path / 'wardrobe.journal').stat().st_size
+    real_fsync = os.fsync
+    failures = []
+
+    def failing_fsync(fd):
+        if failures:
+            failures.pop()
+            raise OSError(5, 'Input/output error')
+        real_fsync(fd)
+
+    monkeypatch.setattr(wardrobe_store.os, 'fsync', failing_fsync)
+
+    # The batch reached the file but not the disk: it is truncated away
+    failures[:] = [True]
+    with pytest.raises(OSError):
+        store.add({'item_type': 'refused'})
+    assert (tmp_path / 'wardrobe.journal').stat().st_size == size
+    assert store.stats()['commit_errors'] == 1
+
+    # Making the truncation durable fails too: the next append repeats it first
+    failures[:] = [True, True]
+    with pytest.raises(OSError):
+        store.add({'item_type': 'refused'})
+    assert store.journal_end == size
+    accepted = store.add({'item_type': 'accepted'})
+    store.close()
+
+    reopened = open_store()
+    assert [item['item_type'] for item in reopened.items()][5:] == ['shoes', 'accepted']
+    assert reopened.get(accepted.id)['item_type'] == 'accepted'
+
+
+def test_concurrent_adds_share_commits(tmp_path, open_store):
+    make_wardrobe(tmp_path, 5)
+    store = open_store(commit_window=0.005)
+    added = []
+
+    def upload(n):
+        for i in range(25):
+            added.append(store.add({'item_type': 'top', 'description': f'{n}-{i}'}).id)
+
+    threads = [threading.Thread(target=upload, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(added) == list(range(6, 206))
+    stats = store.stats()
+    assert stats['journal_writes'] == 200
+    assert stats['commits'] < 200
+    store.close()
+    assert ids(open_store()) == list(range(1, 206))
+
+
+def test_concurrent_removals_of_one_item(tmp_path, open_store):
+    make_wardrobe(tmp_path, 5)
+    store = open_store(commit_window=0.005)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.remove(3))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False] * 5 + [True]
+    assert store.stats()['journal_writes'] == 1
+    assert ids(store) == [1, 2, 4, 5]
+
+
+def test_compaction_folds_the_journal(tmp_path, open_store):
+    make_wardrobe(tmp_path, 5)
+    store = open_store(compact_after=10)
+    for _ in range(25):
+        store.add({'item_type': 'shoes'})
+    store.remove(1)
+    store.shutdown()
+    stats = store.stats()
+    assert stats['compactions'] == 2
+    assert stats['journal_entries'] == 6
+    assert stats['snapshot_rows'] == 25
+    assert (tmp_path / 'wardrobe.snap.prev').exists()
+    assert (tmp_path / 'wardrobe.journal.prev').exists()
+    store.close()
+
+    reopened = open_store(compact_after=10)
+    assert ids(reopened) == list(range(2, 31))
+    assert reopened.add({'item_type': 'top'}).id == 31
+
+
+def test_corrupt_snapshot_falls_back_to_previous(tmp_path, open_store):
+    make_wardrobe(tmp_path, 5)
+    store = open_store(compact_after=10)
+    for _ in range(15):
+        store.add({'item_type': 'shoes'})
+    store.remove(4)
+    store.close()
+    assert store.stats()['compactions'] == 1
+
+    # Damage an item column without touching the header
+    path = tmp_path / 'wardrobe.snap'
+    data = bytearray(path.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    reopened = open_store(compact_after=10)
+    assert reopened.stats()['fallbacks'] == 1
+    assert ids(reopened) == [1, 2, 3, 5] + list(range(6, 21))
+    assert (tmp_path / 'wardrobe.snap.corrupt').exists()
+    reopened.close()
+
+    # The rewritten snapshot is sound, and its fallback is complete too
+    again = open_store(compact_after=10)
+    assert again.stats()['fallbacks'] == 0
+    assert ids(again) == [1, 2, 3, 5] + list(range(6, 21))
+
+
+def test_racing_loads_keep_queued_changes(tmp_path, open_store, monkeypatch):
+    make_wardrobe(tmp_path, 5)
+    store = WardrobeStore(str(tmp_path / 'wardrobe.snap'), str(tmp_path / 'wardrobe.json'), commit_window=0.01)
+    loads = []
+    open_snapshot = store._open_snapshot
+    monkeypatch.setattr(store, '_open_snapshot', lambda: loads.append(1) or open_snapshot())
+    start = threading.Barrier(8)
+    added = []
+
+    def warm_up():
+        start.wait()
+        store.ensure_loaded()
+
+    def upload():
+        start.wait()
+        added.append(store.add({'item_type': 'shoes'}).id)
+
+    threads = [threading.Thread(target=warm_up) for _ in range(4)]
+    threads += [threading.Thread(target=upload) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+
+    # A later load while an add is queued changes nothing
+    with store.write_lock:
+        queued = threading.Thread(target=lambda: added.append(store.add({'item_type': 'top'}).id))
+        queued.start()
+        while not store.stats()['pending']:
+            pass
+        reload = threading.Thread(target=store.load)
+        reload.start()
+    queued.join()
+    reload.join()
+    added.append(store.add({'item_type': 'bottom'}).id)
+    store.close()
+
+    assert sorted(added) == list(range(6, 12))
+    assert ids(open_store()) == list(range(1, 12))
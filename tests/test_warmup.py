@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+
+from warmup import WarmUp
+
+
+def test_tasks_wait_for_the_tasks_they_run_after():
+    order = []
+    release = threading.Event()
+
+    def load():
+        release.wait(5)
+        order.append('wardrobe')
+
+    warm_up = WarmUp({
+        'wardrobe': load,
+        'outfits': lambda: order.append('outfits'),
+        'embeddings': lambda: order.append('embeddings')
+    }, after={'outfits': ('wardrobe',), 'embeddings': ('wardrobe',)}).start()
+
+    assert not warm_up.wait(0.1)
+    assert order == []
+    assert warm_up.status()['tasks']['outfits'] == 'pending'
+    release.set()
+    assert warm_up.wait(5)
+    assert order[0] == 'wardrobe'
+    assert sorted(order[1:]) == ['embeddings', 'outfits']
+
+
+def test_failed_prerequisite_still_releases_its_dependents():
+    def fail():
+        raise OSError("no snapshot")
+
+    warm_up = WarmUp({'wardrobe': fail, 'outfits': lambda: None}, after={'outfits': ('wardrobe',)}).start()
+    assert warm_up.wait(5)
+    assert warm_up.status()['tasks'] == {'wardrobe': 'failed', 'outfits': 'done'}
+
+
+def test_unknown_prerequisite_is_refused():
+    with pytest.raises(ValueError):
+        WarmUp({'outfits': lambda: None}, after={'outfits': ('wardrobe',)})
@@ -0,0 +1,39 @@
+from outfit_engine import WardrobeIndex, top_outfits
+from wear_history import WearHistory
+
+
+def wear(history, worn_at, *item_ids, slot='top'):
+    history.record([{'id': item_id, 'slot': slot} for item_id in item_ids], worn_at)
+
+
+def test_least_recent_merges_never_worn_items(tmp_path):
+    history = WearHistory(str(tmp_path / 'wear_log.jsonl'))
+    wear(history, 100, 2)
+    wear(history, 200, 4)
+    wear(history, 300, 2)
+
+    assert history.least_recent('top', 5) == [(200, 4), (300, 2)]
+    assert history.least_recent('top', 5, [1, 2, 3, 4]) == [(0, 1), (0, 3), (200, 4), (300, 2)]
+    assert history.least_recent('top', 3, [1, 2, 3, 4]) == [(0, 1), (0, 3), (200, 4)]
+    # Items no longer in the wardrobe are skipped, and the heap survives the query
+    assert history.least_recent('top', 5, [2, 3]) == [(0, 3), (300, 2)]
+    assert history.least_recent('top', 5) == [(200, 4), (300, 2)]
+
+    reloaded = WearHistory(history.path)
+    assert reloaded.least_recent('top', 5, [1, 2, 3, 4]) == [(0, 1), (0, 3), (200, 4), (300, 2)]
+
+
+def test_candidates_restrict_each_slot():
+    items = [
+        {'id': 1, 'item_type': 'top', 'style': 'formal', 'color': 'black'},
+        {'id': 2, 'item_type': 'top', 'style': 'casual', 'color': 'blue'},
+        {'id': 3, 'item_type': 'bottom', 'style': 'formal', 'color': 'navy'},
+    ]
+    index = WardrobeIndex(items)
+
+    best = top_outfits(index, 'formal', 'work')[0]
+    assert best['items']['top']['id'] == 1
+
+    unworn = top_outfits(index, 'formal', 'work', candidates={'top': {2}})[0]
+    assert unworn['items']['top']['id'] == 2
+    assert unworn['items']['bottom']['id'] == 3
@@ -0,0 +1,271 @@
+"""
+Binary columnar wardrobe snapshot, read through mmap.
+
+Layout (native byte order, recorded in the header):
+
+    header      magic, version, byte order, row, id index and string counts,
+                journal sequence folded in, the offset of every section,
+                then CRC32s of the body and of the header itself
+    columns     one fixed-width array per field, one entry per item, in
+                wardrobe order:
+                  id (int64), uploaded/added timestamp (int64 epoch us),
+                  item_type, color, style, description, layout, filename,
+                  filepath, extra (uint32 string ids)
+    id index    item ids sorted (int64) with their rows (uint32)
+    strings     uint64 offsets (count + 1) into a UTF-8 string heap; every
+                distinct string is stored once
+    meta        the wardrobe's other top-level JSON keys, to end of file
+
+Opening a snapshot maps the file and casts each section to a memoryview,
+so it costs the same for ten items or a million; nothing is decoded until
+an item is read. Items come back as SnapshotItem views that read like
+ItemRecord, and decoded attribute strings are interned and cached, so
+repeated values share one object.
+
+Snapshots are written to a temporary file, fsynced and renamed over the
+old one (see atomic_files), so a reader only ever maps a complete file; the
+replaced snapshot is kept as <path>.prev. Opening checks the header CRC and
+verify() the body's, so a damaged file is refused rather than half read.
+"""
+
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from bisect import bisect_left
+
+from atomic_files import write_atomic
+from item_records import (ATTRIBUTES, CODED_FIELDS, TIMESTAMP_FIELDS, ItemFields, ItemRecord,
+                          decode_timestamp, upload_path)
+
+MAGIC = b'WARDSNAP'
+VERSION = 2
+
+# Column name, array typecode
+COLUMNS = (
+    ('id', 'q'),
+    ('timestamp', 'q'),
+    ('item_type', 'I'),
+    ('color', 'I'),
+    ('style', 'I'),
+    ('description', 'I'),
+    ('layout', 'I'),
+    ('filename', 'I'),
+    ('filepath', 'I'),
+    ('extra', 'I')
+)
+SECTIONS = tuple(name for name, _ in COLUMNS) + ('index_ids', 'index_rows', 'string_offsets', 'strings', 'meta')
+
+# header: magic, version, byte order, rows, indexed ids, strings, journal
+# sequence, section offsets, body CRC, header CRC
+HEADER = struct.Struct('<8sIIIIIQ' + 'Q' * len(SECTIONS) + 'II')
+BYTE_ORDERS = {'little': 1, 'big': 2}
+
+NONE = 0xFFFFFFFF
+NO_INT = -(1 << 63)
+
+
+class SnapshotError(Exception):
+    """The file is not a readable wardrobe snapshot"""
+
+
+def write_snapshot(path, items, journal_seq=0, meta=None, keep_previous=True):
+    """Write items (records, views or dicts) as a snapshot at path, atomically"""
+    strings = {}
+
+    def string_id(value):
+        if value is None:
+            return NONE
+        sid = strings.get(value)
+        if sid is None:
+            sid = strings[value] = len(strings)
+        return sid
+
+    columns = {name: array.array(typecode) for name, typecode in COLUMNS}
+    for item in items:
+        record = item if isinstance(item, ItemRecord) else ItemRecord(dict(item))
+        extra = dict(record.extra or {})
+        if isinstance(record.id, int) and not isinstance(record.id, bool) and NO_INT < record.id < (1 << 63):
+            columns['id'].append(record.id)
+        else:
+            columns['id'].append(NO_INT)
+            extra['id'] = record.id
+        columns['timestamp'].append(NO_INT if record.timestamp is None else record.timestamp)
+        for field in CODED_FIELDS:
+            code = getattr(record, field)
+            columns[field].append(NONE if code is None else string_id(ATTRIBUTES[code]))
+        columns['layout'].append(string_id(json.dumps(list(record.keys()))))
+        columns['filename'].append(string_id(record.filename))
+        columns['filepath'].append(string_id(record.filepath))
+        columns['extra'].append(string_id(json.dumps(extra) if extra else None))
+
+    rows = len(columns['id'])
+    order = sorted((item_id, row) for row, item_id in enumerate(columns['id']) if item_id != NO_INT)
+    sections = dict(columns)
+    sections['index_ids'] = array.array('q', (item_id for item_id, _ in order))
+    sections['index_rows'] = array.array('I', (row for _, row in order))
+    encoded = [value.encode() for value in strings]
+    offsets = array.array('Q', [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    sections['string_offsets'] = offsets
+    sections['strings'] = b''.join(encoded)
+    sections['meta'] = json.dumps(meta).encode() if meta else b''
+
+    body = []
+    positions = []
+    position = HEADER.size
+    for name in SECTIONS:
+        data = sections[name]
+        data = data.tobytes() if isinstance(data, array.array) else data
+        padding = -position % 8
+        body.append(b'\0' * padding)
+        position += padding
+        positions.append(position)
+        body.append(data)
+        position += len(data)
+    body = b''.join(body)
+    fields = (MAGIC, VERSION, BYTE_ORDERS[sys.byteorder], rows, len(order), len(encoded), journal_seq,
+              *positions, zlib.crc32(body))
+    header = HEADER.pack(*fields, zlib.crc32(HEADER.pack(*fields, 0)))
+    write_atomic(path, header + body, keep_previous)
+    return rows
+
+
+class Snapshot:
+    """A mapped snapshot file; sections are memoryviews over the mapping"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise SnapshotError(f"{path}: too short")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = HEADER.unpack_from(self.map, 0)
+        magic, version, byte_order, self.rows, indexed, string_count, self.journal_seq = fields[:7]
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"{path}: not a version {VERSION} wardrobe snapshot")
+        *fields, self.body_crc, header_crc = fields
+        if zlib.crc32(HEADER.pack(*fields, self.body_crc, 0)) != header_crc:
+            raise SnapshotError(f"{path}: header checksum mismatch")
+        if byte_order != BYTE_ORDERS[sys.byteorder]:
+            raise SnapshotError(f"{path}: written on a machine with another byte order")
+        offsets = dict(zip(SECTIONS, fields[7:]))
+        view = memoryview(self.map)
+        self.columns = {}
+        for name, typecode in COLUMNS:
+            self.columns[name] = self.section(view, offsets[name], typecode, self.rows)
+        self.index_ids = self.section(view, offsets['index_ids'], 'q', indexed)
+        self.index_rows = self.section(view, offsets['index_rows'], 'I', indexed)
+        self.string_offsets = self.section(view, offsets['string_offsets'], 'Q', string_count + 1)
+        heap_end = offsets['strings'] + self.string_offsets[string_count]
+        if heap_end > len(view):
+            raise SnapshotError(f"{path}: truncated")
+        self.strings = view[offsets['strings']:heap_end]
+        self.meta_bytes = view[offsets['meta']:]
+        self.cache = {}
+
+    def verify(self):
+        """Check the body against its CRC; one pass over the file"""
+        with memoryview(self.map) as view:
+            crc = zlib.crc32(view[HEADER.size:])
+        if crc != self.body_crc:
+            raise SnapshotError(f"{self.path}: checksum mismatch")
+
+    def section(self, view, offset, typecode, count):
+        size = array.array(typecode).itemsize * count
+        if offset + size > len(view):
+            raise SnapshotError(f"{self.path}: truncated")
+        return view[offset:offset + size].cast(typecode)
+
+    def string(self, sid):
+        """Decoded, interned string for a string id, cached"""
+        if sid == NONE:
+            return None
+        value = self.cache.get(sid)
+        if value is None:
+            value = self.cache[sid] = sys.intern(
+                bytes(self.strings[self.string_offsets[sid]:self.string_offsets[sid + 1]]).decode())
+        return value
+
+    def raw_string(self, sid):
+        """Decoded string without caching, for per-item values such as filenames"""
+        if sid == NONE:
+            return None
+        return bytes(self.strings[self.string_offsets[sid]:self.string_offsets[sid + 1]]).decode()
+
+    def meta(self):
+        """Top-level wardrobe keys other than items"""
+        return json.loads(bytes(self.meta_bytes)) if len(self.meta_bytes) else {}
+
+    def layout(self, row):
+        sid = self.columns['layout'][row]
+        key = ('layout', sid)
+        keys = self.cache.get(key)
+        if keys is None:
+            keys = self.cache[key] = tuple(json.loads(self.string(sid)))
+        return keys
+
+    def find(self, item_id):
+        """Row of an integer item id, or None"""
+        if not isinstance(item_id, int) or isinstance(item_id, bool):
+            return None
+        position = bisect_left(self.index_ids, item_id)
+        if position < len(self.index_ids) and self.index_ids[position] == item_id:
+            return self.index_rows[position]
+        return None
+
+    def item(self, row):
+        return SnapshotItem(self, row)
+
+
+class SnapshotItem(ItemFields):
+    """One snapshot row, read on demand"""
+
+    __slots__ = ('snapshot', 'row')
+
+    def __init__(self, snapshot, row):
+        self.snapshot = snapshot
+        self.row = row
+
+    @property
+    def id(self):
+        item_id = self.snapshot.columns['id'][self.row]
+        if item_id == NO_INT:
+            return self.extra_fields()['id']
+        return item_id
+
+    def __getitem__(self, key):
+        # Attribute columns are only set for keys the item has and never
+        # shadowed by extra, so the engine's hot reads skip the layout check
+        if key in CODED_FIELDS:
+            sid = self.snapshot.columns[key][self.row]
+            if sid != NONE:
+                return self.snapshot.string(sid)
+        return ItemFields.__getitem__(self, key)
+
+    def keys(self):
+        return self.snapshot.layout(self.row)
+
+    def extra_fields(self):
+        text = self.snapshot.raw_string(self.snapshot.columns['extra'][self.row])
+        return json.loads(text) if text is not None else None
+
+    def field(self, key):
+        columns = self.snapshot.columns
+        if key == 'id':
+            return self.id
+        if key in CODED_FIELDS:
+            return self.snapshot.string(columns[key][self.row])
+        if key == 'filename':
+            return self.snapshot.raw_string(columns['filename'][self.row])
+        if key == 'filepath':
+            filepath = self.snapshot.raw_string(columns['filepath'][self.row])
+            return filepath if filepath is not None else upload_path(self.field('filename'))
+        if key in TIMESTAMP_FIELDS:
+            return decode_timestamp(columns['timestamp'][self.row])
+        raise KeyError(key)
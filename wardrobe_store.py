@@ -0,0 +1,547 @@
+"""
+Wardrobe store: a memory-mapped columnar snapshot plus a change journal.
+
+The wardrobe lives in wardrobe.snap (layout in wardrobe_snapshot). Opening
+it maps the file instead of parsing it, so startup and the first requests
+cost the same for any wardrobe size; items are read lazily as
+SnapshotItem views. Changes since the snapshot are appended to
+wardrobe.journal, one JSON line per add or remove with a sequence number.
+At startup the journal entries newer than the snapshot are replayed on top
+of it; a torn last line from a crash is cut off.
+
+Writes are group-committed. add() and remove() queue their change and
+wait; one writer thread collects everything queued within
+`commit_window` seconds (plus whatever arrives while it is busy), appends
+the batch with a single write and fsync, applies it and then wakes every
+waiting request. A request returns only once its change is durable, and
+the cost of an fsync is shared by all the requests in its batch. Ids are
+assigned when a change is queued, so concurrent uploads never collide. A
+batch whose write fails is cut back off the journal before its requests
+see the error, so nothing they were refused is replayed later.
+
+Once the journal holds `compact_after` changes, the writer writes the
+current items as a new snapshot (to a temporary file, fsynced, renamed
+over the old one) that records the last journal sequence it includes, and
+starts a new journal. A crash between the two steps is harmless: replay
+skips entries the snapshot already covers. Readers keep using the old
+mapping until the new one is swapped in.
+
+The replaced snapshot is kept as wardrobe.snap.prev and the journal it was
+folded from as wardrobe.journal.prev. A snapshot that fails its checksums
+at startup is renamed to wardrobe.snap.corrupt and the previous one is
+used instead, with both journals replayed on top; a fresh snapshot is
+written straight away, and the two journals are merged so the previous
+snapshot stays a complete fallback.
+
+One process at a time owns the files: load() takes an exclusive lock on
+wardrobe.snap.lock and raises WardrobeLocked while another process holds
+it, since two writers would hand out the same ids and sequence numbers
+and replay would drop one of them. Servers sharing a directory need their
+own WARDROBE_SNAPSHOT_PATH.
+
+New items are held as ItemRecords until the next compaction. wardrobe.json
+is only an import/export format: it is imported when there is no snapshot
+yet, and export() or `python wardrobe_store.py export` writes it back out.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from atomic_files import fsync_directory, previous_path, write_atomic, write_json
+from item_records import ATTRIBUTES, LAYOUTS, ItemRecord
+from wardrobe_snapshot import NO_INT, Snapshot, SnapshotError, write_snapshot
+
+DEFAULT_COMPACT_AFTER = 500
+DEFAULT_COMMIT_WINDOW = 0.002
+
+
+class WardrobeLocked(RuntimeError):
+    """Another process has the wardrobe open"""
+
+
+def lock_exclusive(f):
+    """Lock an open file for this process without waiting; raises OSError if taken"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+class PendingChange:
+    """A journal entry waiting for its group commit"""
+
+    __slots__ = ('entry', 'done', 'error')
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.done = threading.Event()
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class WardrobeStore:
+    """The wardrobe as a mapped snapshot, the changes since, and their journal"""
+
+    def __init__(self, path='wardrobe.snap', import_path='wardrobe.json', compact_after=DEFAULT_COMPACT_AFTER,
+                 commit_window=DEFAULT_COMMIT_WINDOW):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + '.journal'
+        self.import_path = import_path
+        self.compact_after = compact_after
+        self.commit_window = commit_window
+        self.snapshot = None
+        self.removed = set()  # snapshot rows removed since the snapshot
+        self.added = {}  # id -> ItemRecord added since the snapshot, in order
+        self.seq = 0  # last journal sequence handed out
+        self.applied_seq = 0  # last journal sequence applied in memory
+        self.journal_entries = 0
+        self.journal_end = None  # journal size to cut back to before the next append
+        self.cached = None  # items() result until the next change
+        self.pending = []  # queued changes, oldest first, until applied
+        self.writer = None
+        self.stopping = False
+        self.loaded = False
+        self.lock_file = None  # held open while this process owns the files
+        self.lock = threading.Lock()
+        self.queued = threading.Condition(self.lock)
+        # Held by the writer while it touches the journal or the snapshot file
+        self.write_lock = threading.Lock()
+        self.metrics = {
+            'imports': 0,
+            'replayed': 0,
+            'journal_writes': 0,
+            'torn_entries': 0,
+            'compactions': 0,
+            'commits': 0,
+            'largest_commit': 0,
+            'commit_errors': 0,
+            'fallbacks': 0
+        }
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv('WARDROBE_SNAPSHOT_PATH', 'wardrobe.snap'),
+            compact_after=int(os.getenv('WARDROBE_COMPACT_AFTER', DEFAULT_COMPACT_AFTER)),
+            commit_window=float(os.getenv('WARDROBE_COMMIT_WINDOW_MS', DEFAULT_COMMIT_WINDOW * 1000)) / 1000
+        )
+
+    def load(self):
+        """Map the snapshot (importing the JSON file if there is none) and replay the journals.
+
+        Only the first call loads; later ones (warm-up tasks racing each
+        other, say) return at once, until close().
+        """
+        with self.write_lock:
+            if self.loaded:
+                return
+            self.acquire()
+            with self.lock:
+                if not os.path.exists(self.path) and not os.path.exists(previous_path(self.path)):
+                    self._import(self.import_path)
+                recovered = self._open_snapshot()
+                self._replay(previous_path(self.journal_path))
+                self._replay(self.journal_path)
+                # Never hand out a sequence number that is already queued
+                self.seq = max([self.applied_seq] + [change.entry['seq'] for change in self.pending])
+                self.loaded = True
+            if recovered:
+                if os.path.exists(self.path):
+                    os.replace(self.path, self.path + '.corrupt')
+                self._compact(merge_journals=True)
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def acquire(self):
+        """Take the process lock on the wardrobe files; raises WardrobeLocked if another process has it"""
+        if self.lock_file is not None:
+            return
+        f = open(self.path + '.lock', 'a+b')
+        try:
+            lock_exclusive(f)
+        except OSError:
+            f.close()
+            raise WardrobeLocked(
+                f"{self.path} is open in another process; stop it or set a different WARDROBE_SNAPSHOT_PATH"
+            ) from None
+        self.lock_file = f
+
+    def _open_snapshot(self):
+        """Map and verify the snapshot, else the previous one; returns whether it fell back"""
+        recovered = False
+        try:
+            snapshot = Snapshot(self.path)
+            snapshot.verify()
+        except (OSError, SnapshotError) as e:
+            if not os.path.exists(previous_path(self.path)):
+                raise
+            print(f"⚠️  Wardrobe snapshot unusable ({e}); falling back to the previous one")
+            snapshot = Snapshot(previous_path(self.path))
+            snapshot.verify()
+            self.metrics['fallbacks'] += 1
+            recovered = True
+        self.snapshot = snapshot
+        self.removed = set()
+        self.added = {}
+        self.applied_seq = self.snapshot.journal_seq
+        self.journal_entries = 0
+        self.cached = None
+        return recovered
+
+    def _import(self, json_path):
+        """Write a snapshot from a wardrobe JSON file (an empty one if it is missing)"""
+        try:
+            with open(json_path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {'items': []}
+        meta = {key: value for key, value in data.items() if key != 'items'}
+        write_snapshot(self.path, data.get('items', []), self.seq, meta)
+        self.metrics['imports'] += 1
+
+    def _replay(self, path):
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            good_end = 0
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    if line.endswith(b'\n'):
+                        raise
+                    # Cut short by a crash mid-append; it was never acknowledged
+                    self.metrics['torn_entries'] += 1
+                    break
+                good_end += len(line)
+                if entry['seq'] <= self.applied_seq:
+                    continue
+                self._apply(entry)
+                self.journal_entries += 1
+                self.metrics['replayed'] += 1
+        if good_end < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(good_end)
+
+    def _apply(self, entry):
+        if entry['op'] == 'add':
+            record = ItemRecord(entry['item'])
+            self.added[record.id] = record
+        elif entry['op'] == 'remove':
+            item_id = entry['id']
+            if self.added.pop(item_id, None) is None:
+                row = self._snapshot_row(item_id)
+                if row is not None:
+                    self.removed.add(row)
+        self.applied_seq = entry['seq']
+        self.cached = None
+
+    def _snapshot_row(self, item_id):
+        """Snapshot row of a live item, or None"""
+        row = self.snapshot.find(item_id)
+        if row is None and not isinstance(item_id, int):
+            # Ids that are not integers are not indexed
+            ids = self.snapshot.columns['id']
+            row = next((row for row in range(self.snapshot.rows)
+                        if ids[row] == NO_INT and self.snapshot.item(row).id == item_id), None)
+        return None if row in self.removed else row
+
+    def _items(self):
+        if self.cached is None:
+            snapshot = self.snapshot
+            self.cached = [snapshot.item(row) for row in range(snapshot.rows) if row not in self.removed]
+            self.cached.extend(self.added.values())
+        return self.cached
+
+    def items(self):
+        """Current items; the list is a copy, the items are shared and read-only"""
+        self.ensure_loaded()
+        with self.lock:
+            return list(self._items())
+
+    def get(self, item_id):
+        self.ensure_loaded()
+        with self.lock:
+            record = self.added.get(item_id)
+            if record is not None:
+                return record
+            row = self._snapshot_row(item_id)
+            return self.snapshot.item(row) if row is not None else None
+
+    def _exists(self, item_id):
+        """Whether an item exists once the queued changes are applied"""
+        for change in reversed(self.pending):
+            entry = change.entry
+            if entry['op'] == 'add' and entry['item']['id'] == item_id:
+                return True
+            if entry['op'] == 'remove' and entry['id'] == item_id:
+                return False
+        return item_id in self.added or self._snapshot_row(item_id) is not None
+
+    def _next_id(self):
+        ids = self.snapshot.index_ids
+        rows = self.snapshot.index_rows
+        # The snapshot's id index is sorted, so its largest live id is near the end
+        top = next((ids[n] for n in range(len(ids) - 1, -1, -1) if rows[n] not in self.removed), 0)
+        taken = [item_id for item_id in self.added]
+        taken += [change.entry['item']['id'] for change in self.pending if change.entry['op'] == 'add']
+        return max(top, max((item_id for item_id in taken
+                             if isinstance(item_id, int) and not isinstance(item_id, bool)), default=0)) + 1
+
+    def _queue(self, entry):
+        """Queue a change for the writer; call with the lock held"""
+        self.seq += 1
+        change = PendingChange({'seq': self.seq, **entry})
+        self.pending.append(change)
+        if self.writer is None:
+            self.stopping = False
+            self.writer = threading.Thread(target=self._write_loop, name='wardrobe-writer', daemon=True)
+            self.writer.start()
+        self.queued.notify()
+        return change
+
+    def add(self, fields):
+        """Add an item under the next free id; returns its record once it is durable"""
+        self.ensure_loaded()
+        with self.lock:
+            change = self._queue({'op': 'add', 'item': {'id': self._next_id(), **fields}})
+        change.wait()
+        with self.lock:
+            # The applied record, or an equal one if a removal or compaction has since dropped it
+            return self.added.get(change.entry['item']['id']) or ItemRecord(change.entry['item'])
+
+    def remove(self, item_id):
+        """Remove an item once durable; returns False if there was no such item"""
+        self.ensure_loaded()
+        with self.lock:
+            if not self._exists(item_id):
+                return False
+            change = self._queue({'op': 'remove', 'id': item_id})
+        change.wait()
+        return True
+
+    def _write_loop(self):
+        while True:
+            with self.lock:
+                self.queued.wait_for(lambda: self.pending or self.stopping)
+                if not self.pending:
+                    self.writer = None
+                    return
+            # Give concurrent requests a moment to join this commit
+            time.sleep(self.commit_window)
+            with self.write_lock:
+                with self.lock:
+                    batch = list(self.pending)
+                try:
+                    compact = self._commit(batch)
+                except Exception as e:
+                    compact = False
+                    with self.lock:
+                        del self.pending[:len(batch)]
+                        self.metrics['commit_errors'] += 1
+                    for change in batch:
+                        change.error = e
+                finally:
+                    for change in batch:
+                        change.done.set()
+                # After the acknowledgements: no request waits for a compaction
+                if compact:
+                    try:
+                        self._compact()
+                    except Exception as e:
+                        # The journal still holds every change; retried after the next commit
+                        print(f"⚠️  Wardrobe compaction failed: {e}")
+
+    def _commit(self, batch):
+        """Make a batch durable and apply it; returns whether the journal is due for compaction"""
+        self._write(batch)
+        with self.lock:
+            for change in batch:
+                self._apply(change.entry)
+            del self.pending[:len(batch)]
+            self.journal_entries += len(batch)
+            self.metrics['journal_writes'] += len(batch)
+            self.metrics['commits'] += 1
+            self.metrics['largest_commit'] = max(self.metrics['largest_commit'], len(batch))
+            return self.journal_entries >= self.compact_after
+
+    def _write(self, batch):
+        """Append a batch to the journal with one write and one fsync.
+
+        If the append fails the journal is truncated back to its previous
+        size, so a partly written batch cannot be replayed or end up in front
+        of later entries; when even that fails, the next append retries it.
+        """
+        created = not os.path.exists(self.journal_path)
+        data = memoryview(''.join(json.dumps(change.entry) + '\n' for change in batch).encode())
+        # Unbuffered, so nothing of a failed batch is left to be flushed later
+        with open(self.journal_path, 'ab', buffering=0) as f:
+            self._repair_journal(f)
+            start = f.seek(0, os.SEEK_END)
+            try:
+                while data:
+                    data = data[f.write(data):]
+                os.fsync(f.fileno())
+            except BaseException:
+                self.journal_end = start
+                try:
+                    self._repair_journal(f)
+                except OSError as e:
+                    print(f"⚠️  Could not cut a failed commit off the wardrobe journal: {e}")
+                raise
+        if created:
+            fsync_directory(self.journal_path)
+
+    def _repair_journal(self, f):
+        """Cut a failed append off the open journal; call with write_lock held"""
+        if self.journal_end is not None:
+            f.truncate(self.journal_end)
+            os.fsync(f.fileno())
+            self.journal_end = None
+
+    def compact(self):
+        """Fold the journal into a new snapshot now"""
+        self.ensure_loaded()
+        with self.write_lock:
+            self._compact()
+
+    def _compact(self, merge_journals=False):
+        """Write the applied state as a new snapshot; call with write_lock held"""
+        with self.lock:
+            items = self._items()
+            seq = self.applied_seq
+            meta = self.snapshot.meta()
+        # Only the writer changes the applied state, so this needs no lock
+        # and reads go on from the old mapping meanwhile. The snapshot
+        # records the journal sequence it covers before the journal is
+        # rotated, so a crash in between replays nothing twice.
+        write_snapshot(self.path, items, seq, meta)
+        snapshot = Snapshot(self.path)
+        self._rotate_journal(merge_journals)
+        with self.lock:
+            # Views handed out earlier keep the old mapping alive until dropped
+            self.snapshot = snapshot
+            self.removed = set()
+            self.added = {}
+            self.journal_entries = 0
+            self.cached = None
+            self.metrics['compactions'] += 1
+
+    def _rotate_journal(self, merge=False):
+        """Keep the journal folded into the new snapshot as the previous one's, and start afresh.
+
+        With merge, the journal is appended to the previous journal instead
+        of replacing it, for when the previous snapshot did not change.
+        """
+        if self.journal_end is not None and os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                self._repair_journal(f)
+        previous = previous_path(self.journal_path)
+        if merge and os.path.exists(previous) and os.path.exists(self.journal_path):
+            with open(previous, 'rb') as f:
+                data = f.read()
+            with open(self.journal_path, 'rb') as f:
+                data += f.read()
+            write_atomic(previous, data)
+        elif os.path.exists(self.journal_path):
+            os.replace(self.journal_path, previous)
+        with open(self.journal_path, 'w'):
+            pass
+        fsync_directory(self.journal_path)
+
+    def import_json(self, json_path):
+        """Replace the wardrobe with the contents of a JSON file"""
+        self.ensure_loaded()
+        with self.write_lock, self.lock:
+            self.seq += 1
+            self._import(json_path)
+            self._rotate_journal()
+            self._open_snapshot()
+
+    def export(self):
+        """The wardrobe as JSON-ready dicts, in wardrobe.json's format"""
+        self.ensure_loaded()
+        with self.lock:
+            return {'items': [item.to_dict() for item in self._items()], **self.snapshot.meta()}
+
+    def shutdown(self):
+        """Commit the queued changes and stop the writer"""
+        with self.lock:
+            writer = self.writer
+            self.stopping = True
+            self.queued.notify()
+        if writer:
+            writer.join()
+
+    def close(self):
+        """Stop the writer and hand the files back for another process to open"""
+        self.shutdown()
+        with self.write_lock, self.lock:
+            self.loaded = False
+            if self.lock_file is not None:
+                # Closing the file releases the lock
+                self.lock_file.close()
+                self.lock_file = None
+
+    def stats(self):
+        with self.lock:
+            snapshot_rows = self.snapshot.rows if self.snapshot else 0
+            commits = self.metrics['commits']
+            return dict(
+                self.metrics,
+                mean_commit=round(self.metrics['journal_writes'] / commits, 2) if commits else 0,
+                pending=len(self.pending),
+                items=snapshot_rows - len(self.removed) + len(self.added),
+                snapshot_rows=snapshot_rows,
+                journal_entries=self.journal_entries,
+                attribute_values=len(ATTRIBUTES),
+                layouts=len(LAYOUTS)
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import, export or compact the wardrobe snapshot")
+    parser.add_argument('command', choices=('import', 'export', 'compact', 'stats'))
+    parser.add_argument('json_path', nargs='?', default='wardrobe.json', help="JSON file to import or export")
+    parser.add_argument('--snapshot', default='wardrobe.snap', help="snapshot file")
+    args = parser.parse_args()
+
+    store = WardrobeStore(args.snapshot, import_path=args.json_path)
+    try:
+        store.acquire()
+    except WardrobeLocked as e:
+        raise SystemExit(f"❌ {e}")
+    if args.command == 'import':
+        store.import_json(args.json_path)
+        print(f"✅ Imported {store.stats()['items']} items into {args.snapshot}")
+    elif args.command == 'export':
+        wardrobe = store.export()
+        write_json(args.json_path, wardrobe, indent=2)
+        print(f"✅ Exported {len(wardrobe['items'])} items to {args.json_path}")
+    elif args.command == 'compact':
+        store.compact()
+        print(f"✅ Compacted {args.snapshot}: {store.stats()['items']} items")
+    else:
+        store.ensure_loaded()
+        print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Background cache warm-up with a readiness flag.
+
+A WarmUp runs named tasks (loading the wardrobe, building indexes,
+precomputing outfit and rating tables) in background threads and reports
+when all of them have finished, so a readiness endpoint can hold load
+balancer traffic until the caches are warm.
+
+A task can name tasks it must run after (building indexes after loading
+the wardrobe they index); its thread waits for them to finish, whether
+they succeed or fail, before it starts.
+"""
+
+import threading
+import time
+
+
+class WarmUp:
+    """Run warm-up tasks in background threads and track readiness"""
+
+    def __init__(self, tasks, after=None):
+        # tasks: {name: callable}; after: {name: (names it waits for), ...}
+        self.tasks = dict(tasks)
+        self.after = {name: tuple(after.get(name, ())) for name in self.tasks} if after else {}
+        unknown = {dep for deps in self.after.values() for dep in deps} - set(self.tasks)
+        if unknown:
+            raise ValueError(f"Unknown warm-up tasks: {', '.join(sorted(unknown))}")
+        self.finished = {name: threading.Event() for name in self.tasks}
+        self.state = {name: 'pending' for name in self.tasks}
+        self.errors = {}
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        self.remaining = len(self.tasks)
+
+    def start(self):
+        """Start every task in its own daemon thread; returns immediately"""
+        self.started_at = time.time()
+        if not self.tasks:
+            self.finish()
+            return self
+        for name, task in self.tasks.items():
+            thread = threading.Thread(target=self.run, args=(name, task), name=f"warmup-{name}", daemon=True)
+            thread.start()
+        return self
+
+    def skip(self):
+        """Mark warm-up as disabled; caches fill lazily on first use"""
+        self.started_at = time.time()
+        with self.lock:
+            self.state = {name: 'skipped' for name in self.tasks}
+        for finished in self.finished.values():
+            finished.set()
+        self.finish()
+        return self
+
+    def run(self, name, task):
+        for dep in self.after.get(name, ()):
+            self.finished[dep].wait()
+        with self.lock:
+            self.state[name] = 'running'
+        try:
+            task()
+            outcome = 'done'
+        except Exception as e:
+            # A failed task leaves its cache cold; requests fall back to the lazy path
+            outcome = 'failed'
+            self.errors[name] = str(e)
+        with self.lock:
+            self.state[name] = outcome
+            self.remaining -= 1
+            last = self.remaining == 0
+        self.finished[name].set()
+        if last:
+            self.finish()
+
+    def finish(self):
+        self.finished_at = time.time()
+        self.done.set()
+
+    @property
+    def ready(self):
+        return self.done.is_set()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def status(self):
+        """Readiness report for the /ready endpoint"""
+        with self.lock:
+            report = {
+                'ready': self.ready,
+                'tasks': dict(self.state)
+            }
+        if self.errors:
+            report['errors'] = dict(self.errors)
+        if self.finished_at is not None and self.started_at is not None:
+            report['warmup_seconds'] = round(self.finished_at - self.started_at, 3)
+        return report
@@ -0,0 +1,117 @@
+"""
+Append-only wear log with a least-recently-worn index per outfit slot.
+
+Every recorded outfit is appended as one JSON line to the log, so writes
+never rewrite history. In memory each slot keeps a min-heap of
+(last_worn, item_id) entries; re-wearing an item pushes a fresh entry and the
+outdated one is skipped lazily when it reaches the top, keeping each update
+at O(log n). At startup the log is replayed into a dict of last-worn times
+and every heap is built with one heapify.
+"""
+
+import heapq
+import json
+import threading
+from datetime import datetime
+
+
+class WearHistory:
+    """Wear log plus per-slot least-recently-worn heaps"""
+
+    def __init__(self, path='wear_log.jsonl'):
+        self.path = path
+        self.last_worn = {}
+        self.heaps = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Rebuild the in-memory index from the log"""
+        with self.lock:
+            last_worn = {}
+            slots = {}
+            try:
+                with open(self.path, 'r') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A torn final line from an interrupted append
+                            continue
+                        worn_at = entry['worn_at']
+                        for item in entry['items']:
+                            if worn_at >= last_worn.get(item['id'], worn_at):
+                                last_worn[item['id']] = worn_at
+                                slots[item['id']] = item['slot']
+            except FileNotFoundError:
+                pass
+
+            heaps = {}
+            for item_id, worn_at in last_worn.items():
+                heaps.setdefault(slots[item_id], []).append((worn_at, item_id))
+            for heap in heaps.values():
+                heapq.heapify(heap)
+
+            self.last_worn = last_worn
+            self.heaps = heaps
+            self.loaded = True
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def record(self, items, worn_at=None):
+        """Record an outfit as worn.
+
+        `items` is a list of {'id', 'slot'} dicts and `worn_at` a unix
+        timestamp (defaults to now). Returns the logged entry.
+        """
+        self.ensure_loaded()
+        if worn_at is None:
+            worn_at = datetime.now().timestamp()
+        entry = {
+            'worn_at': worn_at,
+            'items': [{'id': item['id'], 'slot': item['slot']} for item in items]
+        }
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            for item in entry['items']:
+                if worn_at >= self.last_worn.get(item['id'], worn_at):
+                    self.last_worn[item['id']] = worn_at
+                    heapq.heappush(self.heaps.setdefault(item['slot'], []), (worn_at, item['id']))
+        return entry
+
+    def last_worn_at(self, item_id):
+        """Unix time an item was last worn, or 0 if it never was"""
+        self.ensure_loaded()
+        return self.last_worn.get(item_id, 0)
+
+    def least_recent(self, slot, limit=5, item_ids=None):
+        """Return [(last_worn, item_id), ...] for the least recently worn items.
+
+        `item_ids` lists the slot's wardrobe items in wardrobe order. Those
+        never worn lead with a last_worn of 0, and logged items no longer in
+        the list are skipped. Without it only logged items are known.
+
+        Stale heap entries left behind by later wears are discarded as they
+        surface, and the live entries popped are pushed back afterwards.
+        """
+        self.ensure_loaded()
+        with self.lock:
+            found = []
+            current = None
+            if item_ids is not None:
+                current = set(item_ids)
+                found = [(0, item_id) for item_id in item_ids if item_id not in self.last_worn][:limit]
+            heap = self.heaps.get(slot, [])
+            popped = []
+            while heap and len(found) < limit:
+                worn_at, item_id = heapq.heappop(heap)
+                if self.last_worn.get(item_id) == worn_at and (worn_at, item_id) not in popped:
+                    popped.append((worn_at, item_id))
+                    if current is None or item_id in current:
+                        found.append((worn_at, item_id))
+            for entry in popped:
+                heapq.heappush(heap, entry)
+            return found